@@ -0,0 +1,177 @@
+# ============================================
+# ANÁLISE COMPLETA - ARTEFATOS E CACHE
+# ============================================
+# Monta os artefatos da seção "ANALISAR TODOS OS KPIs" (cards principais,
+# radar, gaps, barras por categoria e scorecard) e os memoriza por um hash
+# estável de calculated_values/achievements. O cache é um LRU limitado,
+# compartilhado entre sessões (ver analysis_cache em projeto.py), com
+# contadores de hits/misses para a operação.
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from kpis import kpis_definition
+from profiling import stage
+
+MAIN_KPIS = ["Receita Líquida (R$)", "Lucro Líquido (R$)", "Margem EBITDA (%)", "ROE - Retorno sobre Patrimônio (%)"]
+# Limites de achievement (%) das seções de gaps e scorecard: crítico / gap / meta
+CRITICAL, GAP, TARGET = 50, 70, 100
+
+
+def content_hash(calculated_values, achievements):
+    """Hash estável (independe da identidade dos dicts) dos resultados."""
+    payload = json.dumps([list(calculated_values.items()), list(achievements.items())],
+                         ensure_ascii=False, default=float)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """Cache LRU thread-safe com limite de entradas e contadores."""
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_build(self, key, build):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            # Construção fora do lock: sessões diferentes não se bloqueiam
+            value = build()
+            self.put(key, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entradas": len(self._data),
+                "limite": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate (%)": round(100 * self.hits / total, 1) if total else 0.0,
+            }
+
+
+def summarize(calculated_values, achievements):
+    """Cards, gaps, performance por categoria e scorecard (sem gráficos)."""
+    import pandas as pd
+
+    artifacts = {}
+
+    # 1. Cards principais
+    cards = []
+    for kpi in MAIN_KPIS:
+        if kpi in calculated_values:
+            ach = achievements.get(kpi, 0)
+            color = "#2196F3" if ach >= 80 else "#FF9800" if ach >= 50 else "#F44336"
+            cards.append({"kpi": kpi, "value": calculated_values[kpi], "ach": ach, "color": color})
+    artifacts["cards"] = cards
+
+    # 3. Análise de Gaps
+    gaps = []
+    for kpi_name, ach in achievements.items():
+        if ach < GAP:
+            gaps.append({
+                "KPI": kpi_name,
+                "Performance": f"{ach:.1f}%",
+                "Gap": f"{TARGET - ach:.1f}%",
+                "Prioridade": "Alta" if ach < CRITICAL else "Média"
+            })
+    artifacts["gaps_df"] = pd.DataFrame(gaps).sort_values('Performance') if gaps else None
+
+    # 4. Performance por Categoria
+    cat_perf = {}
+    for cat, cat_kpis in kpis_definition.items():
+        perf_list = [achievements.get(k, 0) for k in cat_kpis.keys()]
+        if perf_list:
+            cat_perf[cat] = sum(perf_list) / len(perf_list)
+    artifacts["cat_perf"] = cat_perf
+
+    # 5. Scorecard Final
+    artifacts["overall"] = sum(achievements.values()) / len(achievements) if achievements else 0
+    artifacts["acima_meta"] = sum(1 for a in achievements.values() if a >= TARGET)
+    artifacts["criticos"] = sum(1 for a in achievements.values() if a < CRITICAL)
+    artifacts["total"] = len(achievements)
+    return artifacts
+
+
+def build_figures(achievements, cat_perf):
+    """Radar de performance e barras por categoria (plotly)."""
+    import plotly.graph_objects as go
+    import plotly.express as px
+
+    # 2. Gráfico de Radar
+    fig_radar = None
+    if achievements:
+        # Todos os KPIs do catálogo (antes só os 15 primeiros entravam)
+        top_kpis = list(achievements.keys())
+        top_values = [achievements[k] for k in top_kpis]
+        fig_radar = go.Figure()
+        fig_radar.add_trace(go.Scatterpolar(
+            r=top_values + top_values[:1],
+            theta=top_kpis + top_kpis[:1],
+            fill='toself',
+            name='Performance',
+            line_color='#1E88E5',
+            fillcolor='rgba(30, 136, 229, 0.3)'
+        ))
+        fig_radar.update_layout(
+            polar=dict(radialaxis=dict(visible=True, range=[0, 100], title="Achievement (%)")),
+            showlegend=True,
+            title="Performance dos KPIs vs Meta",
+            height=750
+        )
+
+    fig_bar = None
+    if cat_perf:
+        fig_bar = px.bar(
+            x=list(cat_perf.keys()), y=list(cat_perf.values()),
+            title="Performance Média por Categoria",
+            labels={'x': 'Categoria', 'y': 'Performance (%)'},
+            color=list(cat_perf.values()), color_continuous_scale='Blues'
+        )
+        fig_bar.update_layout(height=400)
+    return {"fig_radar": fig_radar, "fig_bar": fig_bar}
+
+
+def build_analysis(calculated_values, achievements):
+    """Constrói todos os artefatos da análise a partir dos resultados."""
+    # Importações pesadas (pandas, plotly) só quando a análise é de fato construída
+    with stage("analise"):
+        artifacts = summarize(calculated_values, achievements)
+    with stage("plotly"):
+        artifacts.update(build_figures(achievements, artifacts["cat_perf"]))
+    return artifacts
+
+
+def cached_analysis(cache, calculated_values, achievements):
+    """Artefatos da análise, servidos do cache quando os resultados se repetem."""
+    # Cópias: o grafo continua alterando os dicts depois desta chamada
+    calculated_values, achievements = dict(calculated_values), dict(achievements)
+    key = content_hash(calculated_values, achievements)
+    return cache.get_or_build(key, lambda: build_analysis(calculated_values, achievements))
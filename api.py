@@ -0,0 +1,220 @@
+# ============================================
+# API DE SCORING (FastAPI)
+# ============================================
+# Expõe os mesmos cálculos do painel para integração com o ERP:
+#   GET  /kpis         catálogo (inputs, meta e tipo de cada KPI)
+#   POST /score        uma empresa/período  -> grafo escalar (kpi_graph.py)
+#   POST /score/batch  várias empresas      -> motor vetorizado (kpi_batch.py)
+#   POST /score/columns  idem, em colunas (input -> lista de valores)
+# Lotes grandes vão para um pool de processos para não bloquear o event loop.
+# Em /score/columns a leitura do JSON, a validação e a serialização da
+# resposta também saem do event loop (thread), e nada é montado item a item:
+# é o formato indicado para cargas de dezenas de milhares de linhas.
+#
+# Execução:  uvicorn api:app --host 0.0.0.0 --port 8000 --workers 2
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+from fastapi import FastAPI, HTTPException, Request, Response
+from pydantic import BaseModel, Field, ValidationError, field_validator, model_validator
+
+from kpis import iter_kpis, raw_inputs
+from kpi_graph import KPIGraph
+from kpi_batch import score_batch
+
+# A partir deste número de linhas o lote é calculado no pool de processos
+PROCESS_POOL_MIN_ROWS = int(os.environ.get("FPA_PROCESS_POOL_MIN_ROWS", 20_000))
+MAX_BATCH_ROWS = int(os.environ.get("FPA_MAX_BATCH_ROWS", 1_000_000))
+
+_RAW_INPUTS = raw_inputs()
+_KPI_NAMES = [kpi_name for _, kpi_name, _ in iter_kpis()]
+
+
+# ============================================
+# MODELOS
+# ============================================
+
+class EntityInputs(BaseModel):
+    company: Optional[str] = None
+    period: Optional[str] = None
+    inputs: Dict[str, float] = Field(default_factory=dict,
+                                     description="Inputs canônicos; ausentes valem 0")
+
+    @field_validator("inputs")
+    @classmethod
+    def known_inputs(cls, value):
+        unknown = sorted(set(value) - set(_RAW_INPUTS))
+        if unknown:
+            raise ValueError(f"Inputs desconhecidos: {', '.join(unknown)}")
+        return value
+
+
+class EntityScore(BaseModel):
+    company: Optional[str] = None
+    period: Optional[str] = None
+    values: Dict[str, float]
+    achievements: Dict[str, float]
+    overall: float
+
+
+class BatchRequest(BaseModel):
+    items: List[EntityInputs] = Field(max_length=MAX_BATCH_ROWS)
+
+
+class BatchResponse(BaseModel):
+    rows: int
+    items: List[EntityScore]
+
+
+class ColumnarRequest(BaseModel):
+    company: Optional[List[str]] = None
+    period: Optional[List[str]] = None
+    inputs: Dict[str, List[float]] = Field(description="Input canônico -> um valor por linha; ausentes valem 0")
+
+    @model_validator(mode="after")
+    def same_length(self):
+        unknown = sorted(set(self.inputs) - set(_RAW_INPUTS))
+        if unknown:
+            raise ValueError(f"Inputs desconhecidos: {', '.join(unknown)}")
+        lengths = {len(col) for col in self.inputs.values()}
+        lengths |= {len(col) for col in (self.company, self.period) if col is not None}
+        if len(lengths) > 1:
+            raise ValueError("Todas as colunas devem ter o mesmo número de linhas")
+        if lengths and lengths.pop() > MAX_BATCH_ROWS:
+            raise ValueError(f"Máximo de {MAX_BATCH_ROWS} linhas por lote")
+        return self
+
+    @property
+    def rows(self):
+        for col in (*self.inputs.values(), self.company, self.period):
+            if col is not None:
+                return len(col)
+        return 0
+
+
+class ColumnarResponse(BaseModel):
+    rows: int
+    company: Optional[List[str]] = None
+    period: Optional[List[str]] = None
+    values: Dict[str, List[float]]
+    achievements: Dict[str, List[float]]
+    overall: List[float]
+
+
+# ============================================
+# CÁLCULO
+# ============================================
+
+def _overall(achievements):
+    return sum(achievements) / len(achievements) if achievements else 0.0
+
+
+def score_columns(columns, n_rows):
+    """Executado no pool de processos: só arrays NumPy atravessam o pickle."""
+    data = {var: columns.get(var, np.zeros(n_rows)) for var in _RAW_INPUTS}
+    valores, atingimentos = score_batch(data)
+    return valores.to_numpy(), atingimentos.to_numpy()
+
+
+_pool = None
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    global _pool
+    _pool = ProcessPoolExecutor(max_workers=int(os.environ.get("FPA_API_PROCESSES", os.cpu_count() or 2)))
+    try:
+        yield
+    finally:
+        _pool.shutdown(cancel_futures=True)
+
+
+app = FastAPI(title="Painel FP&A - API de Scoring", lifespan=lifespan)
+
+
+@app.get("/kpis")
+async def catalog():
+    return [{"categoria": category, "kpi": kpi_name, "inputs": cfg['inputs'],
+             "meta": cfg['meta'], "tipo": cfg['tipo']}
+            for category, kpi_name, cfg in iter_kpis()]
+
+
+@app.post("/score", response_model=EntityScore)
+async def score(item: EntityInputs):
+    # Mesmo caminho do painel: grafo escalar com os lambdas de kpis_definition
+    graph = KPIGraph(item.inputs)
+    return EntityScore(company=item.company, period=item.period,
+                       values=dict(graph.values), achievements=dict(graph.achievements),
+                       overall=_overall(list(graph.achievements.values())))
+
+
+def _items_to_columns(items):
+    n_rows = len(items)
+    columns = {var: np.zeros(n_rows) for var in _RAW_INPUTS}
+    for i, item in enumerate(items):
+        for var, value in item.inputs.items():
+            columns[var][i] = value
+    return columns
+
+
+def _items_response(items, valores, atingimentos):
+    # Os tipos já são garantidos pelo cálculo: model_construct evita revalidar
+    # milhares de dicts na montagem da resposta
+    scores = []
+    for item, val_row, ach_row in zip(items, valores.tolist(), atingimentos.tolist()):
+        scores.append(EntityScore.model_construct(company=item.company, period=item.period,
+                                                  values=dict(zip(_KPI_NAMES, val_row)),
+                                                  achievements=dict(zip(_KPI_NAMES, ach_row)),
+                                                  overall=_overall(ach_row)))
+    return BatchResponse.model_construct(rows=len(items), items=scores)
+
+
+async def _score(columns, n_rows):
+    loop = asyncio.get_running_loop()
+    executor = _pool if n_rows >= PROCESS_POOL_MIN_ROWS and _pool is not None else None
+    return await loop.run_in_executor(executor, score_columns, columns, n_rows)
+
+
+@app.post("/score/batch", response_model=BatchResponse)
+async def score_many(batch: BatchRequest):
+    # A validação item a item do pydantic já rodou no loop; montagem das
+    # colunas e da resposta vão para thread (lotes grandes: /score/columns)
+    n_rows = len(batch.items)
+    columns = await asyncio.to_thread(_items_to_columns, batch.items)
+    valores, atingimentos = await _score(columns, n_rows)
+    return await asyncio.to_thread(_items_response, batch.items, valores, atingimentos)
+
+
+def _parse_columns(body):
+    try:
+        batch = ColumnarRequest.model_validate_json(body)
+    except ValidationError as exc:
+        raise HTTPException(status_code=422, detail=exc.errors(include_url=False, include_context=False))
+    n_rows = batch.rows
+    columns = {var: np.asarray(col, dtype=np.float64) for var, col in batch.inputs.items()}
+    return batch, columns, n_rows
+
+
+def _columns_response(batch, n_rows, valores, atingimentos):
+    response = ColumnarResponse.model_construct(
+        rows=n_rows, company=batch.company, period=batch.period,
+        values=dict(zip(_KPI_NAMES, valores.T.tolist())),
+        achievements=dict(zip(_KPI_NAMES, atingimentos.T.tolist())),
+        overall=atingimentos.mean(axis=1).tolist() if atingimentos.shape[1] else [0.0] * n_rows)
+    return response.model_dump_json()
+
+
+@app.post("/score/columns", response_model=ColumnarResponse,
+          openapi_extra={"requestBody": {"required": True, "content": {
+              "application/json": {"schema": ColumnarRequest.model_json_schema()}}}})
+async def score_columnar(request: Request):
+    # Corpo lido cru: JSON, validação e serialização em thread, fora do loop
+    batch, columns, n_rows = await asyncio.to_thread(_parse_columns, await request.body())
+    valores, atingimentos = await _score(columns, n_rows)
+    content = await asyncio.to_thread(_columns_response, batch, n_rows, valores, atingimentos)
+    return Response(content=content, media_type="application/json")
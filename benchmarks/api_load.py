@@ -0,0 +1,132 @@
+# ============================================
+# TESTE DE CARGA LOCAL DA API DE SCORING
+# ============================================
+# Sobe o uvicorn com api:app (ou usa --url de um servidor já em execução),
+# dispara requisições concorrentes e mede requisições/s e linhas/s em
+# /score (uma empresa), /score/batch e /score/columns (lotes).
+#
+#   python benchmarks/api_load.py --requests 2000 --concurrency 32 --batch-size 5000
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from kpis import raw_inputs  # noqa: E402
+
+
+def _payload(rng):
+    return {"company": f"E{rng.randrange(10_000)}", "period": "2024-12",
+            "inputs": {var: round(rng.uniform(0, 1_000_000), 2) for var in raw_inputs()}}
+
+
+def _columnar(batch):
+    """O mesmo lote no formato de /score/columns."""
+    items = batch["items"]
+    return json.dumps({"company": [item["company"] for item in items],
+                       "period": [item["period"] for item in items],
+                       "inputs": {var: [item["inputs"].get(var, 0.0) for item in items] for var in raw_inputs()}})
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _wait_ready(client, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/kpis")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("API não respondeu a tempo")
+
+
+async def _run(client, path, bodies, concurrency):
+    queue = list(bodies)
+    latencies = []
+
+    async def worker():
+        while queue:
+            body = queue.pop()
+            start = time.perf_counter()
+            response = await client.post(path, content=body, headers={"content-type": "application/json"})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return elapsed, latencies
+
+
+async def main(args):
+    rng = random.Random(42)
+    server = None
+    url = args.url
+    if url is None:
+        port = _free_port()
+        url = f"http://127.0.0.1:{port}"
+        server = subprocess.Popen([sys.executable, "-m", "uvicorn", "api:app", "--port", str(port),
+                                   "--workers", str(args.workers), "--log-level", "warning"], cwd=ROOT)
+    results = {}
+    try:
+        async with httpx.AsyncClient(base_url=url, timeout=300) as client:
+            await _wait_ready(client)
+
+            # Corpos serializados antes da medição: o tempo medido é o do servidor
+            bodies = [json.dumps(_payload(rng)) for _ in range(args.requests)]
+            elapsed, lat = await _run(client, "/score", bodies, args.concurrency)
+            results["score"] = {
+                "requests": args.requests, "seconds": round(elapsed, 3),
+                "requests_per_s": round(args.requests / elapsed, 1),
+                "p50_ms": round(1000 * lat[len(lat) // 2], 2),
+                "p95_ms": round(1000 * lat[int(len(lat) * 0.95)], 2),
+            }
+
+            batch = json.dumps({"items": [_payload(rng) for _ in range(args.batch_size)]})
+            rows = args.batch_size * args.batches
+            for path, body in (("/score/batch", batch), ("/score/columns", _columnar(json.loads(batch)))):
+                elapsed, lat = await _run(client, path, [body] * args.batches, min(args.concurrency, args.batches))
+                results[path.replace("/", "_").strip("_")] = {
+                    "batches": args.batches, "batch_size": args.batch_size, "seconds": round(elapsed, 3),
+                    "requests_per_s": round(args.batches / elapsed, 2),
+                    "rows_per_s": round(rows / elapsed, 1),
+                    "p50_ms": round(1000 * lat[len(lat) // 2], 2),
+                }
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Teste de carga local da API de scoring")
+    parser.add_argument("--url", help="servidor já em execução (padrão: sobe um uvicorn local)")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--batches", type=int, default=10)
+    parser.add_argument("--output", help="grava os resultados em JSON")
+    asyncio.run(main(parser.parse_args()))
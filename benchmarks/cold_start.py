@@ -0,0 +1,69 @@
+# ============================================
+# COLD START E TEMPO ATÉ A PRIMEIRA RENDERIZAÇÃO
+# ============================================
+# Cada repetição roda em um processo Python novo (sem módulos em cache):
+#   - import_ms: tempo de importação do streamlit (base do servidor)
+#   - first_render_ms: primeira execução completa de projeto.py (AppTest),
+#     incluindo a importação dos módulos usados por ela
+#   - rerun_ms: segunda execução, já com tudo importado
+#   - heavy_modules: bibliotecas pesadas carregadas após a primeira execução
+#
+#   python benchmarks/cold_start.py --repeat 5 --output cold_start.json
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ["pandas", "numpy", "plotly.express", "sqlalchemy", "pyarrow", "xlsxwriter"]
+
+_CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import streamlit
+from streamlit.testing.v1 import AppTest
+t1 = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+at.run()
+t2 = time.perf_counter()
+at.run()
+t3 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "first_render_ms": (t2 - t1) * 1000,
+    "rerun_ms": (t3 - t2) * 1000,
+    "heavy_modules": [m for m in json.loads(sys.argv[2]) if m in sys.modules],
+    "exception": bool(at.exception),
+}))
+"""
+
+
+def measure(script, repeat):
+    runs = []
+    env = dict(os.environ, FPA_STORE_URL=os.environ.get("FPA_STORE_URL", "sqlite:///:memory:"))
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", _CHILD, script, json.dumps(HEAVY)],
+                             capture_output=True, text=True, cwd=ROOT, env=env, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    summary = {key: round(statistics.median(r[key] for r in runs), 1)
+               for key in ("import_ms", "first_render_ms", "rerun_ms")}
+    summary["heavy_modules"] = runs[-1]["heavy_modules"]
+    summary["exception"] = any(r["exception"] for r in runs)
+    summary["repeat"] = repeat
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--script", default=os.path.join(ROOT, "projeto.py"))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="grava o resultado em JSON")
+    args = parser.parse_args()
+    result = measure(args.script, args.repeat)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2, ensure_ascii=False)
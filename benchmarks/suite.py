@@ -0,0 +1,232 @@
+# ============================================
+# SUÍTE DE BENCHMARKS DO PAINEL
+# ============================================
+# Gera portfólios sintéticos (todas as variáveis de kpis_definition) e mede,
+# para cada tamanho:
+#   - scalar: KPIGraph por empresa/período (caminho do formulário e da API)
+#   - batch: score_batch sobre o portfólio inteiro (kpi_batch.py)
+#   - aggregation: cards, gaps, categorias e scorecard (analysis.summarize)
+#   - figures: radar e barras por categoria (analysis.build_figures)
+#   - excel: export_report("Excel", ...) com as linhas do portfólio
+#   - rerun: rerun completo de projeto.py no AppTest com o portfólio carregado
+# Etapas por linha têm limite (--scalar-max, --export-max, --rerun-max): acima
+# dele mede-se uma amostra e o JSON registra as linhas efetivamente usadas.
+#
+#   python benchmarks/suite.py --output bench_HEAD.json
+#   python benchmarks/suite.py --sizes 1,100 --compare bench_HEAD.json
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from kpis import kpi_order, raw_inputs  # noqa: E402
+from kpi_graph import KPIGraph  # noqa: E402
+from kpi_batch import score_batch  # noqa: E402
+from analysis import summarize, build_figures  # noqa: E402
+from export import EXCEL_MAX_ROWS, KPI_COLUMNS, export_report, portfolio_rows, summary_row  # noqa: E402
+from importer import ENTITY, PERIOD  # noqa: E402
+from session_memory import Spillable  # noqa: E402
+
+SIZES = [1, 100, 10_000, 1_000_000]
+
+# Faixas das variáveis que não são valores em R$
+_RANGES = {
+    "n": (1, 10),
+    "% Promotores": (0, 100),
+    "% Detratores": (0, 100),
+    "Frequência": (1, 24),
+    "Tempo de Relacionamento": (1, 120),
+}
+
+
+def synthetic_portfolio(n_rows, seed=42):
+    """Portfólio sintético com Empresa, Período e todos os inputs canônicos."""
+    rng = np.random.default_rng(seed)
+    data = {
+        ENTITY: [f"E{i // 12:06d}" for i in range(n_rows)],
+        PERIOD: [f"2024-{i % 12 + 1:02d}" for i in range(n_rows)],
+    }
+    for var in raw_inputs():
+        low, high = _RANGES.get(var, (1_000, 1_000_000))
+        values = rng.uniform(low, high, n_rows)
+        data[var] = np.round(values) if var == "n" else values
+    return pd.DataFrame(data)
+
+
+def _timed(fn, repeat):
+    # Mediana de `repeat` execuções, em ms, e o último resultado
+    samples, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+
+def _stage(ms, rows, total_rows):
+    return {"ms": round(ms, 3), "rows": rows, "rows_per_s": round(rows / ms * 1000, 1) if ms else None,
+            "sampled": rows < total_rows}
+
+
+def bench_scalar(table, limit, repeat):
+    records = table[raw_inputs()].head(limit).to_dict("records")
+    ms, graphs = _timed(lambda: [KPIGraph(rec) for rec in records], repeat)
+    return _stage(ms, len(records), len(table)), graphs
+
+
+def bench_batch(table, repeat):
+    ms, (valores, atingimentos) = _timed(lambda: score_batch(table), repeat)
+    return _stage(ms, len(table), len(table)), valores, atingimentos
+
+
+def bench_aggregation(graphs, total_rows, repeat):
+    ms, summaries = _timed(lambda: [summarize(g.values, g.achievements) for g in graphs], repeat)
+    return _stage(ms, len(graphs), total_rows), summaries[0]
+
+
+def bench_figures(graph, cat_perf, repeat):
+    ms, _ = _timed(lambda: build_figures(graph.achievements, cat_perf), repeat)
+    return {"ms": round(ms, 3)}
+
+
+def bench_excel(table, valores, atingimentos, limit, directory):
+    ids = [ENTITY, PERIOD]
+    # Amostra que cabe em uma aba: cada empresa/período vira uma linha por KPI
+    n = min(limit, EXCEL_MAX_ROWS // len(kpi_order()), len(table))
+    val = pd.concat([table[ids], valores], axis=1).head(n)
+    ach = pd.concat([table[ids], atingimentos], axis=1).head(n)
+    start = time.perf_counter()
+    path = export_report("Excel", ids + KPI_COLUMNS, portfolio_rows(val, ach, ids),
+                         summary_row(ach.drop(columns=ids).to_numpy()), directory=directory)
+    ms = (time.perf_counter() - start) * 1000
+    result = _stage(ms, n, len(table))
+    result["bytes"] = os.path.getsize(path)
+    os.remove(path)
+    return result
+
+
+def bench_rerun(table, valores, atingimentos, limit, reruns):
+    from streamlit.testing.v1 import AppTest
+    ids = [ENTITY, PERIOD]
+    n = min(limit, len(table))
+    at = AppTest.from_file(os.path.join(ROOT, "projeto.py"), default_timeout=600)
+    at.session_state["portfolio"] = Spillable({
+        "inputs": table.head(n),
+        "valores": pd.concat([table[ids], valores], axis=1).head(n),
+        "achievements": pd.concat([table[ids], atingimentos], axis=1).head(n),
+    })
+    at.run()  # primeira execução: importações e caches
+    samples = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        samples.append((time.perf_counter() - start) * 1000)
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    samples.sort()
+    result = _stage(statistics.median(samples), n, len(table))
+    result["p95_ms"] = round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3)
+    return result
+
+
+def run_suite(args):
+    results = []
+    for size in args.sizes:
+        print(f"-- {size} empresas/períodos", file=sys.stderr)
+        table = synthetic_portfolio(size)
+        entry = {"size": size}
+        entry["scalar"], graphs = bench_scalar(table, args.scalar_max, args.repeat)
+        entry["batch"], valores, atingimentos = bench_batch(table, args.repeat)
+        entry["aggregation"], resumo = bench_aggregation(graphs, size, args.repeat)
+        entry["figures"] = bench_figures(graphs[0], resumo["cat_perf"], args.repeat)
+        entry["excel"] = bench_excel(table, valores, atingimentos, args.export_max, args.tmpdir)
+        if not args.skip_rerun:
+            entry["rerun"] = bench_rerun(table, valores, atingimentos, args.rerun_max, args.reruns)
+        results.append(entry)
+    return results
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline, threshold, min_ms=1.0):
+    """Razão atual/base do ms de cada etapa; acima de `threshold` é regressão.
+
+    Etapas abaixo de `min_ms` nas duas execuções são só ruído e não contam.
+    """
+    base = {entry["size"]: entry for entry in baseline["results"]}
+    regressions = []
+    print(f"{'tamanho':>10} {'etapa':<12} {'base ms':>12} {'atual ms':>12} {'razão':>7}")
+    for entry in current["results"]:
+        old = base.get(entry["size"])
+        if old is None:
+            continue
+        for stage, metrics in entry.items():
+            if stage == "size" or stage not in old:
+                continue
+            # Amostras de tamanhos diferentes: compara por linha
+            before, after = old[stage]["ms"], metrics["ms"]
+            if "rows" in metrics and old[stage].get("rows") and metrics["rows"] != old[stage]["rows"]:
+                before, after = before / old[stage]["rows"], after / metrics["rows"]
+            ratio = after / before if before else float("inf")
+            noise = max(old[stage]["ms"], metrics["ms"]) < min_ms
+            flag = " <-- regressão" if ratio > threshold and not noise else ""
+            print(f"{entry['size']:>10} {stage:<12} {old[stage]['ms']:>12.2f} {metrics['ms']:>12.2f} {ratio:>7.2f}{flag}")
+            if flag:
+                regressions.append((entry["size"], stage, ratio))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=SIZES)
+    parser.add_argument("--repeat", type=int, default=3, help="execuções por etapa (mediana)")
+    parser.add_argument("--scalar-max", type=int, default=10_000, help="linhas no caminho escalar/agregação")
+    parser.add_argument("--export-max", type=int, default=10_000, help="empresas/períodos exportados no Excel")
+    parser.add_argument("--rerun-max", type=int, default=100_000, help="empresas/períodos carregados no AppTest")
+    parser.add_argument("--reruns", type=int, default=5)
+    parser.add_argument("--skip-rerun", action="store_true")
+    parser.add_argument("--tmpdir", default=None)
+    parser.add_argument("--output", help="grava os resultados em JSON")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparação")
+    parser.add_argument("--threshold", type=float, default=1.2, help="razão atual/base considerada regressão")
+    parser.add_argument("--min-ms", type=float, default=1.0, help="etapas mais rápidas que isso são ignoradas")
+    args = parser.parse_args()
+
+    # O histórico não participa das medições: banco temporário em arquivo
+    os.environ.setdefault("FPA_STORE_URL", "sqlite:///" + os.path.join(args.tmpdir or tempfile.gettempdir(), "fpa_bench.db"))
+    report = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "threshold", "min_ms")},
+        "results": run_suite(args),
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2, ensure_ascii=False)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            if compare(report, json.load(fh), args.threshold, args.min_ms):
+                sys.exit(1)
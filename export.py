@@ -0,0 +1,169 @@
+# ============================================
+# EXPORTAÇÃO DE RELATÓRIOS (EXCEL / PARQUET / CSV)
+# ============================================
+# As linhas são geradas sob demanda e gravadas direto em arquivo: o Excel usa
+# o modo constant_memory do xlsxwriter (cada linha é descarregada no disco
+# assim que escrita), o Parquet é gravado em lotes com pyarrow e o CSV linha a
+# linha. Assim o pico de memória não cresce com o número de empresas/períodos.
+#
+# O resumo (aba Resumo no Excel) vai no fim do CSV, em linhas marcadas com
+# "Resumo" na primeira coluna, e nos metadados do Parquet (chave
+# SUMMARY_METADATA_KEY, JSON {coluna: valor}) para não misturar com os dados.
+
+import csv
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from kpis import iter_kpis
+
+KPI_COLUMNS = ["Categoria", "KPI", "Valor Calculado", "Meta", "Achievement (%)", "Status", "Tipo"]
+SUMMARY_COLUMNS = ["Performance Geral (%)", "Total KPIs", "Acima da Meta", "Críticos", "Data"]
+FORMATS = {
+    "Excel": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "Parquet": (".parquet", "application/octet-stream"),
+    "CSV": (".csv", "text/csv"),
+}
+PARQUET_BATCH = 50_000
+SUMMARY_METADATA_KEY = b"fpa.resumo"
+SUMMARY_MARKER = "Resumo"
+EXCEL_MAX_ROWS = 1_048_575  # linhas de dados por aba (1.048.576 menos o cabeçalho)
+
+
+def _status(ach):
+    return "✅ Meta Atingida" if ach >= 100 else "⚠️ Abaixo da Meta" if ach < 70 else "🟡 Em Progresso"
+
+
+def _kpi_row(cat, kpi_name, cfg, value, ach):
+    return [cat, kpi_name, value, cfg['meta'], f"{ach:.1f}%", _status(ach), cfg['tipo']]
+
+
+def kpi_rows(calculated_values, achievements):
+    """Linhas da aba KPIs_Calculados para a empresa em tela."""
+    # Cópias feitas já na chamada (não dentro do gerador): a gravação roda em
+    # outro thread e o grafo pode mudar antes dela, desalinhando do resumo
+    calculated_values, achievements = dict(calculated_values), dict(achievements)
+    return (_kpi_row(cat, kpi_name, cfg, calculated_values.get(kpi_name, 0), achievements.get(kpi_name, 0))
+            for cat, kpi_name, cfg in iter_kpis())
+
+
+def portfolio_rows(valores, atingimentos, id_columns):
+    """Linhas de um portfólio calculado em lote (uma por empresa/período/KPI)."""
+    kpis = list(iter_kpis())
+    ids = valores[id_columns].astype(str).to_numpy() if id_columns else None
+    vals = valores[[k for _, k, _ in kpis]].to_numpy()
+    achs = atingimentos[[k for _, k, _ in kpis]].to_numpy()
+    for i in range(len(vals)):
+        prefix = list(ids[i]) if ids is not None else []
+        for j, (cat, kpi_name, cfg) in enumerate(kpis):
+            yield prefix + _kpi_row(cat, kpi_name, cfg, float(vals[i, j]), float(achs[i, j]))
+
+
+def summary_row(achievement_values):
+    """Linha da aba Resumo a partir de todos os achievements exportados."""
+    import numpy as np
+    achs = np.asarray(achievement_values, dtype=np.float64).ravel()
+    overall = float(achs.mean()) if achs.size else 0
+    return [f"{overall:.1f}%", int(achs.size), int((achs >= 100).sum()), int((achs < 50).sum()),
+            datetime.now().strftime("%d/%m/%Y %H:%M")]
+
+
+# ============================================
+# GRAVADORES
+# ============================================
+
+def write_excel(path, header, rows, summary):
+    import xlsxwriter
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    try:
+        # constant_memory exige escrita em ordem de linha: uma aba de cada vez.
+        # Acima do limite de linhas do Excel os dados continuam em
+        # KPIs_Calculados_2, _3... (cada aba com o próprio cabeçalho)
+        parte, r = 1, EXCEL_MAX_ROWS
+        for row in rows:
+            if r == EXCEL_MAX_ROWS:
+                sheet = workbook.add_worksheet('KPIs_Calculados' if parte == 1 else f'KPIs_Calculados_{parte}')
+                sheet.write_row(0, 0, header)
+                parte, r = parte + 1, 0
+            r += 1
+            if sheet.write_row(r, 0, row) < 0:
+                raise ValueError(f"Linha {r + 1} não gravada na aba {sheet.name}")
+        if parte == 1:
+            workbook.add_worksheet('KPIs_Calculados').write_row(0, 0, header)
+        resumo = workbook.add_worksheet('Resumo')
+        resumo.write_row(0, 0, SUMMARY_COLUMNS)
+        resumo.write_row(1, 0, summary)
+    finally:
+        workbook.close()
+
+
+def write_csv(path, header, rows, summary=None):
+    # utf-8-sig para o Excel abrir acentos corretamente; ";" é o padrão pt-BR
+    with open(path, "w", newline="", encoding="utf-8-sig") as fh:
+        writer = csv.writer(fh, delimiter=";")
+        writer.writerow(header)
+        writer.writerows(rows)
+        if summary is not None:
+            # Linha em branco e o resumo marcado: fácil de achar e de filtrar
+            writer.writerow([])
+            writer.writerow([SUMMARY_MARKER] + SUMMARY_COLUMNS)
+            writer.writerow([SUMMARY_MARKER] + list(summary))
+
+
+def write_parquet(path, header, rows, summary=None, batch_size=PARQUET_BATCH):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    metadata = None if summary is None else {
+        SUMMARY_METADATA_KEY: json.dumps(dict(zip(SUMMARY_COLUMNS, summary)), ensure_ascii=False).encode()}
+    writer = None
+    try:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                writer = _write_parquet_batch(pa, pq, writer, path, header, batch, metadata)
+                batch = []
+        if batch or writer is None:
+            writer = _write_parquet_batch(pa, pq, writer, path, header, batch, metadata)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _write_parquet_batch(pa, pq, writer, path, header, batch, metadata=None):
+    columns = list(zip(*batch)) if batch else [[] for _ in header]
+    types = {"Valor Calculado": pa.float64(), "Meta": pa.float64()}
+    table = pa.table({name: pa.array(col, type=types.get(name, pa.string()))
+                      for name, col in zip(header, columns)})
+    if writer is None:
+        writer = pq.ParquetWriter(path, table.schema.with_metadata(metadata))
+    writer.write_table(table.replace_schema_metadata(metadata))
+    return writer
+
+
+WRITERS = {"Excel": write_excel, "Parquet": write_parquet, "CSV": write_csv}
+
+
+def export_report(fmt, header, rows, summary, directory=None):
+    """Grava o relatório no formato pedido e devolve o caminho do arquivo."""
+    ext, _ = FORMATS[fmt]
+    fd, path = tempfile.mkstemp(prefix=f"fpa_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}_",
+                                suffix=ext, dir=directory)
+    os.close(fd)
+    try:
+        WRITERS[fmt](path, header, rows, summary)
+    except BaseException:
+        # Arquivo parcial não fica para trás
+        os.remove(path)
+        raise
+    return path
+
+
+# Exportações rodam fora do thread do Streamlit para a interface continuar responsiva
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="fpa-export")
+
+
+def submit_export(fmt, header, rows, summary):
+    return _executor.submit(export_report, fmt, header, rows, summary)
@@ -0,0 +1,279 @@
+# ============================================
+# IMPORTAÇÃO EM MASSA DOS INPUTS BRUTOS (CSV / XLSX / PARQUET)
+# ============================================
+# Mapeia as colunas de um arquivo para os inputs canônicos do painel
+# (chaves kpis.input_key) ou para as colunas do motor em lote
+# (kpi_batch.score_batch). Arquivos grandes são lidos em blocos: CSV com
+# chunksize, Parquet por lotes (pyarrow) e XLSX linha a linha via calamine.
+# pandas só é importado quando um arquivo é de fato lido.
+
+import os
+import unicodedata
+
+from kpis import iter_kpis, raw_inputs, input_key
+
+CHUNK_ROWS = 50_000
+
+# Colunas de identificação reconhecidas (não são inputs de KPI)
+ENTITY_COLUMNS = ("empresa", "entidade", "cnpj", "company")
+PERIOD_COLUMNS = ("periodo", "competencia", "period")
+# Período em duas colunas: combinadas em AAAA-MM (só o ano: AAAA)
+YEAR_COLUMNS = ("ano", "year", "exercicio")
+MONTH_COLUMNS = ("mes", "month")
+MONTHS = {name: i for i, names in enumerate(
+    [("jan", "janeiro"), ("fev", "fevereiro"), ("mar", "marco"), ("abr", "abril"), ("mai", "maio"),
+     ("jun", "junho"), ("jul", "julho"), ("ago", "agosto"), ("set", "setembro"), ("out", "outubro"),
+     ("nov", "novembro"), ("dez", "dezembro")], start=1) for name in names}
+SECTOR_COLUMNS = ("setor", "segmento", "sector")
+ENTITY = "Empresa"
+PERIOD = "Período"
+SECTOR = "Setor"
+
+
+def normalize_label(name):
+    """Rótulo para comparação: sem acentos, minúsculo e espaços simples.
+
+    "Receita_Líquida " -> "receita liquida". Usado no mapeamento de colunas
+    e nos rótulos das demonstrações (statements.py).
+    """
+    name = unicodedata.normalize("NFKD", str(name))
+    name = "".join(c for c in name if not unicodedata.combining(c))
+    return " ".join(name.lower().replace("_", " ").split())
+
+
+def _column_aliases():
+    # Além do nome da variável, aceita a chave do widget (input_Receita Bruta)
+    # e a antiga chave por KPI (f"{category}_{kpi_name}_{var}")
+    canonical = set(raw_inputs())
+    aliases = {}
+    for category, kpi_name, kpi_config in iter_kpis():
+        for var in kpi_config['inputs']:
+            if var in canonical:
+                aliases[normalize_label(input_key(var))] = var
+                aliases[normalize_label(f"{category}_{kpi_name}_{var}")] = var
+    return aliases
+
+
+def map_columns(columns):
+    """Associa cada coluna do arquivo a uma variável bruta do catálogo.
+
+    Aceita tanto o nome da variável ("Receita Bruta") quanto a chave do
+    widget; a comparação ignora maiúsculas, acentos e espaços extras.
+    Retorna (mapeamento coluna -> variável, colunas não mapeadas,
+    variáveis ausentes, coluna de empresa, coluna de período, coluna de setor).
+    Sem coluna de período única, ano e mês separados viram o período: a
+    coluna de período é então o par (coluna do ano, coluna do mês ou None).
+    """
+    by_name = {normalize_label(var): var for var in raw_inputs()}
+    by_key = _column_aliases()
+
+    mapping, unmapped = {}, []
+    entity_col = period_col = sector_col = year_col = month_col = None
+    for col in columns:
+        norm = normalize_label(col)
+        var = by_name.get(norm) or by_key.get(norm)
+        if var is not None and var not in mapping.values():
+            mapping[col] = var
+        elif entity_col is None and norm in ENTITY_COLUMNS:
+            entity_col = col
+        elif period_col is None and norm in PERIOD_COLUMNS:
+            period_col = col
+        elif year_col is None and norm in YEAR_COLUMNS:
+            year_col = col
+        elif month_col is None and norm in MONTH_COLUMNS:
+            month_col = col
+        elif sector_col is None and norm in SECTOR_COLUMNS:
+            sector_col = col
+        else:
+            unmapped.append(col)
+    if period_col is None and year_col is not None:
+        period_col = (year_col, month_col)
+    else:
+        # Já há coluna de período (ou falta o ano): ano/mês soltos não são usados
+        unmapped += [col for col in (year_col, month_col) if col is not None]
+    missing = [var for var in raw_inputs() if var not in mapping.values()]
+    return mapping, unmapped, missing, entity_col, period_col, sector_col
+
+
+def _period_from_parts(year, month):
+    # "2024" + "3" / "03" / "mar" / "Março" -> "2024-03"; sem mês -> "2024"
+    import pandas as pd
+    anos = pd.to_numeric(year, errors="coerce").astype("Int64").astype(str)
+    if month is None:
+        return anos.to_numpy()
+    nomes = month.astype(str).map(normalize_label)
+    meses = pd.to_numeric(month, errors="coerce").fillna(nomes.map(MONTHS)).astype("Int64")
+    return (anos + "-" + meses.astype(str).str.zfill(2)).to_numpy()
+
+
+def _file_kind(name):
+    ext = os.path.splitext(str(name))[1].lower()
+    if ext in (".xlsx", ".xlsm", ".xls", ".xlsb", ".ods"):
+        return "excel"
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    return "csv"
+
+
+def iter_chunks(source, name=None, chunk_rows=CHUNK_ROWS):
+    """Lê o arquivo em blocos de DataFrame, sem carregar tudo de uma vez.
+
+    `source` pode ser um caminho ou um objeto de arquivo (ex.: o retorno de
+    st.file_uploader); `name` define o formato quando `source` não tem nome.
+    """
+    import pandas as pd
+    kind = _file_kind(name or getattr(source, "name", source))
+    if kind == "parquet":
+        import pyarrow.parquet as pq
+        parquet = pq.ParquetFile(source)
+        for batch in parquet.iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    elif kind == "excel":
+        from python_calamine import CalamineWorkbook
+        if hasattr(source, "seek"):
+            source.seek(0)
+        workbook = CalamineWorkbook.from_filelike(source) if hasattr(source, "read") \
+            else CalamineWorkbook.from_path(source)
+        # Percorre a primeira aba linha a linha, montando blocos de chunk_rows
+        rows = workbook.get_sheet_by_index(0).iter_rows()
+        header = [str(c) for c in next(rows, [])]
+        block = []
+        for row in rows:
+            block.append(row)
+            if len(block) == chunk_rows:
+                yield pd.DataFrame(block, columns=header)
+                block = []
+        if block:
+            yield pd.DataFrame(block, columns=header)
+    else:
+        # Separador e convenção decimal detectados uma vez no início do
+        # arquivo; a leitura em si usa o parser em C (sep=None forçaria o
+        # engine "python", ~5x mais lento). utf-8-sig remove o BOM de exports
+        # do Excel
+        sep, decimal = sniff_csv(source)
+        thousands = "." if decimal == "," else ("," if sep != "," else None)
+        yield from pd.read_csv(source, sep=sep, decimal=decimal, thousands=thousands, encoding="utf-8-sig",
+                               chunksize=chunk_rows)
+
+
+def sniff_csv(source, sample_bytes=64 * 1024):
+    """(separador, separador decimal) de um CSV pelos primeiros bytes.
+
+    O separador é ";", ",", tab ou "|". A convenção vale para o arquivo
+    inteiro: com algum valor "1,5" na amostra, ou com ";" (padrão pt-BR) e
+    nenhum valor que só possa ser decimal com ponto ("1000.5"), a vírgula é
+    decimal e o ponto é milhar ("1.500" = 1500); senão, o inverso.
+    """
+    import csv
+    import re
+    if hasattr(source, "read"):
+        source.seek(0)
+        sample = source.read(sample_bytes)
+        source.seek(0)
+    else:
+        with open(source, "rb") as fh:
+            sample = fh.read(sample_bytes)
+    truncated = len(sample) == sample_bytes
+    if isinstance(sample, bytes):
+        sample = sample.decode("utf-8-sig", errors="ignore")
+    lines = sample.splitlines()
+    if truncated and len(lines) > 1:
+        lines = lines[:-1]  # última linha cortada no meio da amostra
+    try:
+        sep = csv.Sniffer().sniff("\n".join(lines[:50]), delimiters=";,\t|").delimiter
+    except csv.Error:
+        header = lines[0] if lines else ""
+        sep = max(";,\t|", key=header.count) if header else ","
+    cells = [cell.strip() for row in csv.reader(lines[1:], delimiter=sep) for cell in row]
+    comma_decimal = any(re.fullmatch(r"-?[\d.]*\d,\d+", cell) for cell in cells)
+    # "1000.5" / "1.5" só podem ser decimais; "1.500" e "1.234.567" podem ser milhares
+    dot_decimal = any(re.fullmatch(r"-?\d+\.\d+", cell) and not re.fullmatch(r"-?\d{1,3}(\.\d{3})+", cell)
+                      for cell in cells)
+    decimal = "," if comma_decimal or (sep == ";" and not dot_decimal) else "."
+    return sep, decimal
+
+
+def _to_number(series, decimal=None):
+    """Coluna numérica; textos seguem uma única convenção decimal.
+
+    `decimal` vem do arquivo (sniff_csv); sem ele (planilhas), a coluna é
+    pt-BR se algum valor tiver vírgula decimal ("1.234,56", "12,5"). Em
+    pt-BR o ponto é milhar ("1.500" = 1500), como em statements.parse_number.
+    """
+    import pandas as pd
+    if not pd.api.types.is_numeric_dtype(series):
+        text = series.astype(str).str.strip().str.replace("R$", "", regex=False).str.replace(" ", "", regex=False)
+        if decimal is None:
+            decimal = "," if text.str.fullmatch(r"-?[\d.]*\d,\d+").any() else "."
+        if decimal == ",":
+            text = text.str.replace(".", "", regex=False).str.replace(",", ".", regex=False)
+        else:
+            text = text.str.replace(",", "", regex=False)
+        return pd.to_numeric(text, errors="coerce").fillna(0.0)
+    return pd.to_numeric(series, errors="coerce").fillna(0.0)
+
+
+class ImportReport:
+    """Resumo do mapeamento de um arquivo importado."""
+
+    def __init__(self, mapping, unmapped, missing, entity_col, period_col, sector_col=None):
+        self.mapping = mapping
+        self.unmapped = unmapped
+        self.missing = missing
+        self.entity_col = entity_col
+        self.period_col = period_col
+        self.sector_col = sector_col
+        self.rows = 0
+        self.entities = []
+
+    def as_frame(self):
+        import pandas as pd
+        rows = [{"Coluna": col, "Status": "✅ Mapeada", "Input": var} for col, var in self.mapping.items()]
+        rows += [{"Coluna": col, "Status": "⚠️ Não mapeada", "Input": ""} for col in self.unmapped]
+        rows += [{"Coluna": "", "Status": "❌ Ausente (assumido 0)", "Input": var} for var in self.missing]
+        return pd.DataFrame(rows, columns=["Coluna", "Status", "Input"])
+
+
+def load_table(source, name=None, entity=None, chunk_rows=CHUNK_ROWS):
+    """Lê o arquivo em blocos e devolve (tabela de inputs, ImportReport).
+
+    A tabela tem uma coluna por variável bruta mapeada (pronta para
+    kpi_batch.score_batch) e, quando existirem, as colunas ENTITY ("Empresa")
+    e PERIOD ("Período"). Com `entity`, apenas as linhas dessa empresa são mantidas, o que
+    evita acumular arquivos multiempresa inteiros em memória.
+    """
+    import pandas as pd
+    report = None
+    parts = []
+    entities = set()
+    # Convenção decimal do arquivo (CSV); em planilhas, decidida por coluna
+    decimal = sniff_csv(source)[1] if _file_kind(name or getattr(source, "name", source)) == "csv" else None
+    for chunk in iter_chunks(source, name, chunk_rows):
+        if report is None:
+            report = ImportReport(*map_columns(chunk.columns))
+        report.rows += len(chunk)
+        if report.entity_col is not None:
+            entities.update(chunk[report.entity_col].dropna().astype(str).unique())
+            if entity is not None:
+                chunk = chunk[chunk[report.entity_col].astype(str) == str(entity)]
+        part = pd.DataFrame({var: _to_number(chunk[col], decimal) for col, var in report.mapping.items()},
+                            index=chunk.index)
+        ids = ((report.entity_col, ENTITY), (report.period_col, PERIOD), (report.sector_col, SECTOR))
+        for col, label in ids:
+            if isinstance(col, tuple):
+                part[label] = _period_from_parts(chunk[col[0]], None if col[1] is None else chunk[col[1]])
+            elif col is not None:
+                part[label] = chunk[col].astype(str).values
+        parts.append(part)
+
+    if report is None:
+        report = ImportReport({}, [], raw_inputs(), None, None)
+        return pd.DataFrame(columns=raw_inputs()), report
+    report.entities = sorted(entities)
+    table = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+    return table, report
+
+
+def row_inputs(row):
+    """Converte uma linha da tabela importada em {input canônico: valor}."""
+    return {var: float(row[var]) for var in raw_inputs() if var in row.index}
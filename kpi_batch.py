@@ -0,0 +1,144 @@
+# ============================================
+# MOTOR DE CÁLCULO EM LOTE (VETORIZADO)
+# ============================================
+# Calcula os 36 KPIs de kpis_definition e os respectivos achievements para uma
+# tabela inteira (uma linha por empresa/período, uma coluna por input bruto).
+# As fórmulas abaixo reproduzem exatamente os lambdas escalares de kpis.py,
+# inclusive a regra "divisor zero -> 0" e o achievement limitado a 100.
+# Inputs derivados (kpis.derived_inputs) usam o resultado do KPI a montante,
+# como no grafo incremental (kpi_graph.py).
+
+import numpy as np
+import pandas as pd
+
+from kpis import iter_kpis, raw_inputs, derived_inputs, kpi_order
+
+
+def _div(num, den):
+    # Divisão segura: onde o divisor é zero o resultado é 0 (igual ao escalar)
+    num = np.asarray(num, dtype=np.float64)
+    den = np.asarray(den, dtype=np.float64)
+    out = np.zeros(np.broadcast(num, den).shape, dtype=np.float64)
+    np.divide(num, den, out=out, where=den != 0)
+    return out
+
+
+def _py_pow(base, exp):
+    # Potência do Python (libm) para bater bit a bit com o lambda escalar;
+    # as implementações SIMD do NumPy podem diferir na última casa decimal
+    try:
+        out = base ** exp
+    except (ZeroDivisionError, OverflowError):
+        return np.nan
+    return np.nan if isinstance(out, complex) else out
+
+
+_pow = np.frompyfunc(_py_pow, 2, 1)
+
+
+def _cagr(v):
+    base = _div(v["Valor Final"], v["Valor Inicial"])
+    n = v["n"]
+    with np.errstate(invalid='ignore', over='ignore'):
+        out = (_pow(base, _div(1, n)).astype(np.float64) - 1) * 100
+    # n == 0, base negativa ou overflow caem no "except" do escalar -> 0
+    invalid = (v["Valor Inicial"] == 0) | (n == 0) | ~np.isfinite(out)
+    return np.where(invalid, 0.0, out)
+
+
+# Mesma ordem e mesmos nomes de kpis_definition
+vectorized_calcs = {
+    # 📈 KPIs Financeiros
+    "Receita Líquida (R$)": lambda v: v["Receita Bruta"] - v["Deduções"],
+    "Lucro Líquido (R$)": lambda v: v["Receita Total"] - v["Custos Totais"],
+    "Margem EBITDA (%)": lambda v: _div(v["EBITDA"], v["Receita Líquida"]) * 100,
+    "Margem Líquida (%)": lambda v: _div(v["Lucro Líquido"], v["Receita Líquida"]) * 100,
+    "ROE - Retorno sobre Patrimônio (%)": lambda v: _div(v["Lucro Líquido"], v["Patrimônio Líquido"]) * 100,
+    "ROA - Retorno sobre Ativos (%)": lambda v: _div(v["Lucro Líquido"], v["Ativo Total"]) * 100,
+    "ROIC - Retorno sobre Capital Investido (%)": lambda v: _div(v["NOPAT"], v["Capital Investido"]) * 100,
+    "CAC - Custo de Aquisição de Cliente (R$)": lambda v: _div(v["Investimento Marketing"], v["Novos Clientes"]),
+    "LTV - Lifetime Value do Cliente (R$)": lambda v: v["Ticket Médio"] * v["Frequência"] * v["Tempo de Relacionamento"],
+    "Relação LTV/CAC": lambda v: _div(v["LTV"], v["CAC"]),
+    # 💰 KPIs de Liquidez e Endividamento
+    "Liquidez Corrente": lambda v: _div(v["Ativo Circulante"], v["Passivo Circulante"]),
+    "Liquidez Seca": lambda v: _div(v["Ativo Circulante"] - v["Estoques"], v["Passivo Circulante"]),
+    "Liquidez Imediata": lambda v: _div(v["Disponível"], v["Passivo Circulante"]),
+    "Endividamento Geral (%)": lambda v: _div(v["Passivo Total"], v["Ativo Total"]) * 100,
+    "Dívida Líquida/EBITDA": lambda v: _div(v["Dívida Líquida"], v["EBITDA"]),
+    "Cobertura de Juros (TIE)": lambda v: _div(v["EBIT"], v["Despesas Financeiras"]),
+    # 🔄 KPIs de Eficiência Operacional
+    "Giro do Ativo": lambda v: _div(v["Receita Líquida"], v["Ativo Total Médio"]),
+    "PMR - Prazo Médio de Recebimento (dias)": lambda v: _div(v["Duplicatas a Receber"], v["Receita Bruta"]) * 360,
+    "PMP - Prazo Médio de Pagamento (dias)": lambda v: _div(v["Fornecedores"], v["Compras"]) * 360,
+    "PME - Prazo Médio de Estocagem (dias)": lambda v: _div(v["Estoque Médio"], v["CMV"]) * 360,
+    "Ciclo de Caixa (dias)": lambda v: v["PMR"] + v["PME"] - v["PMP"],
+    "Break-even Point (R$)": lambda v: _div(v["Custos Fixos"], v["Margem de Contribuição"]),
+    "Margem de Contribuição (%)": lambda v: _div(v["Receita"] - v["Custos Variáveis"], v["Receita"]) * 100,
+    # 📊 KPIs de Rentabilidade
+    "Crescimento da Receita (%)": lambda v: _div(v["Receita Atual"] - v["Receita Anterior"], v["Receita Anterior"]) * 100,
+    "CAGR - Taxa Anual Composta (%)": _cagr,
+    "Ticket Médio (R$)": lambda v: _div(v["Receita Total"], v["Número de Vendas"]),
+    "Churn Rate (%)": lambda v: _div(v["Clientes Perdidos"], v["Total Clientes"]) * 100,
+    "NPS - Net Promoter Score": lambda v: v["% Promotores"] - v["% Detratores"],
+    "Taxa de Conversão (%)": lambda v: _div(v["Vendas"], v["Leads"]) * 100,
+    # 👥 KPIs de Recursos Humanos
+    "Turnover (%)": lambda v: _div(v["Desligamentos"], v["Total Funcionários"]) * 100,
+    "Absenteísmo (%)": lambda v: _div(v["Total Faltas"], v["Total Dias Úteis"]) * 100,
+    "ROI de Treinamento (%)": lambda v: _div(v["Ganho Produtividade"] - v["Custo Treinamento"], v["Custo Treinamento"]) * 100,
+    "Produtividade por Funcionário (R$)": lambda v: _div(v["Receita Total"], v["Número Funcionários"]),
+}
+
+
+def achievement_vector(values, meta, tipo):
+    """Versão vetorizada de kpis.calculate_achievement."""
+    values = np.asarray(values, dtype=np.float64)
+    ok = (values > 0) & (meta > 0)
+    if tipo == "quanto_maior_melhor":
+        ratio = values / meta * 100 if meta > 0 else np.zeros_like(values)
+    else:
+        ratio = _div(meta, values) * 100
+    return np.where(ok, np.minimum(100, ratio), 0.0)
+
+
+def _columns(data, n_rows):
+    # Cada input bruto vira um vetor float64; coluna ausente = 0 (padrão do widget)
+    cols = {}
+    for var in raw_inputs():
+        if var in data:
+            cols[var] = np.asarray(data[var], dtype=np.float64)
+        else:
+            cols[var] = np.zeros(n_rows, dtype=np.float64)
+    return cols
+
+
+def score_batch(data):
+    """Calcula todos os KPIs e achievements de uma tabela de empresas/períodos.
+
+    `data` é um DataFrame (ou dict de arrays) com uma coluna por input canônico,
+    nomeada como em kpis_definition (ex.: "Receita Bruta"). Retorna dois
+    DataFrames com o mesmo índice da entrada e uma coluna por KPI: valores
+    calculados e % da meta atingida.
+    """
+    if isinstance(data, pd.DataFrame):
+        index = data.index
+    else:
+        index = pd.RangeIndex(len(next(iter(data.values()))) if data else 0)
+    cols = _columns(data, len(index))
+
+    configs = {kpi_name: kpi_config for _, kpi_name, kpi_config in iter_kpis()}
+    feeds = {}
+    for var, kpi_name in derived_inputs.items():
+        feeds.setdefault(kpi_name, []).append(var)
+
+    values, achievements = {}, {}
+    for kpi_name in kpi_order():
+        kpi_config = configs[kpi_name]
+        kpi_values = np.broadcast_to(vectorized_calcs[kpi_name](cols), (len(index),))
+        values[kpi_name] = kpi_values
+        achievements[kpi_name] = achievement_vector(kpi_values, kpi_config['meta'], kpi_config['tipo'])
+        for var in feeds.get(kpi_name, []):
+            cols[var] = kpi_values
+
+    # Colunas na ordem do catálogo
+    return (pd.DataFrame({k: values[k] for k in configs}, index=index, copy=False),
+            pd.DataFrame({k: achievements[k] for k in configs}, index=index, copy=False))
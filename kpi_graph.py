@@ -0,0 +1,111 @@
+# ============================================
+# GRAFO INCREMENTAL DE KPIs
+# ============================================
+# Cada input canônico é um nó único; cada KPI depende dos seus inputs e, via
+# kpis.derived_inputs, do resultado de outros KPIs (ex.: "Relação LTV/CAC"
+# usa os KPIs LTV e CAC). Alterar um input marca como "sujos" apenas os KPIs
+# a jusante, e recompute() recalcula somente esses, em ordem topológica.
+#
+# Nomes, arestas e fechos a jusante ficam no catálogo do processo
+# (kpis.catalog(), somente leitura); cada grafo guarda só três array('d')
+# indexados pelos ids de input/KPI, o conjunto de sujos e o último recálculo.
+
+from array import array
+from collections.abc import Mapping
+
+from kpis import catalog, calculate_kpi, calculate_achievement
+
+
+class ArrayMapping(Mapping):
+    """Visão somente leitura nome -> valor de um array, na ordem do catálogo."""
+
+    __slots__ = ("_names", "_index", "_data")
+
+    def __init__(self, names, index, data):
+        self._names, self._index, self._data = names, index, data
+
+    def __getitem__(self, name):
+        return self._data[self._index[name]]
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class KPIGraph:
+    __slots__ = ("catalog", "_inputs", "_values", "_achievements", "dirty", "last_recomputed")
+
+    def __init__(self, initial_inputs=None):
+        self.catalog = catalog()
+        n_inputs, n_kpis = len(self.catalog.input_names), len(self.catalog.kpi_names)
+        self._inputs = array('d', bytes(8 * n_inputs))
+        self._values = array('d', bytes(8 * n_kpis))
+        self._achievements = array('d', bytes(8 * n_kpis))
+        index = self.catalog.input_index
+        for var, value in (initial_inputs or {}).items():
+            if var in index:
+                self._inputs[index[var]] = value
+        self.dirty = set(range(n_kpis))
+        self.last_recomputed = []
+        self.recompute()
+
+    # Visões por nome (dicts na ordem do catálogo: a análise usa essa ordem no radar)
+    @property
+    def inputs(self):
+        return ArrayMapping(self.catalog.input_names, self.catalog.input_index, self._inputs)
+
+    @property
+    def values(self):
+        return ArrayMapping(self.catalog.kpi_names, self.catalog.kpi_index, self._values)
+
+    @property
+    def achievements(self):
+        return ArrayMapping(self.catalog.kpi_names, self.catalog.kpi_index, self._achievements)
+
+    def nbytes(self):
+        """Bytes do estado próprio do grafo (o catálogo é compartilhado)."""
+        arrays = (self._inputs, self._values, self._achievements)
+        return sum(a.itemsize * len(a) for a in arrays) + 28 * (len(self.dirty) + len(self.last_recomputed))
+
+    def downstream(self, var):
+        """Todos os KPIs afetados (direta ou indiretamente) por um input."""
+        names = self.catalog.kpi_names
+        return {names[k] for k in self.catalog.input_downstream[self.catalog.input_index[var]]}
+
+    def set_input(self, var, value):
+        """Atualiza um input; retorna True se o valor mudou."""
+        i = self.catalog.input_index[var]
+        if self._inputs[i] == value:
+            return False
+        self._inputs[i] = value
+        self.dirty |= self.catalog.input_downstream[i]
+        return True
+
+    def _formula_inputs(self, k):
+        return {var: self._values[j] if derived else self._inputs[j]
+                for var, derived, j in self.catalog.sources[k]}
+
+    def kpi_inputs(self, kpi_name):
+        """Valores usados na fórmula do KPI (inputs e resultados a montante)."""
+        return self._formula_inputs(self.catalog.kpi_index[kpi_name])
+
+    def recompute(self):
+        """Recalcula só os KPIs sujos; retorna a lista dos recalculados."""
+        cat = self.catalog
+        recomputed = []
+        for k in sorted(self.dirty, key=cat.position.__getitem__):
+            kpi_value = calculate_kpi(cat.configs[cat.kpi_names[k]], self._formula_inputs(k))
+            self._values[k] = kpi_value
+            self._achievements[k] = calculate_achievement(kpi_value, cat.metas[k], cat.tipos[k])
+            recomputed.append(cat.kpi_names[k])
+        self.dirty.clear()
+        self.last_recomputed = recomputed
+        return recomputed
@@ -0,0 +1,340 @@
+# ============================================
+# CATÁLOGO DE KPIs - DEFINIÇÃO DE CADA KPI COM SEUS INPUTS E CÁLCULO
+# ============================================
+# Módulo sem dependências pesadas: é importado pelo painel (projeto.py), pelo
+# grafo incremental (kpi_graph.py) e pelo motor em lote (kpi_batch.py), que
+# reproduz as mesmas fórmulas.
+
+from functools import lru_cache
+from types import MappingProxyType
+
+kpis_definition = {
+    "📈 KPIs Financeiros": {
+        "Receita Líquida (R$)": {
+            "inputs": ["Receita Bruta", "Deduções"],
+            "calc": lambda vals: vals["Receita Bruta"] - vals["Deduções"],
+            "meta": 1000000, "tipo": "quanto_maior_melhor"
+        },
+        "Lucro Líquido (R$)": {
+            "inputs": ["Receita Total", "Custos Totais"],
+            "calc": lambda vals: vals["Receita Total"] - vals["Custos Totais"],
+            "meta": 200000, "tipo": "quanto_maior_melhor"
+        },
+        "Margem EBITDA (%)": {
+            "inputs": ["EBITDA", "Receita Líquida"],
+            "calc": lambda vals: (vals["EBITDA"] / vals["Receita Líquida"]) * 100 if vals["Receita Líquida"] != 0 else 0,
+            "meta": 25, "tipo": "quanto_maior_melhor"
+        },
+        "Margem Líquida (%)": {
+            "inputs": ["Lucro Líquido", "Receita Líquida"],
+            "calc": lambda vals: (vals["Lucro Líquido"] / vals["Receita Líquida"]) * 100 if vals["Receita Líquida"] != 0 else 0,
+            "meta": 15, "tipo": "quanto_maior_melhor"
+        },
+        "ROE - Retorno sobre Patrimônio (%)": {
+            "inputs": ["Lucro Líquido", "Patrimônio Líquido"],
+            "calc": lambda vals: (vals["Lucro Líquido"] / vals["Patrimônio Líquido"]) * 100 if vals["Patrimônio Líquido"] != 0 else 0,
+            "meta": 20, "tipo": "quanto_maior_melhor"
+        },
+        "ROA - Retorno sobre Ativos (%)": {
+            "inputs": ["Lucro Líquido", "Ativo Total"],
+            "calc": lambda vals: (vals["Lucro Líquido"] / vals["Ativo Total"]) * 100 if vals["Ativo Total"] != 0 else 0,
+            "meta": 12, "tipo": "quanto_maior_melhor"
+        },
+        "ROIC - Retorno sobre Capital Investido (%)": {
+            "inputs": ["NOPAT", "Capital Investido"],
+            "calc": lambda vals: (vals["NOPAT"] / vals["Capital Investido"]) * 100 if vals["Capital Investido"] != 0 else 0,
+            "meta": 18, "tipo": "quanto_maior_melhor"
+        },
+        "CAC - Custo de Aquisição de Cliente (R$)": {
+            "inputs": ["Investimento Marketing", "Novos Clientes"],
+            "calc": lambda vals: vals["Investimento Marketing"] / vals["Novos Clientes"] if vals["Novos Clientes"] != 0 else 0,
+            "meta": 500, "tipo": "quanto_menor_melhor"
+        },
+        "LTV - Lifetime Value do Cliente (R$)": {
+            "inputs": ["Ticket Médio", "Frequência", "Tempo de Relacionamento"],
+            "calc": lambda vals: vals["Ticket Médio"] * vals["Frequência"] * vals["Tempo de Relacionamento"],
+            "meta": 5000, "tipo": "quanto_maior_melhor"
+        },
+        "Relação LTV/CAC": {
+            "inputs": ["LTV", "CAC"],
+            "calc": lambda vals: vals["LTV"] / vals["CAC"] if vals["CAC"] != 0 else 0,
+            "meta": 3, "tipo": "quanto_maior_melhor"
+        },
+    },
+    "💰 KPIs de Liquidez e Endividamento": {
+        "Liquidez Corrente": {
+            "inputs": ["Ativo Circulante", "Passivo Circulante"],
+            "calc": lambda vals: vals["Ativo Circulante"] / vals["Passivo Circulante"] if vals["Passivo Circulante"] != 0 else 0,
+            "meta": 1.5, "tipo": "quanto_maior_melhor"
+        },
+        "Liquidez Seca": {
+            "inputs": ["Ativo Circulante", "Estoques", "Passivo Circulante"],
+            "calc": lambda vals: (vals["Ativo Circulante"] - vals["Estoques"]) / vals["Passivo Circulante"] if vals["Passivo Circulante"] != 0 else 0,
+            "meta": 1, "tipo": "quanto_maior_melhor"
+        },
+        "Liquidez Imediata": {
+            "inputs": ["Disponível", "Passivo Circulante"],
+            "calc": lambda vals: vals["Disponível"] / vals["Passivo Circulante"] if vals["Passivo Circulante"] != 0 else 0,
+            "meta": 0.3, "tipo": "quanto_maior_melhor"
+        },
+        "Endividamento Geral (%)": {
+            "inputs": ["Passivo Total", "Ativo Total"],
+            "calc": lambda vals: (vals["Passivo Total"] / vals["Ativo Total"]) * 100 if vals["Ativo Total"] != 0 else 0,
+            "meta": 50, "tipo": "quanto_menor_melhor"
+        },
+        "Dívida Líquida/EBITDA": {
+            "inputs": ["Dívida Líquida", "EBITDA"],
+            "calc": lambda vals: vals["Dívida Líquida"] / vals["EBITDA"] if vals["EBITDA"] != 0 else 0,
+            "meta": 3, "tipo": "quanto_menor_melhor"
+        },
+        "Cobertura de Juros (TIE)": {
+            "inputs": ["EBIT", "Despesas Financeiras"],
+            "calc": lambda vals: vals["EBIT"] / vals["Despesas Financeiras"] if vals["Despesas Financeiras"] != 0 else 0,
+            "meta": 2.5, "tipo": "quanto_maior_melhor"
+        },
+    },
+    "🔄 KPIs de Eficiência Operacional": {
+        "Giro do Ativo": {
+            "inputs": ["Receita Líquida", "Ativo Total Médio"],
+            "calc": lambda vals: vals["Receita Líquida"] / vals["Ativo Total Médio"] if vals["Ativo Total Médio"] != 0 else 0,
+            "meta": 1.2, "tipo": "quanto_maior_melhor"
+        },
+        "PMR - Prazo Médio de Recebimento (dias)": {
+            "inputs": ["Duplicatas a Receber", "Receita Bruta"],
+            "calc": lambda vals: (vals["Duplicatas a Receber"] / vals["Receita Bruta"]) * 360 if vals["Receita Bruta"] != 0 else 0,
+            "meta": 30, "tipo": "quanto_menor_melhor"
+        },
+        "PMP - Prazo Médio de Pagamento (dias)": {
+            "inputs": ["Fornecedores", "Compras"],
+            "calc": lambda vals: (vals["Fornecedores"] / vals["Compras"]) * 360 if vals["Compras"] != 0 else 0,
+            "meta": 60, "tipo": "quanto_maior_melhor"
+        },
+        "PME - Prazo Médio de Estocagem (dias)": {
+            "inputs": ["Estoque Médio", "CMV"],
+            "calc": lambda vals: (vals["Estoque Médio"] / vals["CMV"]) * 360 if vals["CMV"] != 0 else 0,
+            "meta": 45, "tipo": "quanto_menor_melhor"
+        },
+        "Ciclo de Caixa (dias)": {
+            "inputs": ["PMR", "PME", "PMP"],
+            "calc": lambda vals: vals["PMR"] + vals["PME"] - vals["PMP"],
+            "meta": 15, "tipo": "quanto_menor_melhor"
+        },
+        "Break-even Point (R$)": {
+            "inputs": ["Custos Fixos", "Margem de Contribuição"],
+            "calc": lambda vals: vals["Custos Fixos"] / vals["Margem de Contribuição"] if vals["Margem de Contribuição"] != 0 else 0,
+            "meta": 500000, "tipo": "quanto_menor_melhor"
+        },
+        "Margem de Contribuição (%)": {
+            "inputs": ["Receita", "Custos Variáveis"],
+            "calc": lambda vals: ((vals["Receita"] - vals["Custos Variáveis"]) / vals["Receita"]) * 100 if vals["Receita"] != 0 else 0,
+            "meta": 40, "tipo": "quanto_maior_melhor"
+        },
+    },
+    "📊 KPIs de Rentabilidade": {
+        "Crescimento da Receita (%)": {
+            "inputs": ["Receita Atual", "Receita Anterior"],
+            "calc": lambda vals: ((vals["Receita Atual"] - vals["Receita Anterior"]) / vals["Receita Anterior"]) * 100 if vals["Receita Anterior"] != 0 else 0,
+            "meta": 15, "tipo": "quanto_maior_melhor"
+        },
+        "CAGR - Taxa Anual Composta (%)": {
+            "inputs": ["Valor Final", "Valor Inicial", "n"],
+            "calc": lambda vals: ((vals["Valor Final"] / vals["Valor Inicial"]) ** (1 / vals["n"]) - 1) * 100 if vals["Valor Inicial"] != 0 else 0,
+            "meta": 12, "tipo": "quanto_maior_melhor"
+        },
+        "Ticket Médio (R$)": {
+            "inputs": ["Receita Total", "Número de Vendas"],
+            "calc": lambda vals: vals["Receita Total"] / vals["Número de Vendas"] if vals["Número de Vendas"] != 0 else 0,
+            "meta": 1000, "tipo": "quanto_maior_melhor"
+        },
+        "Churn Rate (%)": {
+            "inputs": ["Clientes Perdidos", "Total Clientes"],
+            "calc": lambda vals: (vals["Clientes Perdidos"] / vals["Total Clientes"]) * 100 if vals["Total Clientes"] != 0 else 0,
+            "meta": 5, "tipo": "quanto_menor_melhor"
+        },
+        "NPS - Net Promoter Score": {
+            "inputs": ["% Promotores", "% Detratores"],
+            "calc": lambda vals: vals["% Promotores"] - vals["% Detratores"],
+            "meta": 50, "tipo": "quanto_maior_melhor"
+        },
+        "Taxa de Conversão (%)": {
+            "inputs": ["Vendas", "Leads"],
+            "calc": lambda vals: (vals["Vendas"] / vals["Leads"]) * 100 if vals["Leads"] != 0 else 0,
+            "meta": 25, "tipo": "quanto_maior_melhor"
+        },
+    },
+    "👥 KPIs de Recursos Humanos": {
+        "Turnover (%)": {
+            "inputs": ["Desligamentos", "Total Funcionários"],
+            "calc": lambda vals: (vals["Desligamentos"] / vals["Total Funcionários"]) * 100 if vals["Total Funcionários"] != 0 else 0,
+            "meta": 10, "tipo": "quanto_menor_melhor"
+        },
+        "Absenteísmo (%)": {
+            "inputs": ["Total Faltas", "Total Dias Úteis"],
+            "calc": lambda vals: (vals["Total Faltas"] / vals["Total Dias Úteis"]) * 100 if vals["Total Dias Úteis"] != 0 else 0,
+            "meta": 3, "tipo": "quanto_menor_melhor"
+        },
+        "ROI de Treinamento (%)": {
+            "inputs": ["Ganho Produtividade", "Custo Treinamento"],
+            "calc": lambda vals: ((vals["Ganho Produtividade"] - vals["Custo Treinamento"]) / vals["Custo Treinamento"]) * 100 if vals["Custo Treinamento"] != 0 else 0,
+            "meta": 200, "tipo": "quanto_maior_melhor"
+        },
+        "Produtividade por Funcionário (R$)": {
+            "inputs": ["Receita Total", "Número Funcionários"],
+            "calc": lambda vals: vals["Receita Total"] / vals["Número Funcionários"] if vals["Número Funcionários"] != 0 else 0,
+            "meta": 250000, "tipo": "quanto_maior_melhor"
+        },
+    }
+}
+
+
+# ============================================
+# CÁLCULO ESCALAR (UMA EMPRESA)
+# ============================================
+
+def calculate_kpi(kpi_config, input_dict):
+    """Aplica a fórmula do KPI; entradas inválidas resultam em 0.0."""
+    try:
+        kpi_value = kpi_config['calc'](input_dict)
+    except Exception:
+        kpi_value = 0.0
+    # Ex.: CAGR com base negativa gera número complexo em Python
+    if isinstance(kpi_value, complex):
+        kpi_value = 0.0
+    return kpi_value
+
+
+def calculate_achievement(kpi_value, meta, tipo):
+    """% da meta atingida, limitado a 100."""
+    if kpi_value > 0 and meta > 0:
+        if tipo == "quanto_maior_melhor":
+            return min(100, (kpi_value / meta) * 100)
+        return min(100, (meta / kpi_value) * 100)
+    return 0.0
+
+
+def iter_kpis():
+    """Percorre o catálogo como (categoria, nome do KPI, configuração)."""
+    for category, category_kpis in kpis_definition.items():
+        for kpi_name, kpi_config in category_kpis.items():
+            yield category, kpi_name, kpi_config
+
+
+# ============================================
+# GRAFO DE DEPENDÊNCIAS ENTRE INPUTS E KPIs
+# ============================================
+
+# Inputs que não são digitados: vêm do resultado de outro KPI do catálogo
+derived_inputs = {
+    "Receita Líquida": "Receita Líquida (R$)",
+    "Lucro Líquido": "Lucro Líquido (R$)",
+    "LTV": "LTV - Lifetime Value do Cliente (R$)",
+    "CAC": "CAC - Custo de Aquisição de Cliente (R$)",
+    "Ticket Médio": "Ticket Médio (R$)",
+    "PMR": "PMR - Prazo Médio de Recebimento (dias)",
+    "PME": "PME - Prazo Médio de Estocagem (dias)",
+    "PMP": "PMP - Prazo Médio de Pagamento (dias)",
+}
+
+
+def input_key(var):
+    """Chave única (session_state / widget) de um input canônico."""
+    return f"input_{var}"
+
+
+def raw_inputs():
+    """Inputs canônicos (digitados), sem repetição e na ordem do catálogo."""
+    names = []
+    for _, _, kpi_config in iter_kpis():
+        for var in kpi_config['inputs']:
+            if var not in names and var not in derived_inputs:
+                names.append(var)
+    return names
+
+
+def kpi_order():
+    """Nomes dos KPIs em ordem topológica (dependências antes dos dependentes)."""
+    configs = {kpi_name: kpi_config for _, kpi_name, kpi_config in iter_kpis()}
+    order, visiting = [], set()
+
+    def visit(kpi_name):
+        if kpi_name in order:
+            return
+        if kpi_name in visiting:
+            raise ValueError(f"Dependência circular envolvendo {kpi_name}")
+        visiting.add(kpi_name)
+        for var in configs[kpi_name]['inputs']:
+            if var in derived_inputs:
+                visit(derived_inputs[var])
+        visiting.discard(kpi_name)
+        order.append(kpi_name)
+
+    for kpi_name in configs:
+        visit(kpi_name)
+    return order
+
+
+# ============================================
+# CATÁLOGO COMPILADO (UM POR PROCESSO, SOMENTE LEITURA)
+# ============================================
+
+class KPICatalog:
+    """Nomes, índices e arestas do grafo de KPIs, compartilhados por todas as sessões.
+
+    Inputs brutos e KPIs ganham um id inteiro (posição em `input_names` /
+    `kpi_names`); o estado de cada sessão (kpi_graph.KPIGraph) guarda só
+    arrays de float indexados por esses ids.
+    """
+
+    def __init__(self):
+        self.kpi_names = tuple(kpi_name for _, kpi_name, _ in iter_kpis())
+        self.input_names = tuple(raw_inputs())
+        self.kpi_index = MappingProxyType({k: i for i, k in enumerate(self.kpi_names)})
+        self.input_index = MappingProxyType({v: i for i, v in enumerate(self.input_names)})
+        self.configs = MappingProxyType({kpi_name: cfg for _, kpi_name, cfg in iter_kpis()})
+        # KPI onde cada input canônico é digitado (primeira ocorrência no catálogo)
+        owner = {}
+        for category, kpi_name, cfg in iter_kpis():
+            for var in cfg['inputs']:
+                if var not in derived_inputs:
+                    owner.setdefault(var, (category, kpi_name))
+        self.input_owner = MappingProxyType(owner)
+        # Posição de cada KPI na ordem topológica (recompute ordena por ela)
+        order = kpi_order()
+        self.position = tuple(order.index(k) for k in self.kpi_names)
+        self.metas = tuple(self.configs[k]['meta'] for k in self.kpi_names)
+        self.tipos = tuple(self.configs[k]['tipo'] for k in self.kpi_names)
+
+        # Arestas diretas: input -> KPIs e KPI -> KPIs que usam seu resultado
+        input_consumers = [[] for _ in self.input_names]
+        kpi_consumers = [[] for _ in self.kpi_names]
+        for k, kpi_name in enumerate(self.kpi_names):
+            for var in self.configs[kpi_name]['inputs']:
+                if var in derived_inputs:
+                    kpi_consumers[self.kpi_index[derived_inputs[var]]].append(k)
+                else:
+                    input_consumers[self.input_index[var]].append(k)
+        self.kpi_consumers = tuple(tuple(c) for c in kpi_consumers)
+        # Fecho transitivo por input: set_input não percorre o grafo a cada edição
+        self.input_downstream = tuple(frozenset(self._closure(c)) for c in input_consumers)
+
+        # Origem de cada variável de cada fórmula: (nome, é derivada?, id)
+        self.sources = tuple(
+            tuple((var, True, self.kpi_index[derived_inputs[var]]) if var in derived_inputs
+                  else (var, False, self.input_index[var])
+                  for var in self.configs[kpi_name]['inputs'])
+            for kpi_name in self.kpi_names)
+
+    def _closure(self, start):
+        seen, stack = set(), list(start)
+        while stack:
+            k = stack.pop()
+            if k not in seen:
+                seen.add(k)
+                stack.extend(self.kpi_consumers[k])
+        return seen
+
+
+@lru_cache(maxsize=None)
+def catalog():
+    """KPICatalog do processo (montado na primeira chamada)."""
+    return KPICatalog()
@@ -0,0 +1,153 @@
+# ============================================
+# BENCHMARKING ENTRE PARES (SETOR E PORTE)
+# ============================================
+# Para cada grupo de pares e KPI mantém um array NumPy ordenado com os valores
+# de todos os snapshots do histórico. O percentil de qualquer empresa sai de
+# duas buscas binárias (np.searchsorted, O(log n)), sem varrer o portfólio.
+# Novos períodos entram por upsert: os valores antigos da mesma
+# empresa/período saem por posição e os novos são intercalados (merge de dois
+# arrays já ordenados), sem reordenar a distribuição inteira.
+#
+# Grupos, do mais específico ao mais amplo: (setor, porte), (setor, todos),
+# (todos, porte), (todos, todos). A comparação usa o primeiro grupo com pelo
+# menos MIN_PEERS valores, sem contar os snapshots da própria empresa.
+
+import threading
+
+import numpy as np
+
+from kpis import iter_kpis
+
+ALL = "Todos"
+MIN_PEERS = 5
+# Porte pela receita bruta (faixas do BNDES, R$ por ano)
+SIZE_BANDS = [(360_000, "Micro"), (4_800_000, "Pequena"), (300_000_000, "Média"), (float("inf"), "Grande")]
+
+
+def annual_revenue(receita_bruta, period=None):
+    """Receita anualizada pelo formato do período: AAAA-MM x 12, AAAA-Tn x 4."""
+    receita = float(receita_bruta or 0.0)
+    _, sep, sub = str(period or "").partition("-")
+    if sep and sub.isdigit():
+        return receita * 12
+    if sep and sub[:1].upper() in ("T", "Q") and sub[1:].isdigit():
+        return receita * 4
+    return receita
+
+
+def size_band(receita_bruta):
+    """Porte pela receita bruta anual (use annual_revenue para períodos menores)."""
+    for limite, nome in SIZE_BANDS:
+        if receita_bruta <= limite:
+            return nome
+    return SIZE_BANDS[-1][1]
+
+
+def group_keys(sector, band):
+    """Grupos de pares de uma empresa, do mais específico ao mais amplo."""
+    keys = [(sector, band), (sector, ALL)] if sector else []
+    return keys + [(ALL, band), (ALL, ALL)]
+
+
+def _group_label(key):
+    sector, band = key
+    if key == (ALL, ALL):
+        return "toda a base"
+    if band == ALL:
+        return f"setor {sector}"
+    if sector == ALL:
+        return f"porte {band}"
+    return f"{sector} · {band}"
+
+
+def _remove_sorted(arr, values):
+    # Remove um exemplar de cada valor (já presentes em arr), inclusive repetidos
+    values = np.sort(values)
+    repeat = np.arange(len(values)) - np.searchsorted(values, values, side="left")
+    return np.delete(arr, np.searchsorted(arr, values, side="left") + repeat)
+
+
+class PeerIndex:
+    """Distribuições ordenadas por (grupo, KPI), compartilhadas entre sessões."""
+
+    def __init__(self):
+        self.tipos = {kpi_name: cfg['tipo'] for _, kpi_name, cfg in iter_kpis()}
+        self._sorted = {}    # (grupo, kpi) -> np.ndarray ordenado
+        self._members = {}   # (empresa, período) -> (grupos, {kpi: valor})
+        self._periods = {}   # empresa -> períodos no índice
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_store(cls, store):
+        index = cls()
+        index.upsert_many(store.peer_records())
+        return index
+
+    def __len__(self):
+        return len(self._members)
+
+    def upsert_many(self, records):
+        """Inclui/atualiza snapshots (empresa, período, setor, receita, {kpi: valor})."""
+        removed, added = {}, {}
+        with self._lock:
+            for company, period, sector, receita, values in records:
+                key = (str(company), str(period))
+                previous = self._members.get(key)
+                if previous is not None:
+                    for group in previous[0]:
+                        for kpi_name, value in previous[1].items():
+                            removed.setdefault((group, kpi_name), []).append(value)
+                values = {k: float(v) for k, v in values.items() if k in self.tipos and np.isfinite(v)}
+                groups = group_keys(sector, size_band(annual_revenue(receita, period)))
+                self._members[key] = (groups, values)
+                self._periods.setdefault(key[0], set()).add(key[1])
+                for group in groups:
+                    for kpi_name, value in values.items():
+                        added.setdefault((group, kpi_name), []).append(value)
+
+            for slot, values in removed.items():
+                self._sorted[slot] = _remove_sorted(self._sorted[slot], np.asarray(values))
+            for slot, values in added.items():
+                current = self._sorted.get(slot)
+                new = np.sort(np.asarray(values, dtype=np.float64))
+                # Timsort reconhece as duas sequências ordenadas: merge linear
+                self._sorted[slot] = new if current is None else \
+                    np.sort(np.concatenate([current, new]), kind="stable")
+
+    def distribution(self, group, kpi_name):
+        return self._sorted.get((group, kpi_name), np.empty(0))
+
+    def _own_values(self, company, kpi_name):
+        # {grupo: [valores]} do KPI em todos os snapshots da empresa
+        own = {}
+        if company is None:
+            return own
+        with self._lock:
+            for period in self._periods.get(str(company), ()):
+                groups, values = self._members[(str(company), period)]
+                if kpi_name in values:
+                    for group in groups:
+                        own.setdefault(group, []).append(values[kpi_name])
+        return own
+
+    def rank(self, kpi_name, value, sector=None, receita_bruta=0.0, period=None, company=None):
+        """(percentil 0-100, nº de pares, grupo) ou None se não há pares.
+
+        O percentil é a fração dos pares que a empresa supera, já no sentido
+        do KPI (em "quanto_menor_melhor", valores menores são melhores);
+        empates contam pela metade. O porte vem da receita anualizada pelo
+        formato de `period`, e os snapshots de `company` ficam fora da conta.
+        """
+        own = self._own_values(company, kpi_name)
+        for group in group_keys(sector, size_band(annual_revenue(receita_bruta, period))):
+            arr = self._sorted.get((group, kpi_name))
+            mine = np.asarray(own.get(group, ()), dtype=np.float64)
+            if arr is None or len(arr) - len(mine) < MIN_PEERS:
+                continue
+            n = len(arr) - len(mine)
+            left, right = np.searchsorted(arr, value, side="left"), np.searchsorted(arr, value, side="right")
+            below = left - int((mine < value).sum())
+            ties = right - left - int((mine == value).sum())
+            better = below if self.tipos[kpi_name] == "quanto_maior_melhor" else n - below - ties
+            return float(100.0 * (better + 0.5 * ties) / n), n, _group_label(group)
+        return None
@@ -0,0 +1,133 @@
+# ============================================
+# GRÁFICOS DO PORTFÓLIO (AGREGAÇÃO NO SERVIDOR)
+# ============================================
+# Heatmap empresa x KPI, dispersão entre dois KPIs e tendências em pequenos
+# múltiplos para portfólios calculados em lote. Tudo é agregado aqui, antes
+# de virar figura, para que o JSON enviado ao navegador tenha tamanho
+# limitado independentemente do número de empresas/períodos:
+#   - heatmap: no máximo MAX_HEAT_ROWS linhas (empresas agrupadas por ranking)
+#   - dispersão: até POINT_BUDGET pontos em WebGL (Scattergl); acima disso,
+#     densidade 2D com DENSITY_BINS x DENSITY_BINS células
+#   - tendências: mediana e faixa P25-P75 por período, até MAX_PERIODS períodos
+
+import numpy as np
+
+from importer import ENTITY, PERIOD
+
+MAX_HEAT_ROWS = 60
+POINT_BUDGET = 20_000
+DENSITY_BINS = 120
+MAX_PERIODS = 120
+
+
+def kpi_columns(frame):
+    return [c for c in frame.columns if c not in (ENTITY, PERIOD)]
+
+
+def latest_per_entity(frame):
+    """Último período de cada empresa (ou a tabela inteira sem essas colunas)."""
+    if ENTITY not in frame.columns or PERIOD not in frame.columns:
+        return frame
+    ordered = frame.sort_values(PERIOD, kind="stable")
+    return ordered.drop_duplicates(ENTITY, keep="last")
+
+
+def payload_bytes(fig):
+    """Tamanho do JSON da figura, o que de fato vai para o navegador."""
+    return len(fig.to_json())
+
+
+def heatmap_figure(achievements, max_rows=MAX_HEAT_ROWS):
+    """Achievement (%) empresa x KPI; acima de `max_rows` empresas, faixas do ranking.
+
+    As empresas são ordenadas pela performance média; com mais de `max_rows`,
+    cada linha do heatmap é a média de um grupo contíguo do ranking
+    (ex.: "#1-#250"), calculada com np.add.reduceat.
+    """
+    import plotly.graph_objects as go
+    latest = latest_per_entity(achievements)
+    kpis = kpi_columns(latest)
+    matrix = latest[kpis].to_numpy(dtype=np.float64)
+    labels = (latest[ENTITY].astype(str).to_numpy() if ENTITY in latest.columns
+              else latest.index.astype(str).to_numpy())
+
+    order = np.argsort(-np.nanmean(matrix, axis=1), kind="stable")
+    matrix, labels = matrix[order], labels[order]
+    n = len(matrix)
+    if n > max_rows:
+        starts = np.linspace(0, n, max_rows + 1).astype(int)[:-1]
+        sizes = np.diff(np.append(starts, n))
+        matrix = np.add.reduceat(np.nan_to_num(matrix), starts, axis=0) / sizes[:, None]
+        labels = [f"#{s + 1}-#{s + size} ({size})" for s, size in zip(starts, sizes)]
+
+    fig = go.Figure(go.Heatmap(
+        z=np.round(matrix, 1), x=kpis, y=list(labels), zmin=0, zmax=100,
+        colorscale="RdYlGn", colorbar=dict(title="Achievement (%)"),
+        hovertemplate="%{y}<br>%{x}: %{z:.1f}%<extra></extra>",
+    ))
+    titulo = "Achievement por empresa e KPI" + (f" ({n} empresas em {max_rows} faixas do ranking)" if n > max_rows else "")
+    fig.update_layout(title=titulo, height=max(400, 18 * len(labels) + 200),
+                      yaxis=dict(autorange="reversed"), xaxis=dict(tickangle=-45))
+    return fig
+
+
+def scatter_figure(valores, x_kpi, y_kpi, point_budget=POINT_BUDGET, bins=DENSITY_BINS):
+    """Dispersão entre dois KPIs: Scattergl até `point_budget` pontos, densidade acima."""
+    import plotly.graph_objects as go
+    x = valores[x_kpi].to_numpy(dtype=np.float64)
+    y = valores[y_kpi].to_numpy(dtype=np.float64)
+    ok = np.isfinite(x) & np.isfinite(y)
+    x, y = x[ok], y[ok]
+    n = len(x)
+
+    if n <= point_budget:
+        text = None
+        if ENTITY in valores.columns:
+            ids = valores.loc[ok, ENTITY].astype(str)
+            if PERIOD in valores.columns:
+                ids = ids + " · " + valores.loc[ok, PERIOD].astype(str)
+            text = ids.to_numpy()
+        fig = go.Figure(go.Scattergl(x=x, y=y, mode="markers", text=text,
+                                     marker=dict(size=5, color="#1E88E5", opacity=0.6),
+                                     hovertemplate="%{text}<br>%{x:,.2f} / %{y:,.2f}<extra></extra>" if text is not None else None))
+        titulo = f"{y_kpi} x {x_kpi} ({n:,} pontos)"
+    else:
+        # Recorte P1-P99: poucos extremos não achatam a distribuição inteira
+        x_range = np.percentile(x, [1, 99])
+        y_range = np.percentile(y, [1, 99])
+        counts, x_edges, y_edges = np.histogram2d(x, y, bins=bins, range=[x_range, y_range])
+        counts[counts == 0] = np.nan
+        fig = go.Figure(go.Heatmap(
+            z=counts.T, x=(x_edges[:-1] + x_edges[1:]) / 2, y=(y_edges[:-1] + y_edges[1:]) / 2,
+            colorscale="Blues", colorbar=dict(title="Empresas"),
+            hovertemplate=f"{x_kpi}: %{{x:,.2f}}<br>{y_kpi}: %{{y:,.2f}}<br>%{{z}} empresas<extra></extra>",
+        ))
+        titulo = f"{y_kpi} x {x_kpi} (densidade de {n:,} pontos, P1-P99)"
+    fig.update_layout(title=titulo, xaxis_title=x_kpi, yaxis_title=y_kpi, height=550)
+    return fig
+
+
+def trend_figure(valores, kpis, max_periods=MAX_PERIODS, cols=3):
+    """Pequenos múltiplos: mediana e faixa P25-P75 de cada KPI por período."""
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+    quantis = valores.groupby(PERIOD, sort=True)[kpis].quantile([0.25, 0.5, 0.75]).unstack()
+    if len(quantis) > max_periods:
+        # Períodos espaçados de forma uniforme, sempre com o último
+        keep = np.unique(np.linspace(0, len(quantis) - 1, max_periods).astype(int))
+        quantis = quantis.iloc[keep]
+    periodos = quantis.index.astype(str).tolist()
+
+    rows = -(-len(kpis) // cols)
+    fig = make_subplots(rows=rows, cols=cols, subplot_titles=kpis, vertical_spacing=0.08 if rows > 1 else 0.2)
+    for i, kpi_name in enumerate(kpis):
+        row, col = i // cols + 1, i % cols + 1
+        fig.add_trace(go.Scatter(x=periodos, y=quantis[(kpi_name, 0.75)], mode="lines", line=dict(width=0),
+                                 showlegend=False, hoverinfo="skip"), row=row, col=col)
+        fig.add_trace(go.Scatter(x=periodos, y=quantis[(kpi_name, 0.25)], mode="lines", line=dict(width=0),
+                                 fill="tonexty", fillcolor="rgba(30, 136, 229, 0.2)",
+                                 name="P25-P75", showlegend=i == 0), row=row, col=col)
+        fig.add_trace(go.Scatter(x=periodos, y=quantis[(kpi_name, 0.5)], mode="lines+markers",
+                                 line=dict(color="#0D47A1"), name="Mediana", showlegend=i == 0), row=row, col=col)
+    fig.update_layout(height=260 * rows, title="Tendência do portfólio (mediana e P25-P75)")
+    return fig
@@ -0,0 +1,140 @@
+# ============================================
+# INSTRUMENTAÇÃO POR ETAPA E PERFIL DE UM RERUN
+# ============================================
+# Cronometra as etapas de um rerun (widgets das abas, cálculo dos KPIs,
+# análise/plotly, exportação) e grava cada rerun como uma linha JSON no
+# logger "fpa.perf" (stderr, ou o arquivo de FPA_PERF_LOG). Cada sessão
+# roda no seu próprio thread do Streamlit, então o rerun corrente fica em um
+# threading.local: módulos como analysis.py usam stage() sem receber nada.
+# Desligado (padrão), stage() devolve um nullcontext compartilhado.
+
+import contextlib
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+ENABLED_BY_DEFAULT = os.environ.get("FPA_TIMING", "") == "1"
+
+_local = threading.local()
+_NULL = contextlib.nullcontext()
+_logger = None
+
+
+class RerunTimer:
+    """Tempos acumulados por etapa (ms) de um único rerun."""
+
+    def __init__(self, escopo):
+        self.escopo = escopo
+        self.inicio = time.perf_counter()
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - inicio) * 1000
+
+    def total_ms(self):
+        return (time.perf_counter() - self.inicio) * 1000
+
+
+def start_rerun(escopo="app"):
+    """Inicia a medição do rerun corrente neste thread."""
+    _local.timer = RerunTimer(escopo)
+    return _local.timer
+
+
+def finish_rerun():
+    """Encerra a medição e devolve {escopo, total_ms, etapas} (ou None)."""
+    timer = getattr(_local, "timer", None)
+    _local.timer = None
+    if timer is None:
+        return None
+    return {"escopo": timer.escopo, "total_ms": round(timer.total_ms(), 3),
+            "etapas": {name: round(ms, 3) for name, ms in timer.stages.items()}}
+
+
+def stage(name):
+    """Context manager da etapa `name` no rerun medido (no-op se desligado)."""
+    timer = getattr(_local, "timer", None)
+    return _NULL if timer is None else timer.stage(name)
+
+
+def perf_logger():
+    global _logger
+    if _logger is None:
+        logger = logging.getLogger("fpa.perf")
+        if not logger.handlers:
+            path = os.environ.get("FPA_PERF_LOG")
+            handler = logging.FileHandler(path, encoding="utf-8") if path else logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        _logger = logger
+    return _logger
+
+
+def log_event(event, **fields):
+    """Uma linha JSON por evento (ex.: {"event": "rerun", "etapas": {...}})."""
+    record = {"event": event, "ts": datetime.now().isoformat(timespec="milliseconds"), **fields}
+    perf_logger().info(json.dumps(record, ensure_ascii=False, default=str))
+
+
+def percentiles(samples):
+    """(n, p50, p95) de uma lista de tempos em ms."""
+    ordered = sorted(samples)
+    n = len(ordered)
+    return n, ordered[n // 2], ordered[min(n - 1, int(n * 0.95))]
+
+
+# ============================================
+# PERFIL (cProfile) DE UM RERUN
+# ============================================
+
+def start_profile():
+    discard_profile()
+    profiler = cProfile.Profile()
+    _local.profiler = profiler
+    profiler.enable()
+    return profiler
+
+
+def discard_profile():
+    """Desliga o profiler de um rerun interrompido antes de finish_profile.
+
+    O script do Streamlit é módulo de topo (não há como envolvê-lo num
+    try/finally): o próximo rerun, que roda no mesmo thread, faz a limpeza.
+    """
+    profiler = getattr(_local, "profiler", None)
+    _local.profiler = None
+    if profiler is not None:
+        profiler.disable()
+
+
+def finish_profile(profiler, top=40):
+    """Para o profiler e devolve (bytes do .prof, resumo texto por tempo acumulado)."""
+    try:
+        profiler.disable()
+    finally:
+        _local.profiler = None
+    fd, path = tempfile.mkstemp(suffix=".prof")
+    os.close(fd)
+    try:
+        profiler.dump_stats(path)
+        with open(path, "rb") as fh:
+            raw = fh.read()
+    finally:
+        os.remove(path)
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(top)
+    return raw, text.getvalue()
@@ -1,10 +1,41 @@
+import time
+import uuid
+from collections import deque
+
 import streamlit as st
-import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
+import os
 from io import BytesIO
 from datetime import datetime
 
+# Só módulos leves no topo: pandas, plotly, SQLAlchemy e pyarrow são
+# importados dentro dos trechos que os usam (importação, histórico, análise,
+# portfólio e questionário), fora do caminho da primeira renderização
+from kpis import kpis_definition, derived_inputs, input_key
+from kpi_graph import KPIGraph
+from analysis import LRUCache, cached_analysis, MAIN_KPIS
+from export import FORMATS, KPI_COLUMNS, kpi_rows, portfolio_rows, summary_row, submit_export
+from importer import ENTITY, PERIOD, SECTOR
+import profiling
+from session_memory import SessionRegistry, Spillable, process_rss
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOGO_PATH = os.path.join(BASE_DIR, "static", "logo_reali.png")
+
+# Início do rerun completo (ver "Tempos de rerun" na barra lateral)
+_inicio_rerun = time.perf_counter()
+
+# Medição por etapa e perfil cProfile, ambos opcionais (painel "Tempos de rerun")
+_instrumentar = st.session_state.get("instrumentar", profiling.ENABLED_BY_DEFAULT)
+if _instrumentar:
+    profiling.start_rerun("app")
+else:
+    profiling.finish_rerun()  # descarta medição de um rerun interrompido
+if st.session_state.pop("perfilar_proximo", False):
+    _profiler = profiling.start_profile()
+else:
+    profiling.discard_profile()  # profiler de um rerun interrompido não fica ligado
+    _profiler = None
+
 # Configuração da Página
 st.set_page_config(page_title="Painel FP&A - Reali Consultoria", layout='wide', page_icon="📊")
 
@@ -62,213 +93,362 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def carregar_logo():
+    # Logo do próprio repositório (sem ida ao GitHub), lido uma vez por processo.
+    # static/logo_reali.png é o "R Reali azul 1.png" reduzido a 1460 px: acima
+    # dessa largura o st.image redimensiona o original (~7000 px) a cada rerun
+    with open(LOGO_PATH, "rb") as fh:
+        return fh.read()
+
+
 # Logo
 col1, col2, col3 = st.columns([1, 1, 1])
 with col2:
-    st.image("https://raw.githubusercontent.com/DaniloNs-creator/MATURITY/main/R%20Reali%20azul%201.png", use_container_width=True)
+    st.image(carregar_logo(), use_container_width=True)
 
 st.markdown('<div class="fpna-header"><h1>📊 PAINEL FP&A - Análise Completa de KPIs</h1><p>Insira os dados brutos e os indicadores são calculados automaticamente</p></div>', unsafe_allow_html=True)
 
-# Inicializar session state para armazenar os valores dos inputs
-if 'input_values' not in st.session_state:
-    st.session_state.input_values = {}
+# Grafo incremental: um nó por input canônico, KPIs derivados alimentados
+# pelos resultados a montante (ver kpi_graph.py). É o único lugar da sessão
+# com os valores dos inputs: arrays indexados pelo catálogo do processo
+if 'kpi_graph' not in st.session_state:
+    st.session_state.kpi_graph = KPIGraph()
+graph = st.session_state.kpi_graph
+
+
+def aplicar_inputs(valores):
+    # Preenche os formulários com valores vindos de fora dos widgets
+    for var, value in valores.items():
+        graph.set_input(var, float(value))
+        # Remove o estado do widget para que ele reinicie com o novo valor
+        st.session_state.pop(input_key(var), None)
+
+
+@st.cache_resource
+def sessoes():
+    # Registro único por processo: atividade e memória de cada sessão; sessões
+    # ociosas têm o portfólio descarregado em disco (ver session_memory.py)
+    return SessionRegistry()
+
+
+def tocar_sessao():
+    # Reruns só de fragmento (formulários das abas, pasta monitorada, polling
+    # da exportação) também contam como atividade: a sessão não é descarregada
+    if "sessao_id" in st.session_state:
+        sessoes().ping(st.session_state.sessao_id)
+
+
+def portfolio_atual():
+    # O portfólio fica num Spillable: volta do disco se a sessão ficou ociosa
+    slot = st.session_state.get("portfolio")
+    return None if slot is None else slot.get()
 
 # ============================================
-# DEFINIÇÃO DE CADA KPI COM SEUS INPUTS E CÁLCULO
+# IMPORTAÇÃO DE DADOS (CSV / XLSX / PARQUET)
 # ============================================
 
-kpis_definition = {
-    "📈 KPIs Financeiros": {
-        "Receita Líquida (R$)": {
-            "inputs": ["Receita Bruta", "Deduções"],
-            "calc": lambda vals: vals["Receita Bruta"] - vals["Deduções"],
-            "meta": 1000000, "tipo": "quanto_maior_melhor"
-        },
-        "Lucro Líquido (R$)": {
-            "inputs": ["Receita Total", "Custos Totais"],
-            "calc": lambda vals: vals["Receita Total"] - vals["Custos Totais"],
-            "meta": 200000, "tipo": "quanto_maior_melhor"
-        },
-        "Margem EBITDA (%)": {
-            "inputs": ["EBITDA", "Receita Líquida"],
-            "calc": lambda vals: (vals["EBITDA"] / vals["Receita Líquida"]) * 100 if vals["Receita Líquida"] != 0 else 0,
-            "meta": 25, "tipo": "quanto_maior_melhor"
-        },
-        "Margem Líquida (%)": {
-            "inputs": ["Lucro Líquido", "Receita Líquida"],
-            "calc": lambda vals: (vals["Lucro Líquido"] / vals["Receita Líquida"]) * 100 if vals["Receita Líquida"] != 0 else 0,
-            "meta": 15, "tipo": "quanto_maior_melhor"
-        },
-        "ROE - Retorno sobre Patrimônio (%)": {
-            "inputs": ["Lucro Líquido", "Patrimônio Líquido"],
-            "calc": lambda vals: (vals["Lucro Líquido"] / vals["Patrimônio Líquido"]) * 100 if vals["Patrimônio Líquido"] != 0 else 0,
-            "meta": 20, "tipo": "quanto_maior_melhor"
-        },
-        "ROA - Retorno sobre Ativos (%)": {
-            "inputs": ["Lucro Líquido", "Ativo Total"],
-            "calc": lambda vals: (vals["Lucro Líquido"] / vals["Ativo Total"]) * 100 if vals["Ativo Total"] != 0 else 0,
-            "meta": 12, "tipo": "quanto_maior_melhor"
-        },
-        "ROIC - Retorno sobre Capital Investido (%)": {
-            "inputs": ["NOPAT", "Capital Investido"],
-            "calc": lambda vals: (vals["NOPAT"] / vals["Capital Investido"]) * 100 if vals["Capital Investido"] != 0 else 0,
-            "meta": 18, "tipo": "quanto_maior_melhor"
-        },
-        "CAC - Custo de Aquisição de Cliente (R$)": {
-            "inputs": ["Investimento Marketing", "Novos Clientes"],
-            "calc": lambda vals: vals["Investimento Marketing"] / vals["Novos Clientes"] if vals["Novos Clientes"] != 0 else 0,
-            "meta": 500, "tipo": "quanto_menor_melhor"
-        },
-        "LTV - Lifetime Value do Cliente (R$)": {
-            "inputs": ["Ticket Médio", "Frequência", "Tempo de Relacionamento"],
-            "calc": lambda vals: vals["Ticket Médio"] * vals["Frequência"] * vals["Tempo de Relacionamento"],
-            "meta": 5000, "tipo": "quanto_maior_melhor"
-        },
-        "Relação LTV/CAC": {
-            "inputs": ["LTV", "CAC"],
-            "calc": lambda vals: vals["LTV"] / vals["CAC"] if vals["CAC"] != 0 else 0,
-            "meta": 3, "tipo": "quanto_maior_melhor"
-        },
-    },
-    "💰 KPIs de Liquidez e Endividamento": {
-        "Liquidez Corrente": {
-            "inputs": ["Ativo Circulante", "Passivo Circulante"],
-            "calc": lambda vals: vals["Ativo Circulante"] / vals["Passivo Circulante"] if vals["Passivo Circulante"] != 0 else 0,
-            "meta": 1.5, "tipo": "quanto_maior_melhor"
-        },
-        "Liquidez Seca": {
-            "inputs": ["Ativo Circulante", "Estoques", "Passivo Circulante"],
-            "calc": lambda vals: (vals["Ativo Circulante"] - vals["Estoques"]) / vals["Passivo Circulante"] if vals["Passivo Circulante"] != 0 else 0,
-            "meta": 1, "tipo": "quanto_maior_melhor"
-        },
-        "Liquidez Imediata": {
-            "inputs": ["Disponível", "Passivo Circulante"],
-            "calc": lambda vals: vals["Disponível"] / vals["Passivo Circulante"] if vals["Passivo Circulante"] != 0 else 0,
-            "meta": 0.3, "tipo": "quanto_maior_melhor"
-        },
-        "Endividamento Geral (%)": {
-            "inputs": ["Passivo Total", "Ativo Total"],
-            "calc": lambda vals: (vals["Passivo Total"] / vals["Ativo Total"]) * 100 if vals["Ativo Total"] != 0 else 0,
-            "meta": 50, "tipo": "quanto_menor_melhor"
-        },
-        "Dívida Líquida/EBITDA": {
-            "inputs": ["Dívida Líquida", "EBITDA"],
-            "calc": lambda vals: vals["Dívida Líquida"] / vals["EBITDA"] if vals["EBITDA"] != 0 else 0,
-            "meta": 3, "tipo": "quanto_menor_melhor"
-        },
-        "Cobertura de Juros (TIE)": {
-            "inputs": ["EBIT", "Despesas Financeiras"],
-            "calc": lambda vals: vals["EBIT"] / vals["Despesas Financeiras"] if vals["Despesas Financeiras"] != 0 else 0,
-            "meta": 2.5, "tipo": "quanto_maior_melhor"
-        },
-    },
-    "🔄 KPIs de Eficiência Operacional": {
-        "Giro do Ativo": {
-            "inputs": ["Receita Líquida", "Ativo Total Médio"],
-            "calc": lambda vals: vals["Receita Líquida"] / vals["Ativo Total Médio"] if vals["Ativo Total Médio"] != 0 else 0,
-            "meta": 1.2, "tipo": "quanto_maior_melhor"
-        },
-        "PMR - Prazo Médio de Recebimento (dias)": {
-            "inputs": ["Duplicatas a Receber", "Receita Bruta"],
-            "calc": lambda vals: (vals["Duplicatas a Receber"] / vals["Receita Bruta"]) * 360 if vals["Receita Bruta"] != 0 else 0,
-            "meta": 30, "tipo": "quanto_menor_melhor"
-        },
-        "PMP - Prazo Médio de Pagamento (dias)": {
-            "inputs": ["Fornecedores", "Compras"],
-            "calc": lambda vals: (vals["Fornecedores"] / vals["Compras"]) * 360 if vals["Compras"] != 0 else 0,
-            "meta": 60, "tipo": "quanto_maior_melhor"
-        },
-        "PME - Prazo Médio de Estocagem (dias)": {
-            "inputs": ["Estoque Médio", "CMV"],
-            "calc": lambda vals: (vals["Estoque Médio"] / vals["CMV"]) * 360 if vals["CMV"] != 0 else 0,
-            "meta": 45, "tipo": "quanto_menor_melhor"
-        },
-        "Ciclo de Caixa (dias)": {
-            "inputs": ["PMR", "PME", "PMP"],
-            "calc": lambda vals: vals["PMR"] + vals["PME"] - vals["PMP"],
-            "meta": 15, "tipo": "quanto_menor_melhor"
-        },
-        "Break-even Point (R$)": {
-            "inputs": ["Custos Fixos", "Margem de Contribuição"],
-            "calc": lambda vals: vals["Custos Fixos"] / vals["Margem de Contribuição"] if vals["Margem de Contribuição"] != 0 else 0,
-            "meta": 500000, "tipo": "quanto_menor_melhor"
-        },
-        "Margem de Contribuição (%)": {
-            "inputs": ["Receita", "Custos Variáveis"],
-            "calc": lambda vals: ((vals["Receita"] - vals["Custos Variáveis"]) / vals["Receita"]) * 100 if vals["Receita"] != 0 else 0,
-            "meta": 40, "tipo": "quanto_maior_melhor"
-        },
-    },
-    "📊 KPIs de Rentabilidade": {
-        "Crescimento da Receita (%)": {
-            "inputs": ["Receita Atual", "Receita Anterior"],
-            "calc": lambda vals: ((vals["Receita Atual"] - vals["Receita Anterior"]) / vals["Receita Anterior"]) * 100 if vals["Receita Anterior"] != 0 else 0,
-            "meta": 15, "tipo": "quanto_maior_melhor"
-        },
-        "CAGR - Taxa Anual Composta (%)": {
-            "inputs": ["Valor Final", "Valor Inicial", "n"],
-            "calc": lambda vals: ((vals["Valor Final"] / vals["Valor Inicial"]) ** (1 / vals["n"]) - 1) * 100 if vals["Valor Inicial"] != 0 else 0,
-            "meta": 12, "tipo": "quanto_maior_melhor"
-        },
-        "Ticket Médio (R$)": {
-            "inputs": ["Receita Total", "Número de Vendas"],
-            "calc": lambda vals: vals["Receita Total"] / vals["Número de Vendas"] if vals["Número de Vendas"] != 0 else 0,
-            "meta": 1000, "tipo": "quanto_maior_melhor"
-        },
-        "Churn Rate (%)": {
-            "inputs": ["Clientes Perdidos", "Total Clientes"],
-            "calc": lambda vals: (vals["Clientes Perdidos"] / vals["Total Clientes"]) * 100 if vals["Total Clientes"] != 0 else 0,
-            "meta": 5, "tipo": "quanto_menor_melhor"
-        },
-        "NPS - Net Promoter Score": {
-            "inputs": ["% Promotores", "% Detratores"],
-            "calc": lambda vals: vals["% Promotores"] - vals["% Detratores"],
-            "meta": 50, "tipo": "quanto_maior_melhor"
-        },
-        "Taxa de Conversão (%)": {
-            "inputs": ["Vendas", "Leads"],
-            "calc": lambda vals: (vals["Vendas"] / vals["Leads"]) * 100 if vals["Leads"] != 0 else 0,
-            "meta": 25, "tipo": "quanto_maior_melhor"
-        },
-    },
-    "👥 KPIs de Recursos Humanos": {
-        "Turnover (%)": {
-            "inputs": ["Desligamentos", "Total Funcionários"],
-            "calc": lambda vals: (vals["Desligamentos"] / vals["Total Funcionários"]) * 100 if vals["Total Funcionários"] != 0 else 0,
-            "meta": 10, "tipo": "quanto_menor_melhor"
-        },
-        "Absenteísmo (%)": {
-            "inputs": ["Total Faltas", "Total Dias Úteis"],
-            "calc": lambda vals: (vals["Total Faltas"] / vals["Total Dias Úteis"]) * 100 if vals["Total Dias Úteis"] != 0 else 0,
-            "meta": 3, "tipo": "quanto_menor_melhor"
-        },
-        "ROI de Treinamento (%)": {
-            "inputs": ["Ganho Produtividade", "Custo Treinamento"],
-            "calc": lambda vals: ((vals["Ganho Produtividade"] - vals["Custo Treinamento"]) / vals["Custo Treinamento"]) * 100 if vals["Custo Treinamento"] != 0 else 0,
-            "meta": 200, "tipo": "quanto_maior_melhor"
-        },
-        "Produtividade por Funcionário (R$)": {
-            "inputs": ["Receita Total", "Número Funcionários"],
-            "calc": lambda vals: vals["Receita Total"] / vals["Número Funcionários"] if vals["Número Funcionários"] != 0 else 0,
-            "meta": 250000, "tipo": "quanto_maior_melhor"
-        },
-    }
-}
+@st.cache_data(show_spinner="Lendo arquivo...", max_entries=4)
+def carregar_arquivo(conteudo, nome):
+    from importer import load_table
+    return load_table(BytesIO(conteudo), name=nome)
+
+
+@st.cache_resource
+def leitor_demonstracoes():
+    # Pool de processos e cache por hash de conteúdo, compartilhados por todas
+    # as sessões: reenviar o mesmo PDF/planilha não o lê de novo (statements.py)
+    from statements import StatementIngestor
+    return StatementIngestor()
+
+
+@st.cache_resource
+def pasta_monitorada(caminho):
+    # Um DropFolder por pasta e por processo: as sessões compartilham as
+    # impressões digitais, os resultados e o leitor de demonstrações (watcher.py)
+    from watcher import DropFolder
+    return DropFolder(caminho, ingestor=leitor_demonstracoes())
+
+
+def render_pasta(caminho):
+    # Varre a pasta; só arquivos novos/alterados/removidos são relidos e
+    # recalculados. Sem mudanças, a varredura leva poucos milissegundos
+    tocar_sessao()
+    pasta = pasta_monitorada(caminho)
+    st.button("Atualizar agora", use_container_width=True)  # o clique reexecuta o fragmento
+    with st.spinner("Verificando a pasta..."), profiling.stage("pasta"):
+        varredura = pasta.refresh()
+    st.caption(f"Última varredura: {varredura.summary()}")
+    for nome, erro in varredura.erros.items():
+        st.warning(f"{nome}: {erro}")
+
+    relatorio = pasta.last_report
+    if relatorio is not None and relatorio.cruzamentos is not None:
+        with st.expander(f"Cruzamentos de faixa ({len(relatorio.cruzamentos)})"):
+            st.caption(relatorio.summary())
+            st.dataframe(relatorio.cruzamentos, use_container_width=True, hide_index=True)
+
+    # Resultados novos (desta ou de outra sessão): troca o portfólio em tela
+    if pasta.valores is not None and st.session_state.get("pasta_versao") != (caminho, pasta.version):
+        st.session_state.pasta_versao = (caminho, pasta.version)
+        st.session_state.portfolio = Spillable(pasta.portfolio())
+        st.rerun(scope="app")
+
+
+def calcular_portfolio(tabela):
+    # Todas as linhas de uma vez no motor em lote
+    import pandas as pd
+    from kpi_batch import score_batch
+    valores, atingimentos = score_batch(tabela)
+    ids = [c for c in (ENTITY, PERIOD) if c in tabela.columns]
+    st.session_state.portfolio = Spillable({
+        "inputs": tabela,
+        "valores": pd.concat([tabela[ids], valores], axis=1),
+        "achievements": pd.concat([tabela[ids], atingimentos], axis=1),
+    })
+
+with st.sidebar:
+    st.markdown("### 📥 Importar Dados")
+    arquivo = st.file_uploader("Arquivo de inputs", type=["csv", "xlsx", "xlsm", "xls", "parquet"],
+                               help="Uma coluna por input (ex.: 'Receita Bruta') e, opcionalmente, 'Empresa' e 'Período'.")
+    if arquivo is not None:
+        conteudo = arquivo.getvalue()
+        tabela, relatorio = carregar_arquivo(conteudo, arquivo.name)
+        st.caption(f"{relatorio.rows} linhas · {len(relatorio.mapping)} colunas mapeadas · "
+                   f"{len(relatorio.unmapped)} não mapeadas · {len(relatorio.missing)} inputs ausentes")
+        with st.expander("Relatório de mapeamento"):
+            st.dataframe(relatorio.as_frame(), use_container_width=True, hide_index=True)
+
+        # Preencher o formulário com uma empresa/período
+        linhas = tabela
+        if relatorio.entities:
+            entidade = st.selectbox("Empresa", relatorio.entities)
+            linhas = tabela[tabela[ENTITY] == entidade]
+        if PERIOD in linhas.columns and len(linhas) > 1:
+            periodo = st.selectbox("Período", list(linhas[PERIOD]))
+            linhas = linhas[linhas[PERIOD] == periodo]
+        if st.button("Preencher formulário", use_container_width=True, disabled=linhas.empty):
+            from importer import row_inputs
+            aplicar_inputs(row_inputs(linhas.iloc[0]))
+            st.rerun()
+
+        # Ou calcular todas as linhas de uma vez no motor em lote
+        if st.button("Calcular portfólio", use_container_width=True, disabled=tabela.empty):
+            calcular_portfolio(tabela)
+
+    st.markdown("### 📄 Demonstrações Financeiras")
+    documentos = st.file_uploader("Balanços e DREs (PDF / Excel)", type=["pdf", "xlsx", "xlsm", "xls", "xlsb", "ods"],
+                                  accept_multiple_files=True, key="demonstracoes",
+                                  help="Rótulos como 'Ativo Circulante', 'EBITDA' e 'Estoques' viram os inputs; "
+                                       "arquivos lidos em paralelo e guardados pelo conteúdo.")
+    if documentos:
+        import pandas as pd
+        from statements import content_hash, entity_from_name, merge_items
+        # Resultado por upload (file_id, tamanho): só arquivos recém-enviados são
+        # copiados, hasheados e lidos; os demais vêm da própria sessão
+        anteriores = st.session_state.get("demonstracoes_lidas", {})
+        enviados = {(doc.file_id, doc.size) for doc in documentos}
+        novos = [doc for doc in documentos if (doc.file_id, doc.size) not in anteriores]
+        lidas = {chave: lido for chave, lido in anteriores.items() if chave in enviados}
+        if novos:
+            conteudos = [doc.getvalue() for doc in novos]
+            with st.spinner("Lendo demonstrações..."), profiling.stage("ingestao"):
+                novos_lidos = leitor_demonstracoes().ingest([(doc.name, c) for doc, c in zip(novos, conteudos)],
+                                                            keys=[content_hash(c) for c in conteudos])
+            del conteudos
+            lidas.update(zip([(doc.file_id, doc.size) for doc in novos], novos_lidos))
+        st.session_state.demonstracoes_lidas = lidas
+        lidos = [lidas[(doc.file_id, doc.size)] for doc in documentos]
+        for lido in lidos:
+            if "erro" in lido:
+                st.warning(f"{lido['nome']}: {lido['erro']}")
+
+        # Empresa de cada arquivo: prefixo do nome, editável
+        documentos_df = st.data_editor(
+            pd.DataFrame({"Arquivo": [lido["nome"] for lido in lidos],
+                          ENTITY: [entity_from_name(lido["nome"]) for lido in lidos],
+                          "Inputs": [len(lido.get("itens", {})) for lido in lidos]}),
+            disabled=["Arquivo", "Inputs"], hide_index=True, use_container_width=True, key="demonstracoes_empresas")
+        por_empresa = {}
+        for lido, nome_empresa in zip(lidos, documentos_df[ENTITY]):
+            por_empresa.setdefault(str(nome_empresa), []).append(lido)
+        with st.expander("Itens extraídos"):
+            st.dataframe(pd.DataFrame(
+                [{"Arquivo": lido["nome"], "Input": var, "Valor": valor, "Rótulo": lido["origem"][var]}
+                 for lido in lidos for var, valor in lido.get("itens", {}).items()],
+                columns=["Arquivo", "Input", "Valor", "Rótulo"]), use_container_width=True, hide_index=True)
+
+        empresa_doc = st.selectbox("Empresa dos documentos", list(por_empresa))
+        if st.button("Preencher formulário com os documentos", use_container_width=True):
+            aplicar_inputs(merge_items(por_empresa[empresa_doc]))
+            st.rerun()
+        if st.button("Calcular portfólio dos documentos", use_container_width=True):
+            # Input não encontrado em nenhum documento da empresa = 0 (padrão do widget)
+            calcular_portfolio(pd.DataFrame([{ENTITY: nome_empresa, **merge_items(docs)}
+                                             for nome_empresa, docs in por_empresa.items()]).fillna(0.0))
+
+    st.markdown("### 📂 Pasta Monitorada")
+    caminho_pasta = st.text_input("Pasta de fechamento", value=os.environ.get("FPA_DROP_DIR", ""), key="pasta_caminho",
+                                  help="Um arquivo por cliente (tabela de inputs, balanço ou DRE); "
+                                       "só os arquivos novos ou alterados são recalculados.")
+    if caminho_pasta and os.path.isdir(caminho_pasta):
+        if st.toggle("Monitorar (a cada 30 s)", key="pasta_monitorar"):
+            st.fragment(run_every=30)(render_pasta)(caminho_pasta)
+        else:
+            st.fragment(render_pasta)(caminho_pasta)
+    elif caminho_pasta:
+        st.warning("Pasta não encontrada.")
 
 # ============================================
 # CONSTRUÇÃO DA INTERFACE POR ABAS
 # ============================================
 
-tabs = st.tabs(list(kpis_definition.keys()))
+# KPI onde cada input canônico é digitado (do catálogo compartilhado)
+input_owner = graph.catalog.input_owner
+
+
+def sincronizar_inputs(variaveis):
+    # Leva ao grafo os valores aplicados nos formulários e recalcula só o que ficou sujo
+    for var in variaveis:
+        key = input_key(var)
+        if key in st.session_state:
+            graph.set_input(var, st.session_state[key])
+    return graph.recompute()
+
+
+def registrar_tempo(escopo, inicio):
+    # Durante o rerun completo as abas entram no tempo do "app"
+    if st.session_state.get("_rerun_completo") and escopo != "app":
+        return
+    st.session_state.rerun_timings.append({"escopo": escopo, "ms": (time.perf_counter() - inicio) * 1000})
+
+
+def registrar_etapas(medicao):
+    # Tempos por etapa de um rerun medido: painel da sessão + linha JSON no log
+    if medicao is None:
+        return
+    st.session_state.stage_timings.append(medicao)
+    profiling.log_event("rerun", sessao=st.session_state.sessao_id, **medicao)
+
+
+if 'rerun_timings' not in st.session_state:
+    st.session_state.rerun_timings = deque(maxlen=500)
+    st.session_state.stage_timings = deque(maxlen=500)
+    st.session_state.sessao_id = uuid.uuid4().hex[:12]
+
+st.session_state._rerun_completo = True
+with profiling.stage("calc"):
+    sincronizar_inputs(graph.catalog.input_names)
 
 # Dicionários para armazenar os resultados calculados
-calculated_values = {}   # nome do KPI -> valor calculado
-achievements = {}        # nome do KPI -> % da meta atingida
+calculated_values = graph.values   # nome do KPI -> valor calculado
+achievements = graph.achievements  # nome do KPI -> % da meta atingida
 
-# Para cada categoria e cada KPI, exibir os campos de input conforme definição
-for tab, (category, category_kpis) in zip(tabs, kpis_definition.items()):
-    with tab:
-        st.markdown(f"### {category}")
+# ============================================
+# HISTÓRICO (SQLite)
+# ============================================
+
+@st.cache_resource
+def kpi_store():
+    # Engine único por processo; o SQLite em WAL atende todas as sessões.
+    # Criado só na primeira ação de histórico (SQLAlchemy fora do cold start)
+    from store import KPIStore
+    return KPIStore()
+
+
+@st.cache_resource
+def peer_index():
+    # Distribuições ordenadas por setor/porte, montadas uma vez por processo a
+    # partir do histórico e atualizadas a cada gravação (ver peers.py)
+    from peers import PeerIndex
+    return PeerIndex.from_store(kpi_store())
+
+
+def registros_pares(portfolio):
+    # Linhas do portfólio no formato de PeerIndex.upsert_many
+    inputs, valores = portfolio["inputs"], portfolio["valores"]
+    kpi_cols = [c for c in valores.columns if c not in (ENTITY, PERIOD)]
+    if SECTOR in inputs.columns:
+        setores = inputs[SECTOR]
+    else:
+        gravados = kpi_store().sectors()
+        setores = [gravados.get(str(e)) for e in inputs[ENTITY]]
+    receitas = inputs["Receita Bruta"] if "Receita Bruta" in inputs.columns else [0.0] * len(inputs)
+    for company, period, sector, receita, row in zip(inputs[ENTITY], inputs[PERIOD], setores, receitas,
+                                                     valores[kpi_cols].to_numpy()):
+        yield company, period, sector, receita, dict(zip(kpi_cols, row))
+
+
+def percentil_pares(kpi_name):
+    # (percentil, nº de pares, grupo) do KPI em tela, ou None sem comparação
+    if not st.session_state.get("comparar_pares"):
+        return None
+    return peer_index().rank(kpi_name, calculated_values[kpi_name], setor_pares,
+                             graph.inputs.get("Receita Bruta", 0.0), periodo, empresa or None)
+
+
+with st.sidebar:
+    st.markdown("### 💾 Histórico")
+    empresa = st.text_input("Empresa", key="hist_empresa")
+    periodo = st.text_input("Período (AAAA ou AAAA-MM)", value=datetime.now().strftime("%Y-%m"), key="hist_periodo")
+    setor = st.text_input("Setor", key="hist_setor", help="Grupo de pares da empresa (opcional)")
+    col_salvar, col_anterior, col_carregar = st.columns(3)
+    if col_salvar.button("Salvar", use_container_width=True, disabled=not empresa):
+        kpi_store().save_snapshot(empresa, periodo, graph.inputs, graph.values, graph.achievements)
+        if setor:
+            kpi_store().set_sectors({empresa: setor})
+        peer_index().upsert_many([(empresa, periodo, setor or kpi_store().sector(empresa),
+                                   graph.inputs.get("Receita Bruta", 0.0), graph.values)])
+        st.toast(f"Período {periodo} de {empresa} salvo.")
+    if col_anterior.button("Anterior", use_container_width=True, disabled=not empresa,
+                           help="Preenche Receita Anterior e os dados do CAGR com os períodos já salvos"):
+        anteriores = kpi_store().prior_inputs(empresa, periodo)
+        if anteriores:
+            aplicar_inputs(anteriores)
+            st.rerun()
+        st.warning("Nenhum período anterior salvo para esta empresa.")
+    if col_carregar.button("Carregar", use_container_width=True, disabled=not empresa):
+        salvos = kpi_store().load_inputs(empresa, periodo)
+        if salvos:
+            aplicar_inputs(salvos)
+            st.rerun()
+        st.warning("Período não encontrado no histórico.")
+
+    portfolio = portfolio_atual()
+    if portfolio is not None and {ENTITY, PERIOD} <= set(portfolio["inputs"].columns):
+        if st.button("Salvar portfólio no histórico", use_container_width=True):
+            kpi_store().save_portfolio(portfolio["inputs"], portfolio["valores"], portfolio["achievements"],
+                                       ENTITY, PERIOD, SECTOR if SECTOR in portfolio["inputs"].columns else None)
+            peer_index().upsert_many(registros_pares(portfolio))
+            st.toast(f"{len(portfolio['inputs'])} empresas/períodos salvos.")
+
+    comparar_pares = st.toggle("Comparar com pares", key="comparar_pares",
+                               help="Percentil de cada KPI entre as empresas do histórico do mesmo setor e porte")
+    # Setor usado na comparação: o digitado ou o já gravado para a empresa
+    setor_pares = (setor or (kpi_store().sector(empresa) if empresa else None)) if comparar_pares else None
+
+
+@st.fragment
+def render_category(category, category_kpis):
+    # Cada aba é um fragmento com formulário próprio: editar um input não
+    # reexecuta o script; "Aplicar" reexecuta só esta aba, e o app inteiro
+    # apenas quando algum KPI de outra aba também foi afetado
+    tocar_sessao()
+    inicio = time.perf_counter()
+    medir = st.session_state.get("instrumentar", profiling.ENABLED_BY_DEFAULT) and not st.session_state.get("_rerun_completo")
+    if medir:
+        profiling.start_rerun(category)
+    proprios = [var for var, (cat, _) in input_owner.items() if cat == category]
+    with profiling.stage("calc"):
+        recalculados = sincronizar_inputs(proprios)
+    if any(kpi_name not in category_kpis for kpi_name in recalculados):
+        registrar_tempo(category, inicio)
+        if medir:
+            registrar_etapas(profiling.finish_rerun())
+        st.rerun(scope="app")
+
+    st.markdown(f"### {category}")
+    with profiling.stage("widgets"), st.form(f"form_{category}", border=False):
         cols = st.columns(2)
         col_idx = 0
         
@@ -282,143 +462,276 @@ for tab, (category, category_kpis) in zip(tabs, kpis_definition.items()):
                 </div>
                 """, unsafe_allow_html=True)
                 
-                # Criar campos de entrada para cada variável da fórmula
-                input_dict = {}
+                # Campo de entrada só na primeira ocorrência de cada input;
+                # nas demais, e nos inputs derivados, apenas o valor reaproveitado
                 for var in kpi_config['inputs']:
-                    # Chave única no session_state
-                    key = f"{category}_{kpi_name}_{var}"
-                    value = st.number_input(
-                        f"{var}",
-                        value=st.session_state.input_values.get(key, 0.0),
-                        key=key,
-                        step=1000.0 if "R$" in var or "Receita" in var or "Custo" in var else 1.0,
-                        format="%.2f"
-                    )
-                    st.session_state.input_values[key] = value
-                    input_dict[var] = value
-                
-                # Calcular o KPI com base nos inputs
-                try:
-                    kpi_value = kpi_config['calc'](input_dict)
-                except:
-                    kpi_value = 0.0
+                    if var in derived_inputs:
+                        origem = derived_inputs[var]
+                        st.caption(f"↳ {var}: `{calculated_values[origem]:,.2f}` (calculado em {origem})")
+                    elif input_owner[var][1] != kpi_name:
+                        st.caption(f"↳ {var}: `{graph.inputs[var]:,.2f}` (informado em {input_owner[var][1]})")
+                    else:
+                        key = input_key(var)
+                        st.number_input(
+                            f"{var}",
+                            value=graph.inputs[var],
+                            key=key,
+                            step=1000.0 if "R$" in var or "Receita" in var or "Custo" in var else 1.0,
+                            format="%.2f"
+                        )
                 
-                calculated_values[kpi_name] = kpi_value
+                kpi_value = calculated_values[kpi_name]
                 
                 # Mostrar o resultado calculado
                 st.markdown(f"**✅ Resultado calculado:** `{kpi_value:,.2f}`")
                 
-                # Calcular achievement
-                meta = kpi_config['meta']
-                tipo = kpi_config['tipo']
-                if kpi_value > 0 and meta > 0:
-                    if tipo == "quanto_maior_melhor":
-                        ach = min(100, (kpi_value / meta) * 100)
-                    else:
-                        ach = min(100, (meta / kpi_value) * 100)
-                else:
-                    ach = 0.0
-                achievements[kpi_name] = ach
+                ach = achievements[kpi_name]
                 
                 # Barra de progresso visual
                 st.progress(min(1.0, ach/100))
                 st.caption(f"Achievement: {ach:.1f}%")
+                pares = percentil_pares(kpi_name)
+                if pares is not None:
+                    st.caption(f"👥 Melhor que {pares[0]:.0f}% dos pares ({pares[2]}, n={pares[1]})")
                 
             col_idx += 1
-        st.markdown("---")
+        st.form_submit_button("✅ Aplicar", use_container_width=True)
+    st.markdown("---")
+    registrar_tempo(category, inicio)
+    if medir:
+        registrar_etapas(profiling.finish_rerun())
+
+
+@st.fragment
+def render_maturidade():
+    # Questionários de maturidade (FORMULARIO.csv / Pasta1.csv), ao lado dos KPIs
+    tocar_sessao()
+    st.markdown("### 🧭 Maturidade da Gestão")
+    # O questionário (pandas + data_editor) só é montado quando aberto
+    if not st.toggle("Abrir questionário", key="abrir_maturidade"):
+        resultado = st.session_state.get("maturidade")
+        if resultado is not None:
+            st.caption(f"Último resultado: {resultado['questionario']} · {resultado['geral']:.1f}% ({resultado['nivel']})")
+        return
+    import pandas as pd
+    from importer import iter_chunks
+    from questionario import QUESTIONARIOS, load_catalog, dimensions, match_columns, score_answers, maturity_level
+
+    nome = st.selectbox("Questionário", list(QUESTIONARIOS))
+    catalogo = load_catalog(QUESTIONARIOS[nome])
+    st.caption(f"{len(catalogo)} perguntas em {len(dimensions(catalogo))} dimensões · notas de 1 a 5")
+
+    modo = st.radio("Respostas", ["Preencher aqui", "Importar respondentes"], horizontal=True)
+    respostas = None
+    if modo == "Importar respondentes":
+        arquivo = st.file_uploader("Arquivo de respostas", type=["csv", "xlsx"], key="upload_maturidade",
+                                   help="Uma linha por respondente e uma coluna por código de pergunta (ex.: '1.01').")
+        if arquivo is not None:
+            respostas = pd.concat(iter_chunks(arquivo), ignore_index=True)
+            posicoes, duplicados, sem_pergunta = match_columns(respostas, catalogo)
+            st.caption(f"{len(posicoes)} de {len(catalogo)} perguntas encontradas no arquivo")
+            if duplicados:
+                st.warning(f"Códigos repetidos no cabeçalho, ignorados: {', '.join(duplicados)}. "
+                           "No Excel, grave os códigos como texto ('1.10' numérico vira 1.1).")
+            if sem_pergunta:
+                st.warning(f"Códigos sem pergunta neste questionário, ignorados: {', '.join(sem_pergunta)}")
+    else:
+        with st.form(f"form_maturidade_{nome}", border=False):
+            editado = st.data_editor(
+                catalogo.assign(Nota=None)[["dimensao", "pergunta", "Nota"]],
+                column_config={
+                    "dimensao": st.column_config.TextColumn("Dimensão", disabled=True),
+                    "pergunta": st.column_config.TextColumn("Pergunta", disabled=True, width="large"),
+                    "Nota": st.column_config.NumberColumn("Nota", min_value=1, max_value=5, step=1),
+                },
+                use_container_width=True, height=400,
+            )
+            if st.form_submit_button("✅ Calcular maturidade", use_container_width=True):
+                respostas = editado["Nota"].to_frame().T.reset_index(drop=True)
+
+    if respostas is not None:
+        notas = score_answers(respostas, catalogo)
+        if notas["Geral"].isna().all():
+            st.warning("Nenhuma resposta válida (notas de 1 a 5) para as perguntas deste questionário.")
+        else:
+            por_dimensao = notas.drop(columns=["Geral", "Nível"]).mean()
+            geral = float(notas["Geral"].mean())
+            st.session_state.maturidade = {
+                "questionario": nome, "dimensoes": por_dimensao, "geral": geral,
+                "nivel": maturity_level([geral]).iloc[0], "respondentes": len(notas),
+            }
+            if len(notas) > 1:
+                st.dataframe(notas, use_container_width=True)
+
+    resultado = st.session_state.get("maturidade")
+    if resultado is not None and resultado["questionario"] == nome:
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Maturidade Geral", f"{resultado['geral']:.1f}%")
+        col2.metric("Nível", resultado["nivel"])
+        col3.metric("Respondentes", resultado["respondentes"])
+        st.bar_chart(resultado["dimensoes"].rename("Maturidade (%)"), horizontal=True)
+
+
+tabs = st.tabs(list(kpis_definition.keys()) + ["🧭 Maturidade"])
+for tab, (category, category_kpis) in zip(tabs, kpis_definition.items()):
+    with tab:
+        render_category(category, category_kpis)
+with tabs[-1], profiling.stage("maturidade"):
+    render_maturidade()
+
+# ============================================
+# PORTFÓLIO IMPORTADO (CÁLCULO EM LOTE)
+# ============================================
+
+@st.fragment
+def render_graficos_portfolio():
+    # Figuras agregadas no servidor (portfolio_viz.py): o tamanho enviado ao
+    # navegador não cresce com o portfólio. Só esta seção reexecuta ao trocar
+    # de gráfico.
+    tocar_sessao()
+    import portfolio_viz
+    portfolio = portfolio_atual()
+    kpis = portfolio_viz.kpi_columns(portfolio["valores"])
+    visao = st.radio("Gráfico", ["Heatmap", "Dispersão", "Tendências"], horizontal=True, key="portfolio_visao")
+    if visao == "Dispersão":
+        col_x, col_y = st.columns(2)
+        params = (col_x.selectbox("Eixo X", kpis, index=kpis.index("Margem EBITDA (%)") if "Margem EBITDA (%)" in kpis else 0),
+                  col_y.selectbox("Eixo Y", kpis, index=kpis.index("ROE - Retorno sobre Patrimônio (%)")
+                                  if "ROE - Retorno sobre Patrimônio (%)" in kpis else 0))
+    elif visao == "Tendências":
+        if PERIOD not in portfolio["valores"].columns:
+            st.info("O arquivo importado não tem coluna de período.")
+            return
+        params = tuple(st.multiselect("KPIs", kpis, default=[k for k in MAIN_KPIS if k in kpis], max_selections=12))
+        if not params:
+            return
+    else:
+        params = ()
+
+    # Memo dentro do próprio portfólio: some junto quando outro é calculado
+    memo = portfolio.setdefault("figuras", {})
+    chave = (visao, params)
+    if chave not in memo:
+        with profiling.stage("plotly"):
+            if visao == "Heatmap":
+                fig = portfolio_viz.heatmap_figure(portfolio["achievements"])
+            elif visao == "Dispersão":
+                fig = portfolio_viz.scatter_figure(portfolio["valores"], *params)
+            else:
+                fig = portfolio_viz.trend_figure(portfolio["valores"], list(params))
+            memo[chave] = (fig, portfolio_viz.payload_bytes(fig))
+            # O tamanho do portfólio é medido uma vez; a figura nova entra na conta
+            st.session_state.portfolio.account(memo[chave][1])
+    fig, tamanho = memo[chave]
+    with profiling.stage("plotly"):
+        st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"Figura enviada ao navegador: {tamanho / 1024:,.0f} KB")
+
+
+# Linhas do portfólio enviadas ao navegador por vez; a tabela inteira só sai
+# pela exportação ("Portfólio importado")
+PORTFOLIO_PAGE_ROWS = 200
+
+if 'portfolio' in st.session_state:
+    st.markdown("## 📦 Portfólio Importado")
+    portfolio = portfolio_atual()
+    total = len(portfolio["valores"])
+    paginas = max(1, -(-total // PORTFOLIO_PAGE_ROWS))
+    col_info, col_pagina = st.columns([3, 1])
+    pagina = col_pagina.number_input(f"Página (de {paginas})", min_value=1, max_value=paginas, value=1,
+                                     step=1, key="portfolio_pagina") if paginas > 1 else 1
+    inicio = (pagina - 1) * PORTFOLIO_PAGE_ROWS
+    col_info.caption(f"{total} empresas/períodos calculados · linhas {inicio + 1 if total else 0}"
+                     f"-{min(inicio + PORTFOLIO_PAGE_ROWS, total)} · tabela completa na exportação abaixo")
+    aba_valores, aba_ach = st.tabs(["Valores Calculados", "Achievement (%)"])
+    aba_valores.dataframe(portfolio["valores"].iloc[inicio:inicio + PORTFOLIO_PAGE_ROWS], use_container_width=True)
+    aba_ach.dataframe(portfolio["achievements"].iloc[inicio:inicio + PORTFOLIO_PAGE_ROWS], use_container_width=True)
+    render_graficos_portfolio()
+    st.markdown("---")
+
+# ============================================
+# TENDÊNCIA HISTÓRICA
+# ============================================
+
+if empresa and len(kpi_store().periods(empresa)) >= 2:
+    st.markdown(f"## 📈 Tendência Histórica - {empresa}")
+    selecionados = st.multiselect("KPIs", list(calculated_values), default=MAIN_KPIS)
+    if selecionados:
+        st.line_chart(kpi_store().trend(empresa, selecionados))
+    st.markdown("---")
 
 # ============================================
 # BOTÃO DE ANÁLISE E RELATÓRIOS
 # ============================================
 
+@st.cache_resource
+def analysis_cache():
+    # Um único cache por processo, compartilhado por todas as sessões
+    return LRUCache(max_entries=256)
+
+
+# A análise fica aberta nos reruns seguintes (o botão só é True no clique)
 if st.button("🔍 ANALISAR TODOS OS KPIs", use_container_width=True):
+    st.session_state.mostrar_analise = True
+
+if st.session_state.get("mostrar_analise"):
     st.markdown("---")
     st.markdown("## 📊 RESULTADOS DA ANÁLISE COMPLETA")
     
+    # Artefatos memorizados pelo hash dos resultados (compartilhados entre sessões)
+    analise = cached_analysis(analysis_cache(), calculated_values, achievements)
+    overall, acima_meta, criticos = analise["overall"], analise["acima_meta"], analise["criticos"]
+    
     # 1. Cards principais
     st.markdown("### 🎯 Principais Indicadores")
-    main_kpis = ["Receita Líquida (R$)", "Lucro Líquido (R$)", "Margem EBITDA (%)", "ROE - Retorno sobre Patrimônio (%)"]
     cols = st.columns(4)
-    for idx, kpi in enumerate(main_kpis):
-        if kpi in calculated_values:
-            with cols[idx]:
-                value = calculated_values[kpi]
-                ach = achievements.get(kpi, 0)
-                color = "#2196F3" if ach >= 80 else "#FF9800" if ach >= 50 else "#F44336"
-                st.markdown(f"""
-                <div class="kpi-card" style="background: linear-gradient(135deg, {color} 0%, {color}cc 100%);">
-                    <div class="kpi-label">{kpi}</div>
-                    <div class="kpi-value">{value:,.2f}</div>
-                    <div class="kpi-label">Meta: {ach:.1f}%</div>
-                </div>
-                """, unsafe_allow_html=True)
+    for idx, card in enumerate(analise["cards"]):
+        with cols[idx]:
+            pares = percentil_pares(card['kpi'])
+            linha_pares = f'<div class="kpi-label">Pares: P{pares[0]:.0f} · {pares[2]} (n={pares[1]})</div>' if pares else ""
+            st.markdown(f"""
+            <div class="kpi-card" style="background: linear-gradient(135deg, {card['color']} 0%, {card['color']}cc 100%);">
+                <div class="kpi-label">{card['kpi']}</div>
+                <div class="kpi-value">{card['value']:,.2f}</div>
+                <div class="kpi-label">Meta: {card['ach']:.1f}%</div>
+                {linha_pares}
+            </div>
+            """, unsafe_allow_html=True)
     
     # 2. Gráfico de Radar
     st.markdown("### 📡 Dashboard de Performance - Todos os KPIs")
-    if achievements:
-        top_kpis = list(achievements.keys())[:15]
-        top_values = [achievements[k] for k in top_kpis]
-        fig_radar = go.Figure()
-        fig_radar.add_trace(go.Scatterpolar(
-            r=top_values + top_values[:1],
-            theta=top_kpis + top_kpis[:1],
-            fill='toself',
-            name='Performance',
-            line_color='#1E88E5',
-            fillcolor='rgba(30, 136, 229, 0.3)'
-        ))
-        fig_radar.update_layout(
-            polar=dict(radialaxis=dict(visible=True, range=[0, 100], title="Achievement (%)")),
-            showlegend=True,
-            title="Performance dos KPIs vs Meta",
-            height=600
-        )
-        st.plotly_chart(fig_radar, use_container_width=True)
+    if analise["fig_radar"] is not None:
+        with profiling.stage("plotly"):
+            st.plotly_chart(analise["fig_radar"], use_container_width=True)
     
     # 3. Análise de Gaps
     st.markdown("### 📉 Análise de Gaps - Oportunidades de Melhoria")
-    gaps = []
-    for kpi_name, ach in achievements.items():
-        if ach < 70:
-            gaps.append({
-                "KPI": kpi_name,
-                "Performance": f"{ach:.1f}%",
-                "Gap": f"{100 - ach:.1f}%",
-                "Prioridade": "Alta" if ach < 50 else "Média"
-            })
-    if gaps:
-        gaps_df = pd.DataFrame(gaps).sort_values('Performance')
-        st.dataframe(gaps_df, use_container_width=True)
+    if analise["gaps_df"] is not None:
+        st.dataframe(analise["gaps_df"], use_container_width=True)
     else:
         st.success("🎉 Excelente! Todos os KPIs estão com performance acima de 70% da meta!")
     
     # 4. Performance por Categoria
     st.markdown("### 📊 Performance por Categoria")
-    cat_perf = {}
-    for cat, cat_kpis in kpis_definition.items():
-        perf_list = [achievements.get(k, 0) for k in cat_kpis.keys()]
-        if perf_list:
-            cat_perf[cat] = sum(perf_list) / len(perf_list)
-    if cat_perf:
-        fig_bar = px.bar(
-            x=list(cat_perf.keys()), y=list(cat_perf.values()),
-            title="Performance Média por Categoria",
-            labels={'x': 'Categoria', 'y': 'Performance (%)'},
-            color=list(cat_perf.values()), color_continuous_scale='Blues'
-        )
-        fig_bar.update_layout(height=400)
-        st.plotly_chart(fig_bar, use_container_width=True)
+    if analise["fig_bar"] is not None:
+        with profiling.stage("plotly"):
+            st.plotly_chart(analise["fig_bar"], use_container_width=True)
     
     # 5. Scorecard Final
     st.markdown("### 🏆 Scorecard Final")
-    overall = sum(achievements.values()) / len(achievements) if achievements else 0
-    acima_meta = sum(1 for a in achievements.values() if a >= 100)
-    criticos = sum(1 for a in achievements.values() if a < 50)
     col1, col2, col3 = st.columns(3)
     col1.metric("Performance Geral", f"{overall:.1f}%")
-    col2.metric("KPIs Acima da Meta", f"{acima_meta}/{len(achievements)}")
+    col2.metric("KPIs Acima da Meta", f"{acima_meta}/{analise['total']}")
     col3.metric("KPIs Críticos", criticos, delta="Atenção!" if criticos > 0 else None)
     
+    # Maturidade da gestão (questionário), quando já respondida
+    maturidade = st.session_state.get("maturidade")
+    if maturidade is not None:
+        st.markdown(f"### 🧭 Maturidade da Gestão - {maturidade['questionario']}")
+        col1, col2 = st.columns([1, 2])
+        col1.metric("Maturidade Geral", f"{maturidade['geral']:.1f}%", delta=maturidade["nivel"], delta_color="off")
+        col2.bar_chart(maturidade["dimensoes"].rename("Maturidade (%)"), horizontal=True)
+    
     # 6. Recomendações
     st.markdown("### 💡 Recomendações Estratégicas")
     if criticos > 0:
@@ -428,35 +741,254 @@ if st.button("🔍 ANALISAR TODOS OS KPIs", use_container_width=True):
     else:
         st.success("🟢 **Excelente performance!** Continue assim.")
     
-    # 7. Exportar
-    st.markdown("---")
-    if st.button("📥 Exportar Relatório Completo (Excel)", use_container_width=True):
-        results = []
-        for cat, cat_kpis in kpis_definition.items():
-            for kpi_name, cfg in cat_kpis.items():
-                value = calculated_values.get(kpi_name, 0)
-                ach = achievements.get(kpi_name, 0)
-                results.append({
-                    "Categoria": cat,
-                    "KPI": kpi_name,
-                    "Valor Calculado": value,
-                    "Meta": cfg['meta'],
-                    "Achievement (%)": f"{ach:.1f}%",
-                    "Status": "✅ Meta Atingida" if ach >= 100 else "⚠️ Abaixo da Meta" if ach < 70 else "🟡 Em Progresso",
-                    "Tipo": cfg['tipo']
-                })
-        df = pd.DataFrame(results)
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df.to_excel(writer, index=False, sheet_name='KPIs_Calculados')
-            summary = pd.DataFrame([{
-                "Performance Geral (%)": f"{overall:.1f}%",
-                "Total KPIs": len(achievements),
-                "Acima da Meta": acima_meta,
-                "Críticos": criticos,
-                "Data": datetime.now().strftime("%d/%m/%Y %H:%M")
-            }])
-            summary.to_excel(writer, index=False, sheet_name='Resumo')
-        st.download_button("💾 Baixar Excel", output.getvalue(),
-                           file_name=f"fpa_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                           mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+# ============================================
+# SIMULAÇÃO DE CENÁRIOS (MONTE CARLO)
+# ============================================
+
+CENARIOS_PADRAO = [
+    {"alvo": "Receita (todas as linhas)", "modo": "pct", "dist": "uniforme", "min": -10.0, "max": 0.0},
+    {"alvo": "PMR", "modo": "dias", "dist": "uniforme", "min": 0.0, "max": 15.0},
+]
+
+
+@st.fragment
+def render_cenarios():
+    # Perturba os inputs em tela e calcula todos os cenários em um único lote
+    # (scenarios.py); só esta seção é reexecutada ao simular
+    tocar_sessao()
+    st.markdown("## 🎲 Simulação de Cenários")
+    if not st.toggle("Abrir simulação", key="abrir_cenarios",
+                     help="What-if / Monte Carlo sobre os inputs preenchidos nas abas"):
+        return
+    import pandas as pd
+    import scenarios
+
+    with st.form("form_cenarios", border=False):
+        perturbacoes = st.data_editor(
+            pd.DataFrame(st.session_state.get("cenarios_specs", CENARIOS_PADRAO)),
+            column_config={
+                "alvo": st.column_config.SelectboxColumn("Input / grupo", options=scenarios.targets(), required=True, width="large"),
+                "modo": st.column_config.SelectboxColumn("Modo", options=list(scenarios.MODES), required=True,
+                                                         help="pct = variação % (em PMR/PME/PMP, do prazo); abs = variação "
+                                                              "absoluta; dias = só PMR/PME/PMP"),
+                "dist": st.column_config.SelectboxColumn("Distribuição", options=scenarios.DISTRIBUTIONS, required=True,
+                                                         help="Na normal, [mín, máx] cobre ±2 desvios"),
+                "min": st.column_config.NumberColumn("Mín", required=True),
+                "max": st.column_config.NumberColumn("Máx", required=True),
+            },
+            num_rows="dynamic", use_container_width=True, hide_index=True,
+        )
+        col_n, col_seed, col_repasse = st.columns(3)
+        n_cenarios = col_n.select_slider("Cenários", options=[10_000, 50_000, 100_000, 250_000, 500_000], value=100_000)
+        semente = col_seed.number_input("Semente", value=42, step=1)
+        repasse = col_repasse.number_input(
+            "Repasse da receita ao lucro (%)", min_value=0.0, max_value=100.0,
+            value=round(100 * scenarios.default_pass_through(graph.inputs), 1), step=5.0,
+            help="Premissa de margem: cada R$ 1 de variação no grupo de receita move EBITDA, EBIT e NOPAT "
+                 "em repasse x R$ 1 e os custos no restante. Padrão: margem de contribuição atual "
+                 "(100% = custos fixos).")
+        simular = st.form_submit_button("🎲 Simular", use_container_width=True)
+
+    if simular:
+        specs = perturbacoes.dropna().to_dict("records")
+        st.session_state.cenarios_specs = specs
+        erros = scenarios.validate(specs)
+        if erros:
+            st.error("Perturbações inválidas: " + "; ".join(erros))
+            return
+        if not any(graph.inputs.values()):
+            st.warning("Preencha os inputs nas abas antes de simular: todos os cenários partem dos valores em tela.")
+        inicio = time.perf_counter()
+        with profiling.stage("cenarios"):
+            st.session_state.cenarios = scenarios.simulate(graph.inputs, specs, n=n_cenarios, seed=int(semente),
+                                                           pass_through=repasse / 100)
+        st.session_state.cenarios["ms"] = (time.perf_counter() - inicio) * 1000
+
+    resumo = st.session_state.get("cenarios")
+    if resumo is None:
+        return
+    st.caption(f"{resumo['n']:,} cenários calculados em {resumo['ms']:,.0f} ms · premissa de margem: "
+               f"{100 * resumo['repasse']:.0f}% da variação da receita chega a EBITDA/EBIT/NOPAT")
+    padrao = [k for k in ("Margem EBITDA (%)", "Dívida Líquida/EBITDA", "Ciclo de Caixa (dias)") if k in resumo["kpis"]]
+    selecionados = st.multiselect("KPIs", resumo["kpis"], default=padrao, key="cenarios_kpis")
+    if not selecionados:
+        return
+
+    metas = scenarios.metas()
+    tabela = pd.DataFrame(
+        [[resumo["base"][k], *resumo["bandas"][k], metas[k][0], 100 * resumo["prob_meta"][k]] for k in selecionados],
+        index=selecionados,
+        columns=["Atual"] + [f"P{p}" for p in scenarios.PERCENTILES] + ["Meta", "P(atingir meta) %"],
+    )
+    st.dataframe(tabela.style.format("{:,.2f}"), use_container_width=True)
+    st.plotly_chart(scenarios.bands_figure(resumo, selecionados), use_container_width=True)
+
+    kpi_tornado = st.selectbox("Sensibilidade de", selecionados, key="cenarios_tornado")
+    st.plotly_chart(scenarios.tornado_figure(resumo, kpi_tornado), use_container_width=True)
+
+    with st.expander("Probabilidade de atingir a meta - todos os KPIs"):
+        st.bar_chart(pd.Series(resumo["prob_meta"]).mul(100).rename("P(atingir meta) %"), horizontal=True)
+
+
+render_cenarios()
+
+# ============================================
+# EXPORTAÇÃO (EM SEGUNDO PLANO)
+# ============================================
+
+st.markdown("---")
+st.markdown("### 📥 Exportar Relatório Completo")
+col_fmt, col_escopo = st.columns(2)
+formato = col_fmt.radio("Formato", list(FORMATS), horizontal=True,
+                        help="Excel: resumo na aba 'Resumo'. CSV: nas últimas linhas, marcadas com 'Resumo'. "
+                             "Parquet: nos metadados do arquivo (chave 'fpa.resumo').")
+opcoes_escopo = ["KPIs em tela"] + (["Portfólio importado"] if 'portfolio' in st.session_state else [])
+escopo = col_escopo.radio("Conteúdo", opcoes_escopo, horizontal=True)
+
+if st.button("📥 Gerar Relatório", use_container_width=True):
+    if escopo == "Portfólio importado":
+        portfolio = portfolio_atual()
+        ids = [c for c in (ENTITY, PERIOD) if c in portfolio["valores"].columns]
+        header = ids + KPI_COLUMNS
+        rows = portfolio_rows(portfolio["valores"], portfolio["achievements"], ids)
+        summary = summary_row(portfolio["achievements"].drop(columns=ids).to_numpy())
+    else:
+        header = KPI_COLUMNS
+        rows = kpi_rows(calculated_values, achievements)
+        summary = summary_row(list(achievements.values()))
+    anterior = st.session_state.get("export_job")
+    if anterior and anterior["future"].done() and not anterior["future"].exception():
+        sessoes().release_file(st.session_state.sessao_id, anterior["future"].result())
+    # Duração medida no próprio thread da exportação (o polling só vê a cada 1 s);
+    # o início vem antes do submit, que já pode pôr a gravação para rodar
+    inicio_export = time.perf_counter()
+    job = {"future": submit_export(formato, header, rows, summary), "formato": formato}
+    job["future"].add_done_callback(
+        lambda _f, job=job: job.__setitem__("ms", (time.perf_counter() - inicio_export) * 1000))
+
+    def anexar_relatorio(future, sid=st.session_state.sessao_id, registro=sessoes()):
+        # O arquivo fica no registro de sessões: é apagado se a sessão ficar ociosa
+        if future.exception() is None:
+            registro.attach_file(sid, future.result())
+
+    job["future"].add_done_callback(anexar_relatorio)
+    st.session_state.export_job = job
+
+
+def acompanhar_exportacao():
+    job = st.session_state.get("export_job")
+    if job is None:
+        return
+    future = job["future"]
+    if not future.done():
+        st.info("⏳ Gerando relatório em segundo plano...")
+    elif future.exception() is not None:
+        st.error(f"Falha na exportação: {future.exception()}")
+    else:
+        path = future.result()
+        if not os.path.exists(path):
+            st.info("O relatório expirou com a sessão ociosa: gere de novo para baixar.")
+            return
+        if "ms" in job and not job.get("registrado") and st.session_state.get("instrumentar", profiling.ENABLED_BY_DEFAULT):
+            job["registrado"] = True
+            registrar_etapas({"escopo": "export", "total_ms": round(job["ms"], 3),
+                              "etapas": {"export": round(job["ms"], 3)}, "formato": job["formato"]})
+        _, mime = FORMATS[job["formato"]]
+        with open(path, "rb") as fh:
+            st.download_button(f"💾 Baixar {job['formato']}", fh, file_name=os.path.basename(path),
+                               mime=mime, use_container_width=True)
+
+
+# Enquanto o arquivo é gerado, só este trecho é atualizado (a cada 1 s);
+# ao terminar, um rerun completo encerra o polling
+job = st.session_state.get("export_job")
+if job is not None and not job["future"].done():
+    @st.fragment(run_every=1)
+    def aguardar_exportacao():
+        tocar_sessao()
+        if st.session_state.export_job["future"].done():
+            st.rerun(scope="app")
+        acompanhar_exportacao()
+
+    aguardar_exportacao()
+else:
+    acompanhar_exportacao()
+
+# ============================================
+# TEMPOS DE RERUN
+# ============================================
+
+registrar_tempo("app", _inicio_rerun)
+st.session_state._rerun_completo = False
+if _instrumentar:
+    registrar_etapas(profiling.finish_rerun())
+if _profiler is not None:
+    st.session_state.perfil = profiling.finish_profile(_profiler)
+
+
+def tabela_tempos(amostras, rotulo):
+    # Percentis em Python puro: o painel não deve puxar o pandas sozinho
+    linhas = [f"| {rotulo} | Reruns | p50 (ms) | p95 (ms) |", "|---|---:|---:|---:|"]
+    for nome, tempos in sorted(amostras.items()):
+        n, p50, p95 = profiling.percentiles(tempos)
+        linhas.append(f"| {nome} | {n} | {p50:.1f} | {p95:.1f} |")
+    return "\n".join(linhas)
+
+
+with st.sidebar.expander("⏱️ Tempos de rerun"):
+    por_escopo = {}
+    for registro in st.session_state.rerun_timings:
+        por_escopo.setdefault(registro["escopo"], []).append(registro["ms"])
+    st.markdown(tabela_tempos(por_escopo, "Escopo"))
+    st.caption("'app' = script completo; demais linhas = rerun isolado da aba.")
+
+    st.toggle("Medir etapas", value=profiling.ENABLED_BY_DEFAULT, key="instrumentar",
+              help="Cálculo, widgets, análise, plotly e exportação; cada rerun vira uma linha JSON no log 'fpa.perf'.")
+    if st.session_state.stage_timings:
+        por_etapa = {}
+        for medicao in st.session_state.stage_timings:
+            for etapa, ms in medicao["etapas"].items():
+                por_etapa.setdefault(f"{medicao['escopo']} · {etapa}", []).append(ms)
+        st.markdown(tabela_tempos(por_etapa, "Escopo · etapa"))
+
+    if st.button("Perfilar próximo rerun", use_container_width=True,
+                 help="Captura um rerun completo com cProfile"):
+        st.session_state.perfilar_proximo = True
+        st.rerun()
+    perfil = st.session_state.get("perfil")
+    if perfil is not None:
+        st.download_button("💾 Baixar perfil (.prof)", perfil[0], file_name="rerun.prof",
+                           mime="application/octet-stream", use_container_width=True)
+        st.code(perfil[1], language=None)
+
+with st.sidebar.expander("🗄️ Cache da análise"):
+    st.json(analysis_cache().stats())
+
+# ============================================
+# MEMÓRIA DAS SESSÕES
+# ============================================
+
+sessoes().touch(st.session_state.sessao_id, st.session_state)
+sessoes().maybe_sweep()
+
+
+def formatar_bytes(n):
+    for unidade in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:,.0f} {unidade}"
+        n /= 1024
+    return f"{n:,.1f} GB"
+
+
+with st.sidebar.expander("🧠 Memória"):
+    linhas = sessoes().report()
+    minha = next(linha for linha in linhas if linha["sessao"] == st.session_state.sessao_id)
+    st.markdown(f"Esta sessão: **{formatar_bytes(minha['memoria'])}**"
+                + (f" (+ {formatar_bytes(minha['disco'])} em disco)" if minha["disco"] else ""))
+    st.markdown(f"{len(linhas)} sessões · {formatar_bytes(sum(linha['memoria'] for linha in linhas))} em memória · "
+                f"{formatar_bytes(sum(linha['disco'] for linha in linhas))} em disco "
+                f"({sum(1 for linha in linhas if linha['disco'])} ociosas descarregadas)")
+    rss = process_rss()
+    if rss is not None:
+        st.caption(f"Processo: {formatar_bytes(rss)} residentes (catálogo de KPIs e caches compartilhados incluídos)")
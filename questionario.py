@@ -0,0 +1,132 @@
+# ============================================
+# QUESTIONÁRIO DE MATURIDADE (FORMULARIO.csv / Pasta1.csv)
+# ============================================
+# Os dois arquivos seguem o layout "classe;pergunta": linhas com código
+# inteiro ("1") são dimensões e linhas "1.01" / "1.1" são perguntas dessa
+# dimensão. FORMULARIO.csv usa ";" (com tabs sobrando no fim de algumas
+# linhas) e Pasta1.csv usa "," com BOM. O catálogo é lido uma vez por
+# arquivo/mtime e fica em cache; o scoring de milhares de respondentes é
+# feito com uma única multiplicação de matrizes.
+
+import csv
+import io
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+QUESTIONARIOS = {
+    "Formulário de Maturidade": os.path.join(BASE_DIR, "FORMULARIO.csv"),
+    "Diagnóstico de Gestão (escala 1-5)": os.path.join(BASE_DIR, "Pasta1.csv"),
+}
+ESCALA_MIN, ESCALA_MAX = 1, 5
+NIVEIS = ["1 - Inicial", "2 - Em Desenvolvimento", "3 - Definido", "4 - Gerenciado", "5 - Otimizado"]
+
+
+@lru_cache(maxsize=8)
+def _parse_catalog(path, _mtime):
+    with open(path, "r", encoding="utf-8-sig", newline="") as fh:
+        text = fh.read()
+    header = text.splitlines()[0] if text else ""
+    delimiter = ";" if header.count(";") >= header.count(",") else ","
+
+    dimensoes, rows, vistos = {}, [], {}
+    for record in csv.reader(io.StringIO(text), delimiter=delimiter):
+        cells = [c.strip() for c in record if c.strip()]
+        if len(cells) < 2 or cells[0].lower() == "classe":
+            continue
+        codigo, texto = cells[0], delimiter.join(cells[1:])
+        if "." not in codigo:
+            dimensoes[int(codigo)] = texto
+            continue
+        dim_id = int(codigo.split(".")[0])
+        # Códigos repetidos no arquivo (ex.: dois "12.05") recebem sufixo
+        vistos[codigo] = vistos.get(codigo, 0) + 1
+        if vistos[codigo] > 1:
+            codigo = f"{codigo}#{vistos[codigo]}"
+        rows.append((codigo, dim_id, texto))
+
+    catalog = pd.DataFrame(rows, columns=["codigo", "dimensao_id", "pergunta"])
+    catalog["dimensao"] = catalog["dimensao_id"].map(dimensoes).fillna(
+        catalog["dimensao_id"].map(lambda d: f"Dimensão {d}"))
+    return catalog.set_index("codigo")[["dimensao_id", "dimensao", "pergunta"]]
+
+
+def load_catalog(path):
+    """Catálogo indexado pelo código da pergunta (dimensão e texto)."""
+    return _parse_catalog(path, os.path.getmtime(path))
+
+
+def dimensions(catalog):
+    """Dimensões na ordem do arquivo (Series dimensao_id -> nome)."""
+    return catalog.drop_duplicates("dimensao_id").set_index("dimensao_id")["dimensao"]
+
+
+def _normalize_code(code):
+    # "1.1" e "1.01" são códigos distintos; só se removem espaços
+    return str(code).strip()
+
+
+def match_columns(answers, catalog):
+    """Casa as colunas de `answers` com os códigos do catálogo, como texto.
+
+    Retorna (posições, duplicados, sem_pergunta): a posição da coluna de cada
+    código casado, os códigos que aparecem em mais de uma coluna (ex.: "1.1"
+    e "1.10" viram ambos 1.1 quando o Excel grava o cabeçalho como número) e
+    as colunas com cara de código que não existem no catálogo. Códigos
+    duplicados ficam fora do cálculo, já que não há como saber qual é qual.
+    """
+    vistos = {}
+    for pos, col in enumerate(answers.columns):
+        vistos.setdefault(_normalize_code(col), []).append(pos)
+    duplicados = [code for code, pos in vistos.items() if len(pos) > 1]
+    posicoes = {code: pos[0] for code, pos in vistos.items() if len(pos) == 1 and code in catalog.index}
+    sem_pergunta = [code for code in vistos
+                    if code not in catalog.index and code not in duplicados
+                    and code[:1].isdigit() and "." in code]
+    return posicoes, duplicados, sem_pergunta
+
+
+def score_answers(answers, catalog):
+    """Maturidade por dimensão e geral para uma tabela de respondentes.
+
+    `answers` tem uma linha por respondente e uma coluna por código de
+    pergunta, com notas de 1 a 5 (vazio = não respondida). Cada dimensão
+    recebe a média das suas respostas convertida para 0-100%
+    ((média - 1) / 4); o geral é a média simples das dimensões respondidas.
+    Colunas duplicadas ou fora do catálogo são ignoradas (ver match_columns).
+    """
+    posicoes, _, _ = match_columns(answers, catalog)
+    codes = [code for code in catalog.index if code in posicoes]
+    dims = dimensions(catalog)
+
+    values = answers.iloc[:, [posicoes[c] for c in codes]].apply(pd.to_numeric, errors="coerce") \
+        .to_numpy(np.float64, copy=True)
+    values[(values < ESCALA_MIN) | (values > ESCALA_MAX)] = np.nan
+    answered = ~np.isnan(values)
+
+    # Matriz pergunta x dimensão: soma e contagem por dimensão em um único produto
+    dim_pos = {dim_id: j for j, dim_id in enumerate(dims.index)}
+    membership = np.zeros((len(codes), len(dims)))
+    membership[np.arange(len(codes)), [dim_pos[d] for d in catalog.loc[codes, "dimensao_id"]]] = 1.0
+    sums = np.where(answered, values, 0.0) @ membership
+    counts = answered.astype(np.float64) @ membership
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scores = (sums / counts - ESCALA_MIN) / (ESCALA_MAX - ESCALA_MIN) * 100
+    result = pd.DataFrame(scores, index=answers.index, columns=list(dims.values))
+    valid = counts > 0
+    n_valid = valid.sum(axis=1)
+    overall = np.where(valid, scores, 0.0).sum(axis=1) / np.where(n_valid > 0, n_valid, 1)
+    result["Geral"] = np.where(n_valid > 0, overall, np.nan)
+    result["Nível"] = maturity_level(result["Geral"])
+    return result
+
+
+def maturity_level(score):
+    """Nível de maturidade (1 a 5) a partir do percentual 0-100."""
+    score = pd.Series(score)
+    bins = np.clip((score.to_numpy() // 20).astype("float"), 0, 4)
+    return pd.Series([NIVEIS[int(b)] if not np.isnan(b) else "" for b in bins], index=score.index)
@@ -0,0 +1,215 @@
+# ============================================
+# SIMULAÇÃO DE CENÁRIOS (WHAT-IF / MONTE CARLO)
+# ============================================
+# Parte dos inputs em tela, sorteia N cenários perturbando os inputs brutos
+# (ex.: receita -10%..0%, PMR +0..15 dias) e calcula todos eles de uma vez no
+# motor vetorizado (kpi_batch.score_batch): cada cenário é uma "linha" do
+# lote. Do resultado saem as faixas de percentis de cada KPI, a probabilidade
+# de atingir a meta e o tornado de sensibilidade (um fator por vez).
+#
+# Premissa de margem: um choque no grupo de receita chega aos lucros pelo
+# "repasse" r (fração de cada R$ 1 de receita que vira lucro). EBITDA, EBIT,
+# NOPAT e a margem de contribuição em R$ variam r x ΔReceita; custos totais e
+# variáveis, (1 - r) x ΔReceita. Por padrão r é a margem de contribuição atual
+# ((Receita - Custos Variáveis) / Receita), ou 100% (custos fixos) sem esses
+# inputs.
+
+import numpy as np
+
+from kpis import iter_kpis, raw_inputs
+from kpi_batch import score_batch
+
+# Alvos que movem vários inputs brutos com o mesmo choque
+REVENUE_DRIVER = "Receita (todas as linhas)"
+DRIVERS = {
+    REVENUE_DRIVER: ["Receita Bruta", "Receita Total", "Receita", "Receita Atual"],
+    "Custos (todas as linhas)": ["Custos Totais", "CMV", "Custos Variáveis", "Custos Fixos"],
+}
+# Linhas que acompanham o choque de receita, com a receita de referência de
+# cada uma: lucros pelo repasse r, custos por (1 - r)
+PROFIT_LINES = {"EBITDA": "Receita Total", "EBIT": "Receita Total", "NOPAT": "Receita Total",
+                "Margem de Contribuição": "Receita"}
+COST_LINES = {"Custos Totais": "Receita Total", "Custos Variáveis": "Receita"}
+# Prazos em dias: PMR/PME/PMP são KPIs (saldo / base * 360), então um
+# deslocamento de d dias vira saldo += d / 360 * base
+DAY_DRIVERS = {
+    "PMR": ("Duplicatas a Receber", "Receita Bruta"),
+    "PME": ("Estoque Médio", "CMV"),
+    "PMP": ("Fornecedores", "Compras"),
+}
+MODES = {"pct": "Variação %", "abs": "Variação absoluta", "dias": "Dias (PMR/PME/PMP)"}
+DISTRIBUTIONS = ["uniforme", "normal", "triangular"]
+PERCENTILES = [5, 25, 50, 75, 95]
+
+
+def targets():
+    """Alvos disponíveis: grupos, prazos em dias e cada input bruto."""
+    return list(DRIVERS) + list(DAY_DRIVERS) + raw_inputs()
+
+
+def sample(spec, n, rng):
+    """Sorteia `n` choques para uma perturbação {dist, min, max}.
+
+    Na normal, [min, max] cobre ±2 desvios (≈95% dos cenários); na
+    triangular, a moda é o ponto médio.
+    """
+    low, high = float(spec["min"]), float(spec["max"])
+    if high < low:
+        low, high = high, low
+    if spec.get("dist", "uniforme") == "normal":
+        return rng.normal((low + high) / 2, (high - low) / 4, n)
+    if spec.get("dist") == "triangular" and high > low:
+        return rng.triangular(low, (low + high) / 2, high, n)
+    return rng.uniform(low, high, n)
+
+
+def default_pass_through(base_inputs):
+    """Repasse padrão da receita ao lucro: a margem de contribuição atual (0-1)."""
+    receita, variaveis = float(base_inputs.get("Receita", 0.0)), float(base_inputs.get("Custos Variáveis", 0.0))
+    if receita > 0 and variaveis > 0:
+        return min(max((receita - variaveis) / receita, 0.0), 1.0)
+    return 1.0
+
+
+def validate(specs):
+    """Mensagens de erro das perturbações (lista vazia se todas são válidas)."""
+    erros = []
+    for spec in specs:
+        modo = spec.get("modo", "pct")
+        if modo not in MODES:
+            erros.append(f"{spec['alvo']}: modo '{modo}' desconhecido")
+        elif modo == "dias" and spec["alvo"] not in DAY_DRIVERS:
+            erros.append(f"{spec['alvo']}: o modo 'dias' vale só para {', '.join(DAY_DRIVERS)}")
+    return erros
+
+
+def _apply(cols, spec, shocks, pass_through):
+    alvo, modo = spec["alvo"], spec.get("modo", "pct")
+    if alvo in DAY_DRIVERS:
+        saldo, base = DAY_DRIVERS[alvo]
+        # pct: prazo atual x (1 + choque), isto é, o saldo na mesma proporção;
+        # abs/dias: deslocamento em dias
+        cols[saldo] = cols[saldo] * (1 + shocks / 100) if modo == "pct" else cols[saldo] + shocks / 360 * cols[base]
+        return
+    if modo == "dias":
+        raise ValueError(f"{alvo}: o modo 'dias' vale só para {', '.join(DAY_DRIVERS)}")
+    delta = {}
+    for var in DRIVERS.get(alvo, [alvo]):
+        novo = cols[var] * (1 + shocks / 100) if modo == "pct" else cols[var] + shocks
+        delta[var] = novo - cols[var]
+        cols[var] = novo
+    if alvo == REVENUE_DRIVER:
+        for var, receita in PROFIT_LINES.items():
+            cols[var] = cols[var] + pass_through * delta[receita]
+        for var, receita in COST_LINES.items():
+            cols[var] = cols[var] + (1 - pass_through) * delta[receita]
+
+
+def scenario_columns(base_inputs, specs, shocks, n, pass_through=None):
+    """Colunas do lote: inputs base repetidos com os choques aplicados."""
+    if pass_through is None:
+        pass_through = default_pass_through(base_inputs)
+    cols = {var: np.full(n, float(base_inputs.get(var, 0.0))) for var in raw_inputs()}
+    # Prazos por último: o saldo acompanha a receita/CMV/compras já perturbados
+    ordered = sorted(range(len(specs)), key=lambda i: specs[i]["alvo"] in DAY_DRIVERS)
+    for i in ordered:
+        _apply(cols, specs[i], shocks[i], pass_through)
+    return cols
+
+
+def simulate(base_inputs, specs, n=100_000, seed=None, pass_through=None):
+    """Avalia `n` cenários de uma vez; devolve o resumo da simulação.
+
+    `specs` é uma lista de perturbações {alvo, modo, dist, min, max}, com
+    `modo` "pct" (variação %), "abs" (variação absoluta) ou "dias" (só
+    PMR/PME/PMP; neles "pct" é variação % do prazo). `pass_through` é o
+    repasse da receita ao lucro (0-1; padrão default_pass_through). O resumo
+    traz as faixas de percentis dos valores e dos achievements,
+    P(achievement >= 100) por KPI e o tornado de cada KPI.
+    """
+    if pass_through is None:
+        pass_through = default_pass_through(base_inputs)
+    rng = np.random.default_rng(seed)
+    shocks = [sample(spec, n, rng) for spec in specs]
+    valores, atingimentos = score_batch(scenario_columns(base_inputs, specs, shocks, n, pass_through))
+    base_val, base_ach = score_batch({var: [float(base_inputs.get(var, 0.0))] for var in raw_inputs()})
+
+    vals, achs = valores.to_numpy(), atingimentos.to_numpy()
+    names = list(valores.columns)
+    return {
+        "n": n,
+        "kpis": names,
+        "base": dict(zip(names, base_val.to_numpy()[0])),
+        "base_ach": dict(zip(names, base_ach.to_numpy()[0])),
+        "bandas": dict(zip(names, np.percentile(vals, PERCENTILES, axis=0).T)),
+        "bandas_ach": dict(zip(names, np.percentile(achs, PERCENTILES, axis=0).T)),
+        "prob_meta": dict(zip(names, (achs >= 100).mean(axis=0))),
+        "tornado": tornado(base_inputs, specs, pass_through),
+        "repasse": pass_through,
+    }
+
+
+def tornado(base_inputs, specs, pass_through=None):
+    """Sensibilidade um fator por vez: cada perturbação no P5 e no P95.
+
+    Devolve {kpi: [(alvo, valor_baixo, valor_alto), ...]} ordenado pela
+    amplitude; as 2 x len(specs) avaliações saem de um único lote.
+    """
+    if not specs:
+        return {}
+    k = len(specs)
+    # Linha 2i: só a perturbação i no P5; linha 2i+1: só ela no P95
+    shocks = [np.zeros(2 * k) for _ in specs]
+    rng = np.random.default_rng(0)
+    for i, spec in enumerate(specs):
+        p5, p95 = np.percentile(sample(spec, 20_000, rng), [5, 95])
+        shocks[i][2 * i], shocks[i][2 * i + 1] = p5, p95
+    valores, _ = score_batch(scenario_columns(base_inputs, specs, shocks, 2 * k, pass_through))
+    vals = valores.to_numpy()
+    result = {}
+    for j, kpi_name in enumerate(valores.columns):
+        linhas = [(spec["alvo"], float(vals[2 * i, j]), float(vals[2 * i + 1, j])) for i, spec in enumerate(specs)]
+        result[kpi_name] = sorted(linhas, key=lambda r: abs(r[2] - r[1]), reverse=True)
+    return result
+
+
+# ============================================
+# GRÁFICOS
+# ============================================
+
+def bands_figure(resumo, kpis):
+    """Faixas P5-P95 / P25-P75 e mediana dos achievements (escala 0-100%)."""
+    import plotly.graph_objects as go
+    bandas = [resumo["bandas_ach"][k] for k in kpis]
+    fig = go.Figure()
+    fig.add_trace(go.Bar(y=kpis, x=[b[4] - b[0] for b in bandas], base=[b[0] for b in bandas],
+                         orientation="h", name="P5-P95", marker_color="rgba(30, 136, 229, 0.25)"))
+    fig.add_trace(go.Bar(y=kpis, x=[b[3] - b[1] for b in bandas], base=[b[1] for b in bandas],
+                         orientation="h", name="P25-P75", marker_color="rgba(30, 136, 229, 0.6)"))
+    fig.add_trace(go.Scatter(y=kpis, x=[b[2] for b in bandas], mode="markers", name="Mediana",
+                             marker=dict(color="#0D47A1", size=10, symbol="line-ns-open")))
+    fig.add_trace(go.Scatter(y=kpis, x=[resumo["base_ach"][k] for k in kpis], mode="markers", name="Atual",
+                             marker=dict(color="#F44336", size=9, symbol="diamond")))
+    fig.update_layout(barmode="overlay", height=120 + 45 * len(kpis), title="Achievement (%) nos cenários",
+                      xaxis=dict(range=[0, 105], title="Achievement (%)"))
+    return fig
+
+
+def tornado_figure(resumo, kpi_name):
+    """Tornado: variação do KPI com cada fator no P5 e no P95."""
+    import plotly.graph_objects as go
+    linhas = list(reversed(resumo["tornado"].get(kpi_name, [])))
+    base = resumo["base"][kpi_name]
+    fig = go.Figure()
+    fig.add_trace(go.Bar(y=[r[0] for r in linhas], x=[r[1] - base for r in linhas], base=base,
+                         orientation="h", name="Fator no P5", marker_color="#FF9800"))
+    fig.add_trace(go.Bar(y=[r[0] for r in linhas], x=[r[2] - base for r in linhas], base=base,
+                         orientation="h", name="Fator no P95", marker_color="#1E88E5"))
+    fig.update_layout(barmode="overlay", height=150 + 40 * len(linhas),
+                      title=f"Sensibilidade - {kpi_name} (atual: {base:,.2f})")
+    return fig
+
+
+def metas():
+    """Meta e tipo de cada KPI, para a tabela de resultados."""
+    return {kpi_name: (cfg['meta'], cfg['tipo']) for _, kpi_name, cfg in iter_kpis()}
@@ -0,0 +1,261 @@
+# ============================================
+# MEMÓRIA POR SESSÃO (ESTIMATIVA E DESCARGA EM DISCO)
+# ============================================
+# Cada sessão do Streamlit guarda o próprio session_state no processo. O que
+# é pequeno (grafo de KPIs em arrays, estado dos widgets) fica sempre em
+# memória; o que é pesado (ex.: o portfólio importado, com DataFrames de
+# milhares de linhas) entra num Spillable. Um registro único por processo
+# acompanha a última atividade de cada sessão e, quando uma sessão passa de
+# FPA_SESSION_IDLE_S segundos parada (padrão 15 min), grava os Spillables dela
+# em disco e solta a memória. O valor volta do disco no primeiro acesso,
+# quando o analista retorna.
+#
+# A descarga usa Parquet (um arquivo por DataFrame do valor; caches como as
+# figuras memorizadas são descartados e refeitos) num diretório privado do
+# processo (mkdtemp, 0700) ou em FPA_SPILL_DIR, que precisa ser do usuário do
+# app e sem acesso de outros. Nada é lido de volta com pickle.
+#
+# Não é possível mexer no session_state de outra sessão: por isso a descarga
+# vale só para os valores registrados como Spillable. Os tamanhos são medidos
+# quando um valor entra no session_state (ou no Spillable) e reaproveitados
+# enquanto o mesmo objeto continuar lá: um rerun não varre o portfólio.
+#
+# Arquivos temporários da sessão (relatórios exportados) também ficam no
+# registro e são apagados quando ela é descarregada ou esquecida.
+
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+import time
+import weakref
+from array import array
+from collections import deque
+
+IDLE_SECONDS = float(os.environ.get("FPA_SESSION_IDLE_S", 900))
+SPILL_DIR = os.environ.get("FPA_SPILL_DIR")  # None: diretório privado criado sob demanda
+SWEEP_INTERVAL = 60
+
+
+def sizeof(obj, _seen=None):
+    """Estimativa em bytes de um valor do session_state (recursiva)."""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    if isinstance(obj, Spillable):
+        return 0 if obj.spilled else obj.nbytes
+    if hasattr(obj, "memory_usage") and hasattr(obj, "columns"):  # DataFrame
+        return int(obj.memory_usage(deep=True).sum())
+    if hasattr(obj, "nbytes") and not callable(obj.nbytes):  # ndarray / Series
+        return int(obj.nbytes) + sys.getsizeof(obj)
+    if hasattr(obj, "nbytes"):  # KPIGraph
+        return int(obj.nbytes()) + sys.getsizeof(obj)
+    if hasattr(obj, "to_plotly_json"):  # figura plotly memorizada
+        return sys.getsizeof(obj) + sizeof(obj.to_plotly_json(), _seen)
+    if isinstance(obj, array):
+        return sys.getsizeof(obj)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(sizeof(k, _seen) + sizeof(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(sizeof(item, _seen) for item in obj)
+    return size
+
+
+def process_rss():
+    """Memória residente do processo em bytes (None fora do Linux)."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+_private_dir = None
+_private_lock = threading.Lock()
+
+
+def spill_directory(directory=None):
+    """Diretório de descarga: privado do processo, ou `directory` se for só nosso."""
+    global _private_dir
+    if directory is None:
+        with _private_lock:
+            if _private_dir is None or not os.path.isdir(_private_dir):
+                _private_dir = tempfile.mkdtemp(prefix="fpa_sessions_")
+            return _private_dir
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.stat(directory)
+    if (hasattr(os, "getuid") and info.st_uid != os.getuid()) or info.st_mode & (stat.S_IRWXG | stat.S_IRWXO):
+        raise PermissionError(f"{directory} precisa ser do usuário do app e sem acesso de outros (chmod 700)")
+    return directory
+
+
+def _frames(value):
+    # DataFrames de um valor descarregável ({nome: DataFrame, ...}); o resto é cache
+    if not isinstance(value, dict):
+        return None
+    frames = {k: v for k, v in value.items() if hasattr(v, "to_parquet")}
+    return frames or None
+
+
+class Spillable:
+    """Valor pesado da sessão ({nome: DataFrame}) que pode ser descarregado em disco."""
+
+    __slots__ = ("_value", "_path", "_lock", "nbytes", "__weakref__")
+
+    def __init__(self, value):
+        self._value = value
+        self._path = None
+        self._lock = threading.Lock()
+        self.nbytes = sizeof(value)
+
+    @property
+    def spilled(self):
+        return self._path is not None
+
+    def account(self, nbytes):
+        """Soma ao tamanho conhecido algo guardado dentro do valor (ex.: figura memorizada)."""
+        self.nbytes += int(nbytes)
+
+    def get(self):
+        """O valor, relido do disco se a sessão ficou ociosa."""
+        import pandas as pd
+        with self._lock:
+            if self._path is not None:
+                value = {}
+                for name in os.listdir(self._path):
+                    value[name[:-len(".parquet")]] = pd.read_parquet(os.path.join(self._path, name))
+                shutil.rmtree(self._path, ignore_errors=True)
+                self._value, self._path = value, None
+                # Valor trocado (sem os caches descartados): nova medida
+                self.nbytes = sizeof(value)
+            return self._value
+
+    def spill(self, directory=SPILL_DIR):
+        """Grava os DataFrames em disco e solta o valor da memória; devolve os bytes liberados."""
+        with self._lock:
+            frames = _frames(self._value)
+            if self._path is not None or frames is None:
+                return 0
+            path = tempfile.mkdtemp(dir=spill_directory(directory))
+            try:
+                for name, frame in frames.items():
+                    frame.to_parquet(os.path.join(path, f"{name}.parquet"))
+            except Exception:
+                shutil.rmtree(path, ignore_errors=True)
+                raise
+            self._path, self._value = path, None
+            return self.nbytes
+
+    def __del__(self):
+        # Sessão encerrada com o valor ainda em disco
+        if self._path is not None:
+            shutil.rmtree(self._path, ignore_errors=True)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class SessionRegistry:
+    """Última atividade, memória estimada e Spillables de cada sessão do processo."""
+
+    def __init__(self, idle_seconds=IDLE_SECONDS, directory=SPILL_DIR):
+        self.idle_seconds = idle_seconds
+        self.directory = directory
+        self._sessions = {}   # id -> {"visto", "bytes", "medidas", "medido", "slots": WeakSet, "arquivos": set}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def touch(self, session_id, state):
+        """Registra a atividade da sessão e estima o tamanho do seu session_state."""
+        now = time.monotonic()
+        with self._lock:
+            info = self._sessions.get(session_id) or {}
+        # Tamanho por chave, medido quando o valor entra ou é trocado; uma nova
+        # medida completa no máximo a cada SWEEP_INTERVAL pega mutações no lugar
+        completa = now - info.get("medido", float("-inf")) >= SWEEP_INTERVAL
+        medidas = {} if completa else info["medidas"]
+        atuais, slots = {}, weakref.WeakSet()
+        for key, value in state.items():
+            if isinstance(value, Spillable):
+                # Spillables entram à parte: o tamanho deles já é conhecido
+                slots.add(value)
+                continue
+            anterior = medidas.get(key)
+            atuais[key] = anterior if anterior and anterior[0] == id(value) else (id(value), sizeof(value))
+        with self._lock:
+            self._sessions[session_id] = {
+                "visto": now, "slots": slots, "medidas": atuais,
+                "medido": now if completa else info["medido"],
+                "bytes": sum(n for _, n in atuais.values()),
+                "arquivos": self._sessions.get(session_id, {}).get("arquivos", set()),
+            }
+
+    def attach_file(self, session_id, path):
+        """Arquivo temporário da sessão, apagado quando ela fica ociosa ou é esquecida."""
+        with self._lock:
+            info = self._sessions.setdefault(session_id, {"visto": time.monotonic(), "bytes": 0, "medidas": {},
+                                                          "slots": weakref.WeakSet(), "arquivos": set()})
+            info["arquivos"].add(path)
+
+    def release_file(self, session_id, path):
+        """Apaga agora um arquivo da sessão (ex.: relatório substituído por outro)."""
+        with self._lock:
+            info = self._sessions.get(session_id)
+            if info is not None:
+                info["arquivos"].discard(path)
+        _remove(path)
+
+    def ping(self, session_id):
+        """Só a atividade (reruns de fragmento): o tamanho fica o do último touch."""
+        with self._lock:
+            info = self._sessions.get(session_id)
+            if info is not None:
+                info["visto"] = time.monotonic()
+
+    def sweep(self, now=None):
+        """Descarrega as sessões ociosas; esquece as encerradas. Devolve os bytes liberados."""
+        now = time.monotonic() if now is None else now
+        liberados = 0
+        with self._lock:
+            self._last_sweep = now
+            ociosas = [(sid, info) for sid, info in self._sessions.items()
+                       if now - info["visto"] >= self.idle_seconds]
+            for sid, info in ociosas:
+                if not info["slots"] and now - info["visto"] >= 2 * self.idle_seconds:
+                    del self._sessions[sid]
+        for sid, info in ociosas:
+            for slot in list(info["slots"]):
+                liberados += slot.spill(self.directory)
+            with self._lock:
+                arquivos, info["arquivos"] = info["arquivos"], set()
+            for path in arquivos:
+                _remove(path)
+        return liberados
+
+    def maybe_sweep(self):
+        # Chamado a cada rerun de qualquer sessão; varre no máximo a cada SWEEP_INTERVAL
+        if time.monotonic() - self._last_sweep >= SWEEP_INTERVAL:
+            return self.sweep()
+        return 0
+
+    def report(self):
+        """Uma linha por sessão: id, segundos parada, bytes em memória e em disco."""
+        now = time.monotonic()
+        with self._lock:
+            items = list(self._sessions.items())
+        linhas = []
+        for sid, info in items:
+            slots = list(info["slots"])
+            linhas.append({"sessao": sid, "parada_s": round(now - info["visto"]),
+                           "memoria": info["bytes"] + sum(s.nbytes for s in slots if not s.spilled),
+                           "disco": sum(s.nbytes for s in slots if s.spilled)})
+        return linhas
@@ -0,0 +1,336 @@
+# ============================================
+# LEITURA DE DEMONSTRAÇÕES FINANCEIRAS (PDF / EXCEL)
+# ============================================
+# Extrai as linhas de balanços patrimoniais e DREs enviados pelos clientes
+# ("Ativo Circulante 1.234.567", "(-) Deduções (12.345)") e associa cada
+# rótulo a um input bruto do catálogo (LINE_ITEMS). Os documentos são lidos em
+# um pool de processos (um arquivo por processo) e o resultado fica em cache
+# pelo hash SHA-256 do conteúdo: reenviar o mesmo arquivo não o lê de novo.
+#
+# Motores: PyMuPDF (fitz) para o texto dos PDFs quando instalado, senão
+# pdfplumber (texto e tabelas); python-calamine para as planilhas.
+
+import hashlib
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from analysis import LRUCache
+from importer import normalize_label
+from kpis import raw_inputs
+
+PDF_TYPES = (".pdf",)
+EXCEL_TYPES = (".xlsx", ".xlsm", ".xls", ".xlsb", ".ods")
+MAX_WORKERS = int(os.environ.get("FPA_INGEST_PROCESSES", min(8, os.cpu_count() or 2)))
+
+# Rótulos usuais das demonstrações para cada input bruto (além do próprio nome)
+LINE_ITEMS = {
+    "Receita Bruta": ["receita operacional bruta", "receita bruta de vendas", "receita bruta de vendas e servicos",
+                      "faturamento bruto"],
+    "Deduções": ["deducoes da receita bruta", "deducoes da receita", "deducoes de vendas"],
+    "Receita Total": ["receitas totais", "total das receitas"],
+    "Custos Totais": ["custos e despesas totais", "total dos custos e despesas"],
+    "CMV": ["custo das mercadorias vendidas", "custo dos produtos vendidos", "custo das vendas",
+            "custo dos servicos prestados", "custo dos produtos e servicos vendidos"],
+    "EBITDA": ["lajida", "ebitda ajustado"],
+    "EBIT": ["lajir", "lucro operacional", "resultado operacional",
+             "resultado antes do resultado financeiro", "lucro antes do resultado financeiro"],
+    "Despesas Financeiras": ["despesas financeiras liquidas"],
+    "NOPAT": ["lucro operacional liquido apos impostos"],
+    "Ativo Total": ["total do ativo", "ativo"],
+    "Ativo Circulante": ["total do ativo circulante"],
+    "Passivo Circulante": ["total do passivo circulante"],
+    "Passivo Total": ["passivo exigivel", "total do passivo exigivel", "exigivel total"],
+    "Patrimônio Líquido": ["total do patrimonio liquido", "patrimonio liquido total"],
+    "Estoques": ["estoque", "mercadorias em estoque"],
+    "Disponível": ["disponibilidades", "caixa e equivalentes de caixa", "caixa e equivalentes"],
+    "Duplicatas a Receber": ["contas a receber", "contas a receber de clientes", "clientes"],
+    "Fornecedores": ["contas a pagar a fornecedores"],
+    "Dívida Líquida": ["endividamento liquido"],
+    "Compras": ["compras de mercadorias", "compras do periodo"],
+    "Custos Fixos": ["despesas fixas"],
+    "Custos Variáveis": ["despesas variaveis"],
+}
+
+# Linha que se soma para formar um input ausente (ex.: exigível = PC + PNC)
+_PARTS = {"Passivo Total": ("Passivo Circulante", "Passivo Não Circulante")}
+_EXTRA_LABELS = {"Passivo Não Circulante": ["passivo nao circulante", "total do passivo nao circulante",
+                                            "exigivel a longo prazo"]}
+
+# Custos e deduções aparecem negativos na DRE ("(-) CMV (1.234)"); as
+# fórmulas dos KPIs esperam o valor absoluto
+_EXPENSES = frozenset(["Deduções", "Custos Totais", "CMV", "Despesas Financeiras", "Compras",
+                       "Custos Fixos", "Custos Variáveis"])
+_RAW_SET = frozenset(raw_inputs())
+
+_NUMBER = re.compile(r"\(?-?\s*(?:R\$\s*)?\d[\d.,]*\)?")
+_PREFIX = re.compile(r"^(?:\(?[-+=]\)?\s*|\d+(?:\.\d+)*\.?\s+)+")
+
+
+def _label_index():
+    index = {}
+    for var, labels in list(LINE_ITEMS.items()) + list(_EXTRA_LABELS.items()):
+        for label in labels:
+            index.setdefault(normalize_label(label), var)
+    for var in raw_inputs():
+        index.setdefault(normalize_label(var), var)
+    return index
+
+
+_LABELS = _label_index()
+
+
+def content_hash(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def parse_number(text):
+    """'1.234.567,89' -> 1234567.89; '(12.345)' -> -12345.0; None se não for número."""
+    text = str(text).strip().replace("R$", "").replace(" ", "")
+    negative = text.startswith("(") and text.endswith(")") or text.startswith("-")
+    text = text.strip("()-")
+    if not text or not text[0].isdigit():
+        return None
+    if "," in text:
+        text = text.replace(".", "").replace(",", ".")
+    elif text.count(".") > 1 or re.fullmatch(r"\d{1,3}\.\d{3}", text):
+        text = text.replace(".", "")
+    try:
+        value = float(text)
+    except ValueError:
+        return None
+    return -value if negative else value
+
+
+def match_label(label):
+    """Input bruto de um rótulo de demonstração (ou None)."""
+    label = _PREFIX.sub("", str(label).strip()).strip(" .:;-")
+    return _LABELS.get(normalize_label(label))
+
+
+def _split_line(line):
+    # "Estoques  5  1.234  1.100" -> ("Estoques", [5, 1234, 1100])
+    match = _NUMBER.search(line)
+    while match is not None:
+        label, rest = line[:match.start()], line[match.start():]
+        values = [parse_number(tok) for tok in _NUMBER.findall(rest)]
+        if label.strip() and any(c.isalpha() for c in label) and not _NUMBER.sub("", rest).strip():
+            return label, [v for v in values if v is not None]
+        match = _NUMBER.search(line, match.end())
+    return None, []
+
+
+def _current_value(values):
+    # Primeira coluna numérica = período atual; um inteiro pequeno antes de
+    # dois ou mais valores é a referência da nota explicativa
+    if len(values) >= 3 and float(values[0]).is_integer() and 0 < values[0] < 100:
+        values = values[1:]
+    return values[0] if values else None
+
+
+def _scale(text):
+    norm = normalize_label(text)
+    if "em milhoes" in norm or "r$ milhoes" in norm:
+        return 1_000_000.0
+    if "em milhares" in norm or "r$ mil" in norm:
+        return 1_000.0
+    return 1.0
+
+
+def _words_to_text(words, tolerance=3.0):
+    # O PyMuPDF separa as células da tabela em blocos: remonta as linhas
+    # juntando as palavras com a mesma base (y1), da esquerda para a direita
+    lines, current = [], []
+    for word in sorted(words, key=lambda w: w[3]):
+        if current and word[3] - current[-1][3] > tolerance:
+            lines.append(current)
+            current = []
+        current.append(word)
+    if current:
+        lines.append(current)
+    return "\n".join(" ".join(w[4] for w in sorted(line, key=lambda w: w[0])) for line in lines)
+
+
+def _pdf_rows(path):
+    # (rótulo, valores) de cada linha de texto e de cada linha de tabela
+    try:
+        import fitz  # PyMuPDF: texto bem mais rápido que o pdfplumber
+    except ImportError:
+        fitz = None
+    if fitz is not None:
+        with fitz.open(path) as doc:
+            texts = [_words_to_text(page.get_text("words")) for page in doc]
+        return "pymupdf", texts, [_split_line(line) for text in texts for line in text.splitlines()]
+
+    import pdfplumber
+    texts, rows = [], []
+    with pdfplumber.open(path) as pdf:
+        for page in pdf.pages:
+            text = page.extract_text() or ""
+            texts.append(text)
+            rows.extend(_split_line(line) for line in text.splitlines())
+            for table in page.extract_tables():
+                for cells in table:
+                    cells = [c for c in cells if c not in (None, "")]
+                    if len(cells) >= 2:
+                        values = [parse_number(c) for c in cells[1:]]
+                        rows.append((cells[0], [v for v in values if v is not None]))
+    return "pdfplumber", texts, rows
+
+
+def _excel_rows(path):
+    from python_calamine import CalamineWorkbook
+    workbook = CalamineWorkbook.from_path(path)
+    texts, rows = [], []
+    for sheet_name in workbook.sheet_names:
+        for cells in workbook.get_sheet_by_name(sheet_name).to_python(skip_empty_area=True):
+            label, values = None, []
+            for cell in cells:
+                if label is None:
+                    if isinstance(cell, str) and any(c.isalpha() for c in cell):
+                        label = cell
+                        texts.append(cell)
+                elif isinstance(cell, (int, float)) and not isinstance(cell, bool):
+                    values.append(float(cell))
+                elif isinstance(cell, str) and cell.strip():
+                    value = parse_number(cell)
+                    if value is not None:
+                        values.append(value)
+            if label is not None:
+                rows.append((label, values))
+    return "calamine", ["\n".join(texts[:50])], rows
+
+
+def parse_document(path, name=None):
+    """Lê uma demonstração e devolve {itens, origem, nao_mapeadas, escala, motor, ms}.
+
+    `itens` traz {input bruto: valor} já multiplicado pela escala declarada
+    no documento ("em milhares de reais" -> x1000); `origem` guarda o rótulo
+    de onde cada valor saiu. Roda nos processos do pool: recebe um caminho e
+    devolve só tipos simples.
+    """
+    inicio = time.perf_counter()
+    name = name or os.path.basename(path)
+    ext = os.path.splitext(name)[1].lower()
+    try:
+        if ext in PDF_TYPES:
+            motor, texts, rows = _pdf_rows(path)
+        elif ext in EXCEL_TYPES:
+            motor, texts, rows = _excel_rows(path)
+        else:
+            raise ValueError(f"Formato não suportado: {ext or name}")
+    except Exception as exc:
+        return {"nome": name, "erro": f"{type(exc).__name__}: {exc}"}
+
+    escala = _scale(texts[0] if texts else "")
+    itens, origem, nao_mapeadas = {}, {}, []
+    for label, values in rows:
+        if label is None:
+            continue
+        value = _current_value(values)
+        if value is None:
+            continue
+        var = match_label(label)
+        if var is None:
+            nao_mapeadas.append(str(label).strip())
+        elif var not in itens:
+            # A primeira ocorrência vale (demonstração antes das notas)
+            itens[var] = (abs(value) if var in _EXPENSES else value) * escala
+            origem[var] = str(label).strip()
+
+    for var, parts in _PARTS.items():
+        if var not in itens and all(p in itens for p in parts):
+            itens[var] = sum(itens[p] for p in parts)
+            origem[var] = " + ".join(parts)
+    itens = {var: value for var, value in itens.items() if var in _RAW_SET}
+    return {"nome": name, "itens": itens, "origem": {var: origem[var] for var in itens},
+            "nao_mapeadas": nao_mapeadas[:200], "escala": escala, "motor": motor,
+            "ms": round((time.perf_counter() - inicio) * 1000, 1)}
+
+
+def _parse_bytes(content, name):
+    # Ponto de entrada dos processos do pool: grava o conteúdo em arquivo temporário
+    import tempfile
+    fd, path = tempfile.mkstemp(suffix=os.path.splitext(name)[1].lower())
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(content)
+        return parse_document(path, name)
+    finally:
+        os.remove(path)
+
+
+def entity_from_name(name):
+    """Empresa de um documento pelo prefixo do nome ("acme_bp.pdf" -> "acme")."""
+    return os.path.splitext(os.path.basename(name))[0].replace("-", "_").split("_")[0]
+
+
+def merge_items(results):
+    """Une os itens de vários documentos de uma empresa (o primeiro a trazer o input vale)."""
+    itens = {}
+    for result in results:
+        for var, value in result.get("itens", {}).items():
+            itens.setdefault(var, value)
+    return itens
+
+
+class StatementIngestor:
+    """Pool de processos + cache por hash de conteúdo, compartilhado entre sessões."""
+
+    def __init__(self, max_workers=MAX_WORKERS, max_entries=512):
+        self.max_workers = max_workers
+        self.cache = LRUCache(max_entries=max_entries)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn: o processo do Streamlit tem vários threads, e fork
+                # copiaria locks possivelmente presos
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def ingest(self, documents, keys=None):
+        """Lê [(nome, bytes), ...] e devolve os resultados na mesma ordem.
+
+        Documentos já vistos (mesmo hash) saem do cache; os demais são lidos
+        em paralelo no pool (um único documento novo é lido neste processo).
+        `keys` traz os hashes já calculados pelo chamador, na mesma ordem.
+        """
+        if keys is None:
+            keys = [content_hash(content) for _, content in documents]
+        results, pending = {}, {}
+        for key, (name, content) in zip(keys, documents):
+            if key in results or key in pending:
+                continue
+            cached = self.cache.get(key)
+            if cached is not None:
+                results[key] = cached
+            else:
+                pending[key] = (name, content)
+
+        if len(pending) == 1:
+            key, (name, content) = next(iter(pending.items()))
+            results[key] = _parse_bytes(content, name)
+        elif pending:
+            pool = self._executor()
+            futures = {key: pool.submit(_parse_bytes, content, name) for key, (name, content) in pending.items()}
+            for key, future in futures.items():
+                results[key] = future.result()
+        for key in pending:
+            if "erro" not in results[key]:
+                self.cache.put(key, results[key])
+
+        # Mesmo conteúdo com outro nome: o resultado é o mesmo, o nome não
+        return [dict(results[key], nome=name, hash=key[:12]) for key, (name, _) in zip(keys, documents)]
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
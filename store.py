@@ -0,0 +1,256 @@
+# ============================================
+# HISTÓRICO PERSISTENTE (SQLite via SQLAlchemy)
+# ============================================
+# Guarda, por empresa e período, os inputs digitados, os valores calculados e
+# os achievements. Índices em (empresa, período, kpi) e (empresa, kpi,
+# período) deixam as consultas de tendência e de período anterior na casa dos
+# milissegundos mesmo com anos de histórico. Cargas de fechamento usam
+# inserts em lote (executemany) dentro de uma única transação.
+
+import os
+from datetime import datetime
+
+from sqlalchemy import (Column, DateTime, Float, Index, Integer, MetaData, String, Table,
+                        create_engine, delete, event, func, insert, select, tuple_)
+
+# Ao lado do app, como os demais arquivos dele: não depende do diretório de execução
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_URL = os.environ.get("FPA_STORE_URL", "sqlite:///" + os.path.join(BASE_DIR, "fpa_historico.db"))
+BATCH_SIZE = 5_000
+
+metadata = MetaData()
+
+snapshots = Table(
+    "snapshots", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("company", String(120), nullable=False),
+    Column("period", String(20), nullable=False),
+    Column("created_at", DateTime, nullable=False),
+    Index("ux_snapshots_company_period", "company", "period", unique=True),
+)
+
+snapshot_inputs = Table(
+    "snapshot_inputs", metadata,
+    Column("company", String(120), nullable=False),
+    Column("period", String(20), nullable=False),
+    Column("input", String(120), nullable=False),
+    Column("value", Float, nullable=False),
+    Index("ix_inputs_company_period_input", "company", "period", "input"),
+    Index("ix_inputs_company_input_period", "company", "input", "period"),
+)
+
+snapshot_results = Table(
+    "snapshot_results", metadata,
+    Column("company", String(120), nullable=False),
+    Column("period", String(20), nullable=False),
+    Column("kpi", String(120), nullable=False),
+    Column("value", Float, nullable=False),
+    Column("achievement", Float, nullable=False),
+    Index("ix_results_company_period_kpi", "company", "period", "kpi"),
+    Index("ix_results_company_kpi_period", "company", "kpi", "period"),
+)
+
+# Setor de cada empresa (grupo de pares em peers.py); tabela à parte para
+# bancos antigos ganharem a informação sem migração
+company_sectors = Table(
+    "company_sectors", metadata,
+    Column("company", String(120), primary_key=True),
+    Column("sector", String(120), nullable=False),
+)
+
+
+def _sqlite_pragmas(dbapi_connection, _):
+    # WAL permite leituras do painel durante uma carga em lote
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+def _years_between(start, end):
+    """Anos decorridos entre dois períodos AAAA ou AAAA-MM (None se não reconhecidos).
+
+    Um período só com o ano conta como o fechamento do ano (mês 12).
+    """
+    meses = []
+    for period in (start, end):
+        ano, _, mes = period.partition("-")
+        if not ano.isdigit() or (mes and not mes.isdigit()):
+            return None
+        meses.append(int(ano) * 12 + (int(mes) if mes else 12))
+    return (meses[1] - meses[0]) / 12 or None
+
+
+class KPIStore:
+    def __init__(self, url=DEFAULT_URL):
+        self.engine = create_engine(url)
+        if self.engine.dialect.name == "sqlite":
+            event.listen(self.engine, "connect", _sqlite_pragmas)
+        metadata.create_all(self.engine)
+
+    # ---------- gravação ----------
+
+    def save_many(self, records, batch_size=BATCH_SIZE):
+        """Grava vários snapshots (company, period, inputs, values, achievements).
+
+        Um snapshot existente para a mesma empresa/período é substituído.
+        As linhas são enviadas em lotes de `batch_size` numa única transação.
+        """
+        now = datetime.now()
+        with self.engine.begin() as conn:
+            snaps, inputs, results, pending = [], [], [], set()
+            for company, period, input_values, values, achievements in records:
+                company, period = str(company), str(period)
+                if (company, period) in pending:
+                    # Mesma empresa/período repetida na carga: a última prevalece
+                    self._flush(conn, snaps, inputs, results)
+                    snaps, inputs, results, pending = [], [], [], set()
+                pending.add((company, period))
+                snaps.append({"company": company, "period": period, "created_at": now})
+                inputs.extend({"company": company, "period": period, "input": var, "value": float(v)}
+                              for var, v in input_values.items())
+                results.extend({"company": company, "period": period, "kpi": kpi,
+                                "value": float(values[kpi]), "achievement": float(achievements[kpi])}
+                               for kpi in values)
+                if len(inputs) + len(results) >= batch_size:
+                    self._flush(conn, snaps, inputs, results)
+                    snaps, inputs, results, pending = [], [], [], set()
+            self._flush(conn, snaps, inputs, results)
+
+    def _flush(self, conn, snaps, inputs, results):
+        if not snaps:
+            return
+        keys = [(s["company"], s["period"]) for s in snaps]
+        for table in (snapshots, snapshot_inputs, snapshot_results):
+            conn.execute(delete(table).where(tuple_(table.c.company, table.c.period).in_(keys)))
+        conn.execute(insert(snapshots), snaps)
+        if inputs:
+            conn.execute(insert(snapshot_inputs), inputs)
+        if results:
+            conn.execute(insert(snapshot_results), results)
+
+    def save_snapshot(self, company, period, input_values, values, achievements):
+        self.save_many([(company, period, input_values, values, achievements)])
+
+    def save_portfolio(self, inputs, valores, atingimentos, company_col, period_col, sector_col=None):
+        """Grava um portfólio calculado em lote (DataFrames alinhados por índice)."""
+        ids = (company_col, period_col, sector_col)
+        input_cols = [c for c in inputs.columns if c not in ids]
+        kpi_cols = [c for c in valores.columns if c not in ids]
+        if sector_col is not None and sector_col in inputs.columns:
+            self.set_sectors(dict(zip(inputs[company_col].astype(str), inputs[sector_col].astype(str))))
+        in_rows = inputs[input_cols].to_numpy()
+        val_rows = valores[kpi_cols].to_numpy()
+        ach_rows = atingimentos[kpi_cols].to_numpy()
+        records = (
+            (company, period,
+             dict(zip(input_cols, in_rows[i])), dict(zip(kpi_cols, val_rows[i])), dict(zip(kpi_cols, ach_rows[i])))
+            for i, (company, period) in enumerate(zip(inputs[company_col], inputs[period_col]))
+        )
+        self.save_many(records)
+
+    def set_sectors(self, sectors):
+        """Grava/atualiza o setor de cada empresa ({empresa: setor})."""
+        rows = [{"company": str(c), "sector": str(s)} for c, s in sectors.items() if s and str(s) != "nan"]
+        if not rows:
+            return
+        with self.engine.begin() as conn:
+            conn.execute(delete(company_sectors).where(company_sectors.c.company.in_([r["company"] for r in rows])))
+            conn.execute(insert(company_sectors), rows)
+
+    # ---------- consultas ----------
+
+    def sectors(self):
+        with self.engine.connect() as conn:
+            return dict(conn.execute(select(company_sectors.c.company, company_sectors.c.sector)).all())
+
+    def sector(self, company):
+        with self.engine.connect() as conn:
+            return conn.scalar(select(company_sectors.c.sector).where(company_sectors.c.company == str(company)))
+
+    def peer_records(self, revenue_input="Receita Bruta"):
+        """Todos os snapshots como (empresa, período, setor, receita, {kpi: valor}).
+
+        Base do índice de pares (peers.PeerIndex.from_store): uma varredura
+        de snapshot_results, mais a receita e o setor de cada snapshot.
+        """
+        with self.engine.connect() as conn:
+            sectors = self.sectors()
+            revenue = {(c, p): v for c, p, v in conn.execute(
+                select(snapshot_inputs.c.company, snapshot_inputs.c.period, snapshot_inputs.c.value)
+                .where(snapshot_inputs.c.input == revenue_input))}
+            values = {}
+            for company, period, kpi, value in conn.execute(
+                    select(snapshot_results.c.company, snapshot_results.c.period,
+                           snapshot_results.c.kpi, snapshot_results.c.value)):
+                values.setdefault((company, period), {})[kpi] = value
+        return [(company, period, sectors.get(company), revenue.get((company, period), 0.0), kpi_values)
+                for (company, period), kpi_values in values.items()]
+
+    def companies(self):
+        with self.engine.connect() as conn:
+            return list(conn.scalars(select(snapshots.c.company).distinct().order_by(snapshots.c.company)))
+
+    def periods(self, company):
+        with self.engine.connect() as conn:
+            return list(conn.scalars(select(snapshots.c.period)
+                                     .where(snapshots.c.company == str(company))
+                                     .order_by(snapshots.c.period)))
+
+    def load_inputs(self, company, period):
+        with self.engine.connect() as conn:
+            rows = conn.execute(select(snapshot_inputs.c.input, snapshot_inputs.c.value)
+                                .where(snapshot_inputs.c.company == str(company),
+                                       snapshot_inputs.c.period == str(period)))
+            return dict(rows.all())
+
+    def _input_at(self, conn, company, period, var):
+        return conn.scalar(select(snapshot_inputs.c.value)
+                           .where(snapshot_inputs.c.company == company,
+                                  snapshot_inputs.c.input == var,
+                                  snapshot_inputs.c.period == period))
+
+    def prior_inputs(self, company, period):
+        """Inputs de comparação preenchidos a partir do histórico.
+
+        "Receita Anterior" vem da "Receita Atual" do período anterior; para o
+        CAGR, "Valor Inicial" vem do "Valor Final" do primeiro período gravado
+        e "n" são os anos decorridos entre ele e o atual (meses / 12 com
+        AAAA-MM). Períodos são ordenados como texto, portanto use AAAA ou
+        AAAA-MM.
+        """
+        company, period = str(company), str(period)
+        with self.engine.connect() as conn:
+            earlier = list(conn.scalars(select(snapshots.c.period)
+                                        .where(snapshots.c.company == company, snapshots.c.period < period)
+                                        .order_by(snapshots.c.period)))
+            if not earlier:
+                return {}
+            filled = {}
+            receita = self._input_at(conn, company, earlier[-1], "Receita Atual")
+            if receita is not None:
+                filled["Receita Anterior"] = receita
+            inicial = self._input_at(conn, company, earlier[0], "Valor Final")
+            if inicial is not None:
+                anos = _years_between(earlier[0], period)
+                if anos:
+                    filled["Valor Inicial"] = inicial
+                    filled["n"] = anos
+            return filled
+
+    def trend(self, company, kpis=None, column="value"):
+        """Série histórica (linhas = períodos, colunas = KPIs) de uma empresa."""
+        import pandas as pd
+        query = (select(snapshot_results.c.period, snapshot_results.c.kpi, snapshot_results.c[column])
+                 .where(snapshot_results.c.company == str(company)))
+        if kpis:
+            query = query.where(snapshot_results.c.kpi.in_(list(kpis)))
+        with self.engine.connect() as conn:
+            df = pd.DataFrame(conn.execute(query).all(), columns=["period", "kpi", column])
+        if df.empty:
+            return df
+        return df.pivot(index="period", columns="kpi", values=column).sort_index()
+
+    def count(self):
+        with self.engine.connect() as conn:
+            return conn.scalar(select(func.count()).select_from(snapshots))
@@ -0,0 +1,33 @@
+import csv
+import json
+import os
+import sys
+
+import pyarrow.parquet as pq
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from export import (KPI_COLUMNS, SUMMARY_COLUMNS, SUMMARY_MARKER, SUMMARY_METADATA_KEY,  # noqa: E402
+                    summary_row, write_csv, write_parquet)
+
+ROWS = [["Rentabilidade", "Margem EBITDA (%)", 25.0, 20.0, "125.0%", "✅ Meta Atingida", "maior"]] * 3
+
+
+def test_csv_leva_o_resumo_no_fim(tmp_path):
+    path = tmp_path / "r.csv"
+    summary = summary_row([125, 125, 125])
+    write_csv(path, KPI_COLUMNS, iter(ROWS), summary)
+    with open(path, encoding="utf-8-sig", newline="") as fh:
+        linhas = list(csv.reader(fh, delimiter=";"))
+    assert linhas[0] == KPI_COLUMNS and len(linhas) == 1 + len(ROWS) + 3
+    assert linhas[-2] == [SUMMARY_MARKER] + SUMMARY_COLUMNS
+    assert linhas[-1] == [SUMMARY_MARKER] + [str(v) for v in summary]
+
+
+def test_parquet_leva_o_resumo_nos_metadados(tmp_path):
+    path = tmp_path / "r.parquet"
+    summary = summary_row([125, 50, 10])
+    write_parquet(path, KPI_COLUMNS, iter(ROWS), summary, batch_size=2)
+    assert pq.read_table(path).num_rows == len(ROWS)
+    resumo = json.loads(pq.read_schema(path).metadata[SUMMARY_METADATA_KEY])
+    assert resumo == dict(zip(SUMMARY_COLUMNS, summary))
@@ -0,0 +1,58 @@
+import io
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from importer import ENTITY, PERIOD, _to_number, load_table, sniff_csv  # noqa: E402
+
+
+def _load(text):
+    table, _ = load_table(io.BytesIO(text.encode("utf-8")), name="inputs.csv")
+    return table.set_index(ENTITY)
+
+
+def test_csv_pt_br_ponto_de_milhar():
+    table = _load("Empresa;Receita Bruta;Deduções;EBITDA\n"
+                  "A;1.500;1.000;1.234,56\n"
+                  "B;2.300;1.000;12,5\n")
+    # Coluna só com "1.500" / "2.300": milhares, não 1,5 e 2,3
+    assert table["Receita Bruta"].tolist() == [1500.0, 2300.0]
+    assert table["Deduções"].tolist() == [1000.0, 1000.0]
+    assert table["EBITDA"].tolist() == [1234.56, 12.5]
+
+
+def test_csv_internacional():
+    table = _load('Empresa,Receita Bruta,Deduções\nA,1.5,"1,000.25"\nB,2.3,3\n')
+    assert table["Receita Bruta"].tolist() == [1.5, 2.3]
+    assert table["Deduções"].tolist() == [1000.25, 3.0]
+
+
+def test_convencao_decidida_pelo_arquivo():
+    assert sniff_csv(io.BytesIO(b"a;b\n1.500;2\n")) == (";", ",")
+    assert sniff_csv(io.BytesIO(b"a\tb\n1.500\t2,5\n")) == ("\t", ",")
+    assert sniff_csv(io.BytesIO(b"a,b\n1.5,2\n")) == (",", ".")
+
+
+def test_planilha_decide_por_coluna():
+    assert _to_number(pd.Series(["1.500", "1.234,56"])).tolist() == [1500.0, 1234.56]
+    assert _to_number(pd.Series(["1.5", "1,234.5"])).tolist() == [1.5, 1234.5]
+
+
+def test_ponto_e_virgula_com_decimal_em_ponto():
+    assert sniff_csv(io.BytesIO(b"a;b\n1000.5;2\n1.500;3\n")) == (";", ".")
+
+
+def test_ano_e_mes_em_colunas_separadas():
+    table, report = load_table(io.BytesIO("Empresa;Ano;Mês;Receita Bruta\nA;2023;12;1\nA;2024;12;2\nA;2024;mar;3\n"
+                                          .encode("utf-8")), name="inputs.csv")
+    assert table[PERIOD].tolist() == ["2023-12", "2024-12", "2024-03"]
+    assert report.unmapped == []
+
+
+def test_coluna_de_periodo_prevalece_sobre_ano():
+    table, report = load_table(io.BytesIO(b"Empresa;Periodo;Ano;Receita Bruta\nA;2024-01;2024;1\n"), name="inputs.csv")
+    assert table[PERIOD].tolist() == ["2024-01"]
+    assert report.unmapped == ["Ano"]
@@ -0,0 +1,71 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from importer import ENTITY, PERIOD  # noqa: E402
+from store import KPIStore  # noqa: E402
+from watcher import STATE_FILE, DropFolder  # noqa: E402
+
+
+def _csv(path, frame):
+    frame.to_csv(path, index=False, sep=";")
+    # mtime distinto a cada escrita, mesmo em sistemas de arquivos de baixa resolução
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def pasta(tmp_path):
+    (tmp_path / "drop").mkdir()
+    return tmp_path / "drop", tmp_path / "estado"
+
+
+def test_arquivos_com_colunas_diferentes(pasta, tmp_path):
+    drop, estado = pasta
+    _csv(drop / "a.csv", pd.DataFrame({ENTITY: ["A"], PERIOD: ["2024"], "Receita Bruta": [1000.0]}))
+    folder = DropFolder(drop, state_dir=estado)
+    folder.refresh()
+    _csv(drop / "b.csv", pd.DataFrame({ENTITY: ["B"], PERIOD: ["2024"], "EBITDA": [200.0]}))
+    report = folder.refresh()
+
+    assert report.novos == ["b.csv"]
+    inputs = folder.inputs.set_index(ENTITY)
+    assert not inputs[["Receita Bruta", "EBITDA"]].isna().any().any()
+    assert inputs.loc["A", "EBITDA"] == 0.0 and inputs.loc["B", "Receita Bruta"] == 0.0
+
+    # O histórico exige valores não nulos em snapshot_inputs
+    store = KPIStore(f"sqlite:///{tmp_path / 'historico.db'}")
+    store.save_portfolio(folder.inputs, folder.valores, folder.achievements, ENTITY, PERIOD)
+    assert store.load_inputs("A", "2024")["EBITDA"] == 0.0
+
+
+def test_estado_fora_da_pasta_e_sem_pickle(pasta):
+    drop, estado = pasta
+    _csv(drop / "a.csv", pd.DataFrame({ENTITY: ["A", "B"], PERIOD: ["2024", "2024"],
+                                       "Receita Bruta": [1000.0, 500.0], "EBITDA": [100.0, 50.0]}))
+    folder = DropFolder(drop, state_dir=estado)
+    folder.refresh()
+    assert sorted(os.listdir(drop)) == ["a.csv"]
+    assert not any(name.endswith(".pkl") for _, _, names in os.walk(estado) for name in names)
+
+    # Outro processo: retoma o estado sem reler nada
+    retomada = DropFolder(drop, state_dir=estado)
+    assert not retomada.refresh().changed
+    pd.testing.assert_frame_equal(retomada.valores, folder.valores)
+    assert np.allclose(retomada.inputs["Receita Bruta"], [1000.0, 500.0])
+
+
+def test_estado_ilegivel_vira_leitura_completa(pasta):
+    drop, estado = pasta
+    _csv(drop / "a.csv", pd.DataFrame({ENTITY: ["A"], PERIOD: ["2024"], "Receita Bruta": [1000.0]}))
+    DropFolder(drop, state_dir=estado).refresh()
+    (estado / STATE_FILE).write_text('{"files": {"a.csv": {}}}', encoding="utf-8")
+
+    folder = DropFolder(drop, state_dir=estado)
+    report = folder.refresh()
+    assert report.novos == ["a.csv"]
+    assert len(folder.valores) == 1
@@ -0,0 +1,408 @@
+# ============================================
+# PASTA MONITORADA (RECÁLCULO INCREMENTAL DO PORTFÓLIO)
+# ============================================
+# No fechamento, os arquivos de cada cliente chegam numa pasta compartilhada
+# e poucos mudam entre uma rodada e outra. DropFolder guarda a impressão
+# digital de cada arquivo (tamanho + mtime; SHA-256 do conteúdo quando o stat
+# muda) e, a cada refresh(), lê e recalcula só as empresas/períodos dos
+# arquivos novos, alterados ou removidos. O resultado é mesclado ao conjunto
+# já calculado e o relatório lista os KPIs que cruzaram os limites de
+# achievement de gaps e scorecard (50%, 70%, 100%). Sem mudanças, refresh()
+# só faz um os.scandir e devolve o conjunto atual.
+#
+# Arquivos: tabelas de inputs (CSV / XLSX / Parquet, como na importação) e
+# demonstrações (PDF, ou planilha sem colunas de input), lidas em paralelo
+# por statements.StatementIngestor.
+#
+# O estado fica num diretório do próprio app (FPA_WATCH_DIR, um
+# subdiretório por pasta monitorada), nunca na pasta compartilhada: JSON
+# para as impressões digitais e Parquet para as tabelas, sem pickle. Estado
+# ausente ou ilegível vira uma primeira leitura completa.
+#
+#   python watcher.py /dados/fechamento --interval 60 --report cruzamentos.csv
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from io import BytesIO
+
+import numpy as np
+
+from analysis import CRITICAL, GAP, TARGET
+from importer import ENTITY, PERIOD, SECTOR
+from kpis import raw_inputs
+
+THRESHOLDS = (CRITICAL, GAP, TARGET)
+BANDS = [f"< {CRITICAL}%", f"{CRITICAL}-{GAP}%", f"{GAP}-{TARGET}%", f">= {TARGET}%"]
+TABLE_TYPES = (".csv", ".txt", ".parquet", ".pq")
+SHEET_TYPES = (".xlsx", ".xlsm", ".xls", ".xlsb", ".ods")
+PDF_TYPES = (".pdf",)
+STATE_ROOT = os.environ.get("FPA_WATCH_DIR", os.path.join(tempfile.gettempdir(), "fpa_watch"))
+STATE_FILE = "estado.json"
+FILE_COLUMN = "_arquivo"
+
+
+def band(achievements):
+    """Faixa de cada achievement: 0 (< 50%), 1 (50-70%), 2 (70-100%), 3 (>= 100%)."""
+    return np.searchsorted(THRESHOLDS, np.asarray(achievements, dtype=np.float64), side="right")
+
+
+class RefreshReport:
+    """Resumo de um refresh(): arquivos e empresas afetados e cruzamentos de faixa."""
+
+    def __init__(self):
+        self.novos, self.alterados, self.removidos = [], [], []
+        self.recalculados = 0
+        self.excluidos = 0
+        self.erros = {}           # arquivo -> mensagem (o arquivo fica registrado, sem linhas)
+        self.cruzamentos = None   # DataFrame (ou None sem mudanças)
+        self.ms = 0.0
+
+    @property
+    def changed(self):
+        return bool(self.novos or self.alterados or self.removidos)
+
+    def summary(self):
+        n = 0 if self.cruzamentos is None else len(self.cruzamentos)
+        return (f"{len(self.novos)} novos · {len(self.alterados)} alterados · {len(self.removidos)} removidos · "
+                f"{self.recalculados} empresas/períodos recalculados · {self.excluidos} excluídos · "
+                f"{n} cruzamentos · {self.ms:,.1f} ms")
+
+
+class DropFolder:
+    """Conjunto de resultados de uma pasta, atualizado só onde os arquivos mudaram.
+
+    O estado (impressões digitais, inputs lidos por arquivo e resultados) é
+    gravado em `state_dir` (padrão: um subdiretório de STATE_ROOT por pasta)
+    para que a próxima rodada, inclusive em outro processo, também seja
+    incremental.
+    """
+
+    def __init__(self, directory, state_dir=None, ingestor=None):
+        self.directory = os.path.abspath(directory)
+        self.state_dir = state_dir or default_state_dir(self.directory)
+        self._ingestor = ingestor
+        self._lock = threading.Lock()
+        self.files = {}      # nome -> {"size", "mtime_ns", "hash", "frame"}
+        self.inputs = self.valores = self.achievements = None
+        # Incrementada a cada refresh com mudanças: as sessões do painel
+        # comparam com a sua para saber se o portfólio em tela ficou velho
+        self.version = 0
+        self.last_report = None
+        self._load_state()
+
+    # ---------- estado ----------
+
+    # Cada gravação vai para um subdiretório novo (geração); estado.json,
+    # trocado por último com os.replace, aponta para a geração completa
+
+    def _load_state(self):
+        import pandas as pd
+        try:
+            with open(os.path.join(self.state_dir, STATE_FILE), encoding="utf-8") as fh:
+                state = json.load(fh)
+            if state["directory"] != self.directory:
+                return
+            base = os.path.join(self.state_dir, state["geracao"])
+            files = {name: {"size": int(info["size"]), "mtime_ns": int(info["mtime_ns"]), "hash": str(info["hash"])}
+                     for name, info in state["files"].items()}
+            frames = pd.read_parquet(os.path.join(base, "frames.parquet"))
+            for name, frame in frames.groupby(FILE_COLUMN, sort=False):
+                files[name]["frame"] = frame.drop(columns=FILE_COLUMN).dropna(axis=1, how="all") \
+                    .reset_index(drop=True)
+            for info in files.values():
+                info.setdefault("frame", pd.DataFrame(columns=[ENTITY, PERIOD]))
+            tabelas = {}
+            for nome in ("inputs", "valores", "achievements"):
+                path = os.path.join(base, f"{nome}.parquet")
+                tabelas[nome] = pd.read_parquet(path) if state["tabelas"] else None
+        except Exception:
+            # Qualquer estado ausente, antigo ou corrompido: primeira leitura completa
+            return
+        self.files = files
+        self.inputs, self.valores, self.achievements = tabelas["inputs"], tabelas["valores"], tabelas["achievements"]
+
+    def _save_state(self):
+        import pandas as pd
+        os.makedirs(self.state_dir, exist_ok=True)
+        geracao = uuid.uuid4().hex
+        base = os.path.join(self.state_dir, geracao)
+        os.makedirs(base)
+        frames = [info["frame"].assign(**{FILE_COLUMN: name}) for name, info in self.files.items()
+                  if not info["frame"].empty]
+        frames = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=[FILE_COLUMN])
+        frames.to_parquet(os.path.join(base, "frames.parquet"), index=False)
+        tabelas = self.valores is not None
+        if tabelas:
+            for nome, tabela in (("inputs", self.inputs), ("valores", self.valores),
+                                 ("achievements", self.achievements)):
+                tabela.to_parquet(os.path.join(base, f"{nome}.parquet"), index=False)
+        state = {"directory": self.directory, "geracao": geracao, "tabelas": tabelas,
+                 "files": {name: {k: info[k] for k in ("size", "mtime_ns", "hash")}
+                           for name, info in self.files.items()}}
+        tmp = os.path.join(self.state_dir, STATE_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(state, fh, ensure_ascii=False)
+        os.replace(tmp, os.path.join(self.state_dir, STATE_FILE))
+        # Gerações anteriores já não são apontadas por estado.json
+        for entry in os.scandir(self.state_dir):
+            if entry.is_dir() and entry.name != geracao:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    # ---------- impressões digitais ----------
+
+    def _listing(self):
+        # nome -> os.stat_result dos arquivos suportados (ignora ocultos/temporários)
+        listing = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                ext = os.path.splitext(entry.name)[1].lower()
+                if entry.is_file() and not entry.name.startswith(".") \
+                        and ext in TABLE_TYPES + SHEET_TYPES + PDF_TYPES:
+                    listing[entry.name] = entry.stat()
+        return listing
+
+    def scan(self):
+        """(novos, alterados, removidos, {nome: (stat, conteúdo, hash)}) desde o último refresh."""
+        listing = self._listing()
+        novos, alterados, lidos = [], [], {}
+        for name, stat in listing.items():
+            known = self.files.get(name)
+            if known is not None and (known["size"], known["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+                continue
+            with open(os.path.join(self.directory, name), "rb") as fh:
+                content = fh.read()
+            digest = hashlib.sha256(content).hexdigest()
+            if known is not None and known["hash"] == digest:
+                # Só o mtime mudou (cópia/touch): atualiza o stat, não recalcula
+                known["size"], known["mtime_ns"] = stat.st_size, stat.st_mtime_ns
+                continue
+            (alterados if known is not None else novos).append(name)
+            lidos[name] = (stat, content, digest)
+        removidos = sorted(set(self.files) - set(listing))
+        return sorted(novos), sorted(alterados), removidos, lidos
+
+    # ---------- leitura ----------
+
+    def _ingestor_instance(self):
+        if self._ingestor is None:
+            from statements import StatementIngestor
+            self._ingestor = StatementIngestor()
+        return self._ingestor
+
+    def _read_files(self, lidos, erros):
+        # Um DataFrame (Empresa, Período, inputs...) por arquivo; um arquivo
+        # ilegível entra vazio para não ser relido a cada varredura
+        import pandas as pd
+        from importer import load_table
+        from statements import entity_from_name
+
+        frames, documentos = {}, []
+        for name, (_, content, _) in lidos.items():
+            ext = os.path.splitext(name)[1].lower()
+            if ext in PDF_TYPES:
+                documentos.append((name, content))
+                continue
+            try:
+                table, report = load_table(BytesIO(content), name=name)
+            except Exception as exc:
+                erros[name] = f"{type(exc).__name__}: {exc}"
+                frames[name] = pd.DataFrame(columns=[ENTITY, PERIOD])
+                continue
+            if ext in SHEET_TYPES and not report.mapping:
+                # Planilha sem colunas de input: balanço/DRE em linhas
+                documentos.append((name, content))
+                continue
+            if ENTITY not in table.columns:
+                table[ENTITY] = entity_from_name(name)
+            if PERIOD not in table.columns:
+                table[PERIOD] = ""
+            frames[name] = table
+
+        for result in self._ingestor_instance().ingest(documentos) if documentos else []:
+            if "erro" in result:
+                erros[result["nome"]] = result["erro"]
+                frames[result["nome"]] = pd.DataFrame(columns=[ENTITY, PERIOD])
+                continue
+            row = {ENTITY: entity_from_name(result["nome"]), PERIOD: "", **result["itens"]}
+            frames[result["nome"]] = pd.DataFrame([row])
+        return frames
+
+    # ---------- recálculo ----------
+
+    @staticmethod
+    def _keys(frame):
+        return set(zip(frame[ENTITY].astype(str), frame[PERIOD].astype(str)))
+
+    def refresh(self):
+        """Relê só o que mudou na pasta, recalcula as empresas afetadas e mescla."""
+        inicio = time.perf_counter()
+        report = RefreshReport()
+        with self._lock:
+            report.novos, report.alterados, report.removidos, lidos = self.scan()
+            if report.changed:
+                self._apply(report, lidos)
+                try:
+                    self._save_state()
+                except OSError as exc:
+                    # Sem estado gravado a próxima rodada do processo segue
+                    # incremental (memória); só um novo processo relê tudo
+                    report.erros["(estado)"] = f"{type(exc).__name__}: {exc}"
+                self.version += 1
+            report.ms = (time.perf_counter() - inicio) * 1000
+            if report.changed:
+                self.last_report = report
+        return report
+
+    def _apply(self, report, lidos):
+        import pandas as pd
+        from kpi_batch import score_batch
+
+        frames = self._read_files(lidos, report.erros)
+        # Empresas/períodos afetados: os dos arquivos novos/alterados e os que
+        # os arquivos alterados/removidos traziam antes
+        afetadas = set()
+        for name in report.alterados + report.removidos:
+            afetadas |= self._keys(self.files[name]["frame"])
+        for name in report.removidos:
+            del self.files[name]
+        for name, frame in frames.items():
+            stat, _, digest = lidos[name]
+            self.files[name] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": digest, "frame": frame}
+            afetadas |= self._keys(frame)
+
+        # Inputs das afetadas: união dos arquivos que as trazem, na ordem dos
+        # nomes; o primeiro arquivo a informar um input prevalece
+        partes = []
+        for name in sorted(self.files):
+            frame = self.files[name]["frame"]
+            mask = _key_mask(frame, afetadas)
+            if mask.any():
+                partes.append(frame[mask])
+        ids = [ENTITY, PERIOD]
+        if partes:
+            novos_inputs = pd.concat(partes, ignore_index=True)
+            novos_inputs[ids] = novos_inputs[ids].astype(str)
+            novos_inputs = novos_inputs.groupby(ids, sort=True, as_index=False).first()
+            input_cols = [c for c in raw_inputs() if c in novos_inputs.columns]
+            novos_inputs[input_cols] = novos_inputs[input_cols].fillna(0.0)
+            valores, atingimentos = score_batch(novos_inputs)
+            novos_val = pd.concat([novos_inputs[ids], valores], axis=1)
+            novos_ach = pd.concat([novos_inputs[ids], atingimentos], axis=1)
+        else:
+            novos_inputs = novos_val = novos_ach = None
+        report.recalculados = 0 if novos_inputs is None else len(novos_inputs)
+
+        report.cruzamentos = crossings(self.achievements, novos_ach)
+        # Empresas/períodos que só existiam em arquivos removidos
+        report.excluidos = len(afetadas - (set() if novos_inputs is None else self._keys(novos_inputs)))
+
+        # Mescla: sai tudo o que foi afetado, entram os recalculados. Arquivos
+        # de rodadas diferentes podem trazer colunas diferentes: input ausente
+        # vale 0, como no cálculo
+        self.inputs = _merge(self.inputs, novos_inputs, afetadas)
+        if self.inputs is not None:
+            input_cols = [c for c in raw_inputs() if c in self.inputs.columns]
+            self.inputs[input_cols] = self.inputs[input_cols].fillna(0.0)
+        self.valores = _merge(self.valores, novos_val, afetadas)
+        self.achievements = _merge(self.achievements, novos_ach, afetadas)
+
+    def portfolio(self):
+        """{inputs, valores, achievements} no formato do portfólio do painel."""
+        if self.valores is None:
+            return None
+        return {"inputs": self.inputs, "valores": self.valores, "achievements": self.achievements}
+
+
+def default_state_dir(directory):
+    """Diretório de estado de uma pasta monitorada, dentro de STATE_ROOT."""
+    return os.path.join(STATE_ROOT, hashlib.sha256(os.path.abspath(directory).encode()).hexdigest()[:16])
+
+
+def _key_mask(frame, keys):
+    import pandas as pd
+    return pd.Series(list(zip(frame[ENTITY].astype(str), frame[PERIOD].astype(str))), index=frame.index).isin(keys)
+
+
+def _merge(atual, novos, afetadas):
+    import pandas as pd
+    if atual is None:
+        return novos
+    mantidos = atual[~_key_mask(atual, afetadas)]
+    if novos is None:
+        return mantidos.reset_index(drop=True)
+    # SECTOR pode existir só de um lado: concat alinha as colunas
+    return pd.concat([mantidos, novos], ignore_index=True).sort_values([ENTITY, PERIOD], kind="stable",
+                                                                       ignore_index=True)
+
+
+def crossings(anteriores, novos):
+    """KPIs que mudaram de faixa (50/70/100%) entre o resultado anterior e o novo.
+
+    Cada empresa/período recalculado é comparado com ele mesmo na rodada
+    anterior; um período novo é comparado com o último período já calculado
+    da mesma empresa. Devolve um DataFrame com uma linha por cruzamento.
+    """
+    import pandas as pd
+    colunas = [ENTITY, PERIOD, "Comparado com", "KPI", "Antes (%)", "Depois (%)", "Faixa antes", "Faixa depois",
+               "Direção"]
+    if anteriores is None or novos is None or anteriores.empty or novos.empty:
+        return pd.DataFrame(columns=colunas)
+    kpis = [c for c in novos.columns if c not in (ENTITY, PERIOD, SECTOR) and c in anteriores.columns]
+
+    # Base de comparação: mesma chave, ou o último período anterior da empresa
+    chaves = novos[[ENTITY, PERIOD]].reset_index(drop=True)
+    mesma = chaves.merge(anteriores[[ENTITY, PERIOD] + kpis].assign(_base=True), on=[ENTITY, PERIOD], how="left")
+    ultimos = (anteriores.sort_values(PERIOD, kind="stable").drop_duplicates(ENTITY, keep="last")
+               [[ENTITY, PERIOD] + kpis].rename(columns={PERIOD: "_ref"}))
+    ultimo = chaves.merge(ultimos, on=ENTITY, how="left")
+    tem_mesma = mesma["_base"].notna().to_numpy()
+    usa_ultimo = ~tem_mesma & ultimo["_ref"].notna().to_numpy() \
+        & (ultimo["_ref"].astype(str) < chaves[PERIOD].astype(str)).to_numpy()
+    antes = np.where(tem_mesma[:, None], mesma[kpis].to_numpy(dtype=np.float64),
+                     np.where(usa_ultimo[:, None], ultimo[kpis].to_numpy(dtype=np.float64), np.nan))
+    refs = np.where(tem_mesma, chaves[PERIOD].to_numpy(dtype=object),
+                    np.where(usa_ultimo, ultimo["_ref"].to_numpy(dtype=object), None))
+
+    depois = novos[kpis].to_numpy(dtype=np.float64)
+    faixa_antes, faixa_depois = band(antes), band(depois)
+    linhas, cols = np.nonzero((faixa_antes != faixa_depois) & ~np.isnan(antes))
+    return pd.DataFrame({
+        ENTITY: novos[ENTITY].to_numpy()[linhas],
+        PERIOD: novos[PERIOD].to_numpy()[linhas],
+        "Comparado com": refs[linhas],
+        "KPI": np.asarray(kpis, dtype=object)[cols],
+        "Antes (%)": np.round(antes[linhas, cols], 1),
+        "Depois (%)": np.round(depois[linhas, cols], 1),
+        "Faixa antes": np.asarray(BANDS, dtype=object)[faixa_antes[linhas, cols]],
+        "Faixa depois": np.asarray(BANDS, dtype=object)[faixa_depois[linhas, cols]],
+        "Direção": np.where(faixa_depois[linhas, cols] > faixa_antes[linhas, cols], "↑", "↓"),
+    }, columns=colunas)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Recalcula só as empresas com arquivos novos/alterados na pasta.")
+    parser.add_argument("directory")
+    parser.add_argument("--state", help=f"diretório de estado (padrão: um subdiretório de {STATE_ROOT})")
+    parser.add_argument("--interval", type=float, default=0, help="segundos entre varreduras (0 = uma rodada)")
+    parser.add_argument("--report", help="grava os cruzamentos de cada rodada com mudanças neste CSV")
+    args = parser.parse_args()
+
+    pasta = DropFolder(args.directory, state_dir=args.state)
+    while True:
+        resultado = pasta.refresh()
+        print(resultado.summary(), flush=True)
+        if resultado.cruzamentos is not None and not resultado.cruzamentos.empty:
+            print(resultado.cruzamentos.to_string(index=False), flush=True)
+            if args.report:
+                resultado.cruzamentos.to_csv(args.report, index=False, sep=";", encoding="utf-8-sig")
+        if not args.interval:
+            break
+        time.sleep(args.interval)